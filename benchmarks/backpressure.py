@@ -0,0 +1,74 @@
+"""
+Peak memory of pushing millions of items through a slow sink, with and
+without bounded queues.
+
+The bounded run goes first: ru_maxrss is the peak for the whole process,
+so the unbounded run can only show growth on top of it.
+
+Usage:
+    python -m benchmarks.backpressure [n_items] [queue_maxsize]
+"""
+import resource
+import sys
+import threading
+import time
+
+import skorche
+
+
+@skorche.task
+def add_one(x):
+    return x + 1
+
+
+@skorche.task
+def slow_sink(x):
+    if x % 1000 == 0:
+        time.sleep(0.005)
+    return x
+
+
+def run_pipeline(n_items: int, queue_maxsize: int) -> float:
+    """Returns wall seconds for one run of the pipeline"""
+    skorche.init()
+
+    q_in = skorche.Queue(name="inputs")
+    q_out = skorche.chain([add_one, slow_sink], q_in)
+
+    def produce():
+        for i in range(n_items):
+            q_in.put(i)
+        q_in.put(skorche.QUEUE_SENTINEL)
+
+    start = time.perf_counter()
+    skorche.run(queue_maxsize=queue_maxsize)
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    n_results = 0
+    while q_out.get() is not skorche.QUEUE_SENTINEL:
+        q_out.task_done()
+        n_results += 1
+
+    producer.join()
+    skorche.shutdown()
+
+    assert n_results == n_items
+    return time.perf_counter() - start
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    queue_maxsize = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    baseline = max_rss_mb()
+    for maxsize in (queue_maxsize, 0):
+        elapsed = run_pipeline(n_items, maxsize)
+        print(
+            f"maxsize={maxsize:<6}: {elapsed:6.1f}s  "
+            f"peak rss +{max_rss_mb() - baseline:7.1f} MB"
+        )
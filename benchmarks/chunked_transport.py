@@ -0,0 +1,48 @@
+"""
+Throughput of a map -> split -> merge pipeline over manager queues for a
+range of chunk sizes. Every backend put/get is a round trip to the manager
+process, so shipping items in chunks divides that cost.
+
+Usage:
+    python -m benchmarks.chunked_transport [n_items]
+"""
+import sys
+import time
+
+import skorche
+
+
+@skorche.task
+def add_one(x):
+    return x + 1
+
+
+def is_even(x):
+    return x % 2 == 0
+
+
+def run_pipeline(n_items: int, chunk_size: int) -> float:
+    """Returns items/sec for one run of the pipeline"""
+    skorche.init()
+
+    q_in = skorche.Queue(name="inputs", fixed_inputs=list(range(n_items)))
+    q = skorche.map(add_one, q_in)
+    q_even, q_odd = skorche.split(is_even, q)
+    q_out = skorche.merge((q_even, q_odd))
+
+    start = time.perf_counter()
+    skorche.run(queue_backend="manager", chunk_size=chunk_size)
+    skorche.shutdown()
+    results = q_out.flush()
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == n_items
+    return n_items / elapsed
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for chunk_size in (1, 16, 64, 256):
+        rate = run_pipeline(n_items, chunk_size)
+        print(f"chunk_size {chunk_size:>4}: {rate:12.0f} items/sec")
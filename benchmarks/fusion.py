@@ -0,0 +1,43 @@
+"""
+Throughput of a chain of trivial map stages with and without task fusion.
+
+Unfused, every item makes one queue hop per stage. Fused, the whole chain
+runs in one worker and items only touch the input and output queues.
+
+Usage:
+    python -m benchmarks.fusion [n_items] [n_stages]
+"""
+import sys
+import time
+
+import skorche
+
+
+def run_pipeline(n_items: int, n_stages: int, fuse: bool) -> float:
+    """Returns items per second through the chain"""
+    skorche.init()
+
+    def add_one(x):
+        return x + 1
+
+    stages = [skorche.Task(add_one, name=f"stage {i}") for i in range(n_stages)]
+    q_in = skorche.Queue(fixed_inputs=list(range(n_items)))
+    q_out = skorche.chain(stages, q_in)
+
+    start = time.perf_counter()
+    skorche.run(fuse=fuse)
+    skorche.shutdown()
+    elapsed = time.perf_counter() - start
+
+    assert sorted(q_out.flush()) == [x + n_stages for x in range(n_items)]
+    return n_items / elapsed
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_stages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    for fuse in (False, True):
+        rate = run_pipeline(n_items, n_stages, fuse)
+        label = "fused" if fuse else "unfused"
+        print(f"{label:>8}: {rate:10.0f} items/s through {n_stages} stages")
@@ -0,0 +1,59 @@
+"""
+CPU usage and op wake-up latency of the "event" and "poll" op schedulers.
+
+A slow task feeds a split op, so the pipeline is idle most of the time.
+Latency is measured from the task returning an item to the split predicate
+being evaluated on it.
+
+Usage:
+    python -m benchmarks.op_scheduler [n_items] [task_seconds]
+"""
+import statistics
+import sys
+import time
+
+import skorche
+
+
+def run_pipeline(n_items: int, task_seconds: float, scheduler: str):
+    """Returns (cpu seconds / wall seconds, median latency, max latency)"""
+    skorche.init()
+
+    emitted = {}
+    latencies = []
+
+    @skorche.task
+    def slow_task(x):
+        time.sleep(task_seconds)
+        emitted[x] = time.perf_counter()
+        return x
+
+    def is_even(x):
+        latencies.append(time.perf_counter() - emitted[x])
+        return x % 2 == 0
+
+    q_in = skorche.Queue(fixed_inputs=list(range(n_items)))
+    q = skorche.map(slow_task, q_in)
+    q_even, q_odd = skorche.split(is_even, q)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    skorche.run(scheduler=scheduler)
+    skorche.shutdown()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    assert len(q_even.flush()) + len(q_odd.flush()) == n_items
+    return cpu / wall, statistics.median(latencies), max(latencies)
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    task_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    for scheduler in ("poll", "event"):
+        cpu, median, worst = run_pipeline(n_items, task_seconds, scheduler)
+        print(
+            f"{scheduler:>6}: cpu {100 * cpu:6.1f}%  "
+            f"latency median {1e6 * median:8.1f}us  max {1e6 * worst:8.1f}us"
+        )
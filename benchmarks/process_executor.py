@@ -0,0 +1,59 @@
+"""
+Speedup of a pure-Python CPU-bound map on a process pool.
+
+Runs the same task on threads and then on 1..N processes. Threads are
+serialized by the GIL; processes should scale close to linearly up to the
+number of cores.
+
+Usage:
+    python -m benchmarks.process_executor [n_items] [max_workers]
+"""
+import os
+import sys
+import time
+
+import skorche
+
+
+def burn(n: int) -> int:
+    """Deliberately slow pure-Python loop"""
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+def run_pipeline(n_items: int, executor: str, max_workers: int) -> float:
+    """Returns wall seconds for one run of the pipeline"""
+    skorche.init()
+
+    burn_task = skorche.Task(
+        burn, name="burn", max_workers=max_workers, executor=executor
+    )
+    q_in = skorche.Queue(fixed_inputs=[200_000] * n_items)
+    q_out = skorche.map(burn_task, q_in)
+
+    start = time.perf_counter()
+    skorche.run()
+    skorche.shutdown()
+    elapsed = time.perf_counter() - start
+
+    assert len(q_out.flush()) == n_items
+    return elapsed
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    baseline = run_pipeline(n_items, "thread", max_workers)
+    print(f" thread x{max_workers:<3}: {baseline:7.2f}s")
+
+    workers = 1
+    while workers <= max_workers:
+        elapsed = run_pipeline(n_items, "process", workers)
+        print(
+            f"process x{workers:<3}: {elapsed:7.2f}s  "
+            f"speedup {baseline / elapsed:5.2f}"
+        )
+        workers *= 2
@@ -0,0 +1,46 @@
+"""
+Throughput of a map -> split -> merge pipeline on each queue backend.
+
+Usage:
+    python -m benchmarks.queue_backend [n_items]
+"""
+import sys
+import time
+
+import skorche
+
+
+@skorche.task
+def add_one(x):
+    return x + 1
+
+
+def is_even(x):
+    return x % 2 == 0
+
+
+def run_pipeline(n_items: int, queue_backend: str) -> float:
+    """Returns items/sec for one run of the pipeline"""
+    skorche.init()
+
+    q_in = skorche.Queue(name="inputs", fixed_inputs=list(range(n_items)))
+    q = skorche.map(add_one, q_in)
+    q_even, q_odd = skorche.split(is_even, q)
+    q_out = skorche.merge((q_even, q_odd))
+
+    start = time.perf_counter()
+    skorche.run(queue_backend=queue_backend)
+    skorche.shutdown()
+    results = q_out.flush()
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == n_items
+    return n_items / elapsed
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for queue_backend in ("manager", "thread"):
+        rate = run_pipeline(n_items, queue_backend)
+        print(f"{queue_backend:>8}: {rate:12.0f} items/sec")
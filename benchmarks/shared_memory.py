@@ -0,0 +1,49 @@
+"""
+Throughput of two process tasks passing large bytes payloads between them,
+with and without the shared memory transport. Without it every payload is
+pickled through the manager process on each hop.
+
+Usage:
+    python -m benchmarks.shared_memory [n_items] [payload_mb]
+"""
+import sys
+import time
+
+import skorche
+
+
+@skorche.task(name="identity", executor="process", max_workers=2, fuse=False)
+def identity(payload):
+    return payload
+
+
+@skorche.task(name="tail", executor="process", max_workers=2, fuse=False)
+def tail(payload):
+    return payload[-16:] + payload[:-16]
+
+
+def run_pipeline(n_items: int, payload_mb: int, shared_memory: bool) -> float:
+    """Returns MB/sec for one run of the pipeline"""
+    skorche.init()
+
+    payloads = [bytes([i % 256]) * (payload_mb << 20) for i in range(n_items)]
+    q_in = skorche.Queue(name="inputs", fixed_inputs=payloads)
+    q_out = skorche.map(tail, skorche.map(identity, q_in))
+
+    start = time.perf_counter()
+    skorche.run(shared_memory=shared_memory)
+    skorche.shutdown()
+    results = q_out.flush()
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == n_items
+    return n_items * payload_mb / elapsed
+
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    payload_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    for shared_memory in (False, True):
+        rate = run_pipeline(n_items, payload_mb, shared_memory)
+        print(f"shared_memory={shared_memory!s:<5}: {rate:8.0f} MB/sec")
@@ -3,3 +3,10 @@ from .queue import Queue
 from .skorche import *
 from .task import task, Task
 from .pipeline import PipelineManager, _global_pipeline
+from .pipeline_run import PipelineRun
+from .pool import WorkerPool
+from .profiler import Profiler, NodeStats
+from .shm import SharedArena, SharedPayload
+from .cache import Cache, LRUCache, DiskCache
+from .checkpoint import Checkpoint
+from .retry import RetryPolicy, Failure
@@ -0,0 +1,79 @@
+from .constants import QUEUE_SENTINEL
+from .op import Op
+from .queue import Queue
+
+import asyncio
+import concurrent.futures
+import threading
+
+
+class AsyncEngine:
+    """
+    Runs async tasks, and ops under the "async" scheduler, as coroutines on
+    a single event loop living on a background thread.
+    """
+
+    def __init__(self, n_bridges: int = 1):
+        """
+        Args:
+            n_bridges (int): Number of coroutines that will wait on queues not
+                backed by the loop. Each needs a thread to block in get().
+        """
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="skorche-async", daemon=True
+        )
+        self.bridge_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, n_bridges), thread_name_prefix="skorche-bridge"
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """
+        Schedule a coroutine on the loop from any thread. Unlike the future
+        from asyncio.run_coroutine_threadsafe, the one returned here reports
+        running() as soon as the coroutine is scheduled.
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+
+        async def run_coro():
+            try:
+                result = await coro
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        asyncio.run_coroutine_threadsafe(run_coro(), self.loop)
+        return future
+
+    async def op_listener(self, op: Op, queue_in: Queue):
+        """Coroutine handing items from queue_in to op until the sentinel is reached"""
+        sentinel_reached = False
+
+        try:
+            while not sentinel_reached:
+                # ops can't block the loop on a full output, so wait for space
+                # before taking the next item
+                for queue_out in op.outputs():
+                    await queue_out.async_wait_not_full()
+
+                task_item = await queue_in.async_get(self.bridge_pool)
+                queue_in.task_done()
+
+                op.handle(queue_in, task_item)
+                sentinel_reached = task_item is QUEUE_SENTINEL
+
+        finally:
+            # a failed op still ends its outputs, so nothing downstream waits forever
+            if not sentinel_reached:
+                op.fail()
+
+    def shutdown(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.bridge_pool.shutdown(wait=True)
@@ -0,0 +1,113 @@
+from .pool import WorkerPool
+from .profiler import Profiler
+from .task import Task
+
+import threading
+import time
+from typing import Dict, List
+
+# How often the autoscaler looks at every task, in seconds
+AUTOSCALE_INTERVAL = 0.1
+
+# Number of looks in a row a task's input queue must be empty for before
+# the autoscaler takes one of its workers away
+IDLE_INTERVALS = 5
+
+
+class Autoscaler:
+    """
+    Grows and shrinks the number of workers of every thread and process task
+    while the pipeline runs, within the task's min_workers and max_workers
+    and its pool's budget.
+
+    A task falling behind, with more items waiting than its workers can
+    clear before the next look, has its workers doubled. A task whose input
+    queue stays empty loses one worker at a time.
+    """
+
+    def __init__(
+        self,
+        pools: List[WorkerPool],
+        task_table: Dict,
+        profiler: Profiler,
+        interval: float = AUTOSCALE_INTERVAL,
+    ):
+        """
+        Args:
+            pools (List[WorkerPool]): Pools started with autoscale=True.
+            task_table (Dict): The pipeline's task table.
+            profiler (Profiler): Source of each task's service time.
+            interval (float): Seconds between looks at every task.
+        """
+        self.pools = pools
+        self.task_table = task_table
+        self.profiler = profiler
+        self.interval = interval
+
+        self.idle_intervals = {}
+
+        # (seconds since start, task, number of workers) on every change
+        self.history = []
+
+        self.start_time = time.perf_counter()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(
+            target=self.watch, name="skorche-autoscaler", daemon=True
+        )
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def watch(self) -> None:
+        while not self.stopping.wait(self.interval):
+            for pool in self.pools:
+                for task in list(pool.workers):
+                    self.scale(pool, task)
+
+    def service_time(self, task: Task) -> float:
+        """Mean seconds per item, or None before any are recorded"""
+        stats = task.stats
+        if not stats or not stats.items_in:
+            return None
+
+        return stats.busy / stats.items_in
+
+    def scale(self, pool: WorkerPool, task: Task) -> None:
+        queue_in = self.task_table[task]["queue_in"]
+        backlog = queue_in.qsize() * queue_in.chunk_size
+        n_workers = pool.allocation[task]
+
+        if backlog:
+            self.idle_intervals[task] = 0
+        else:
+            self.idle_intervals[task] = self.idle_intervals.get(task, 0) + 1
+
+        # process workers only report service times when they stop, so fall
+        # back to comparing the backlog with the number of workers
+        service_time = self.service_time(task)
+        if service_time is None:
+            behind = backlog > n_workers
+        else:
+            behind = backlog * service_time / n_workers > self.interval
+
+        if behind:
+            changed = pool.grow(task, n_workers)
+
+        elif self.idle_intervals[task] >= IDLE_INTERVALS:
+            self.idle_intervals[task] = 0
+            changed = pool.shrink(task)
+
+        else:
+            changed = False
+
+        if changed:
+            self.history.append(
+                (time.perf_counter() - self.start_time, task, pool.allocation[task])
+            )
+            self.profiler.workers[task] = pool.allocation[task]
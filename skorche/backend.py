@@ -0,0 +1,288 @@
+from .shm import SHARED_MEMORY_MIN_BYTES, SharedArena
+
+import asyncio
+import queue
+import threading
+from multiprocessing import Manager
+from types import SimpleNamespace
+
+
+class WorkerCount:
+    """
+    Number of workers of a task still running, shared between them so that
+    the last one to stop can send the sentinel downstream.
+
+    It also holds the number of workers the task should be running, which
+    the autoscaler moves. Idle workers above it retire.
+    """
+
+    def __init__(self, state, lock, idle_timeout: float = None):
+        """
+        Args:
+            state: Object holding the running and target counts as
+                attributes, shared by every worker.
+            lock: Lock guarding state.
+            idle_timeout (float, optional): Seconds a worker waits for an
+                item before checking whether it should retire. None for
+                tasks that are not autoscaled.
+        """
+        self.state = state
+        self.lock = lock
+        self.idle_timeout = idle_timeout
+
+    def add(self, n: int) -> int:
+        """Add n to the running count and return the new count"""
+        with self.lock:
+            self.state.running += n
+            return self.state.running
+
+    def get(self) -> int:
+        return self.state.running
+
+    def grow(self, n: int) -> bool:
+        """
+        Count n more workers about to start, unless the task has already
+        stopped. Returns False if it has.
+        """
+        with self.lock:
+            if not self.state.running:
+                return False
+
+            self.state.running += n
+            self.state.target += n
+            return True
+
+    def set_target(self, n: int) -> None:
+        with self.lock:
+            self.state.target = n
+
+    def retire(self) -> bool:
+        """Count out the calling worker if there are more than the target"""
+        with self.lock:
+            if self.state.running <= self.state.target:
+                return False
+
+            self.state.running -= 1
+            return True
+
+
+class SequenceCount:
+    """
+    Sequence numbers handed out to the items put on a queue at the start of
+    an ordered stage, and how many the stage has emitted in order so far.
+    """
+
+    def __init__(self, state, lock):
+        """
+        Args:
+            state: Object holding the next and released counts as
+                attributes, shared by every producer and the stage.
+            lock: Lock guarding state.
+        """
+        self.state = state
+        self.lock = lock
+
+    def next(self) -> int:
+        """Take the next sequence number"""
+        with self.lock:
+            seq = self.state.next
+            self.state.next = seq + 1
+            return seq
+
+    def peek(self) -> int:
+        return self.state.next
+
+    def released(self) -> int:
+        return self.state.released
+
+    def release(self, n: int) -> None:
+        """Record that the first n items have been emitted"""
+        self.state.released = n
+
+
+def make_local_sequence() -> SequenceCount:
+    """SequenceCount for producers that all live in this process"""
+    return SequenceCount(SimpleNamespace(next=0, released=0), threading.Lock())
+
+
+class QueueBackend:
+    """Base class for the transport behind every skorche Queue"""
+
+    name = None
+
+    # SharedArena large payloads are sent through, if any
+    arena = None
+
+    def make_queue(self, maxsize: int = 0):
+        """
+        Return a new queue object exposing put/get/empty/full/task_done.
+        Puts block while the queue holds maxsize items, if maxsize > 0.
+        """
+        raise NotImplementedError
+
+    def make_worker_count(self, n_workers: int) -> WorkerCount:
+        """Return a WorkerCount starting at n_workers visible to every worker"""
+        raise NotImplementedError
+
+    def make_sequence(self) -> SequenceCount:
+        """Return a SequenceCount starting at 0 visible to every producer"""
+        raise NotImplementedError
+
+
+class ThreadQueueBackend(QueueBackend):
+    """
+    In-process backend for pipelines whose workers are all threads.
+
+    Queues are plain queue.Queue instances, so put/get never leave the
+    process and no items are pickled.
+    """
+
+    name = "thread"
+
+    def make_queue(self, maxsize: int = 0):
+        return queue.Queue(maxsize)
+
+    def make_worker_count(self, n_workers: int) -> WorkerCount:
+        state = SimpleNamespace(running=n_workers, target=n_workers)
+        return WorkerCount(state, threading.Lock())
+
+    def make_sequence(self) -> SequenceCount:
+        return make_local_sequence()
+
+
+class ManagerQueueBackend(QueueBackend):
+    """
+    Backend sharing queues between processes through a multiprocessing.Manager.
+
+    Every queue operation is a round trip to the manager server process, so
+    this is only worth paying for when workers live in other processes.
+    """
+
+    name = "manager"
+
+    def __init__(self):
+        # The manager server is kept alive by the queue proxies it hands out,
+        # so queues can still be flushed after the pipeline shuts down
+        self.mp_manager = Manager()
+
+    def make_queue(self, maxsize: int = 0):
+        return self.mp_manager.Queue(maxsize)
+
+    def make_worker_count(self, n_workers: int) -> WorkerCount:
+        state = self.mp_manager.Namespace(running=n_workers, target=n_workers)
+        return WorkerCount(state, self.mp_manager.Lock())
+
+    def make_sequence(self) -> SequenceCount:
+        state = self.mp_manager.Namespace(next=0, released=0)
+        return SequenceCount(state, self.mp_manager.Lock())
+
+    def share_memory(self, min_bytes: int = SHARED_MEMORY_MIN_BYTES) -> None:
+        """
+        Send payloads of at least min_bytes through shared memory, passing
+        only a handle through the manager
+        """
+        self.arena = SharedArena(self.mp_manager, min_bytes)
+
+
+class LoopQueue:
+    """
+    queue.Queue-like interface to an asyncio.Queue owned by an event loop.
+
+    Coroutines on the loop await aget(), while put/get/empty/task_done may be
+    called from the loop or, more slowly, from any other thread.
+
+    Code on the loop must never block, so put() only honours maxsize when
+    block=False. Coroutines wanting backpressure yield until the queue is
+    no longer full (see Queue.async_put).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = 0):
+        self.loop = loop
+        self.maxsize = maxsize
+        self.queue = asyncio.Queue()
+
+    def on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def call(self, fn, *args):
+        """Call fn on the loop's thread and return its result"""
+        if self.on_loop():
+            return fn(*args)
+
+        async def call_on_loop():
+            return fn(*args)
+
+        return asyncio.run_coroutine_threadsafe(call_on_loop(), self.loop).result()
+
+    async def aget(self):
+        return await self.queue.get()
+
+    def put(self, item, block=True, timeout=None):
+        if not block and self.full():
+            raise queue.Full
+
+        self.call(self.queue.put_nowait, item)
+
+    def get(self, block=True, timeout=None):
+        if not block or self.on_loop():
+            try:
+                return self.call(self.queue.get_nowait)
+            except asyncio.QueueEmpty:
+                raise queue.Empty
+
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.wait_for(self.queue.get(), timeout), self.loop
+        )
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise queue.Empty
+
+    def empty(self) -> bool:
+        return self.queue.empty()
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self.queue.qsize()
+
+    def task_done(self):
+        self.call(self.queue.task_done)
+
+
+class AsyncQueueBackend(QueueBackend):
+    """
+    Backend for queues whose producer and consumer both run on the event loop
+    of the async engine. Items never leave the loop's thread.
+    """
+
+    name = "async"
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def make_queue(self, maxsize: int = 0):
+        return LoopQueue(self.loop, maxsize)
+
+    def make_sequence(self) -> SequenceCount:
+        return make_local_sequence()
+
+
+QUEUE_BACKENDS = {
+    ThreadQueueBackend.name: ThreadQueueBackend,
+    ManagerQueueBackend.name: ManagerQueueBackend,
+}
+
+
+def get_queue_backend(name: str) -> QueueBackend:
+    """Instantiate a queue backend by name"""
+    if name not in QUEUE_BACKENDS:
+        raise ValueError(
+            f"Unknown queue backend '{name}'. Choose one of {list(QUEUE_BACKENDS)}"
+        )
+
+    return QUEUE_BACKENDS[name]()
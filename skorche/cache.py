@@ -0,0 +1,225 @@
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Callable, Hashable, Tuple
+
+
+def default_key(item) -> str:
+    """
+    Digest of the pickled item. Unlike hash() it is the same in every
+    process and every run, so it can key an on-disk cache.
+    """
+    return hashlib.blake2b(pickle.dumps(item, protocol=4), digest_size=16).hexdigest()
+
+
+class Cache:
+    """
+    Base class for the result cache of a task. A task given a cache only
+    calls its function for items whose key isn't in the cache yet.
+    """
+
+    def __init__(self, ttl: float = None, key: Callable = None):
+        """
+        Args:
+            ttl (float, optional): Seconds a result stays valid. Default =
+                None, results never expire.
+            key (Callable, optional): Maps an item to the key its result is
+                cached under. Default = a digest of the pickled item.
+        """
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+
+        self.ttl = ttl
+        self.key = key or default_key
+
+    def key_for(self, item) -> Hashable:
+        return self.key(item)
+
+    def lookup(self, key: Hashable) -> Tuple[bool, object]:
+        """(True, result) if a live result is cached under key, else (False, None)"""
+        raise NotImplementedError
+
+    def store(self, key: Hashable, result) -> None:
+        raise NotImplementedError
+
+    @property
+    def hits(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def misses(self) -> int:
+        raise NotImplementedError
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Cache):
+    """
+    In memory cache evicting the least recently used result once it holds
+    maxsize of them. Every worker process of a process task has its own.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None, key: Callable = None):
+        """
+        Args:
+            maxsize (int, optional): Number of results kept. Default = 1024.
+            ttl (float, optional): See Cache.
+            key (Callable, optional): See Cache.
+        """
+        super().__init__(ttl, key)
+
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.maxsize = maxsize
+
+        # key -> (result, time stored), least recently used first
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def lookup(self, key: Hashable) -> Tuple[bool, object]:
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is not None and self.ttl is not None:
+                if time.monotonic() - entry[1] > self.ttl:
+                    del self.results[key]
+                    entry = None
+
+            if entry is None:
+                self.n_misses += 1
+                return False, None
+
+            self.results.move_to_end(key)
+            self.n_hits += 1
+            return True, entry[0]
+
+    def store(self, key: Hashable, result) -> None:
+        with self.lock:
+            self.results[key] = (result, time.monotonic())
+            self.results.move_to_end(key)
+
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+    @property
+    def hits(self) -> int:
+        return self.n_hits
+
+    @property
+    def misses(self) -> int:
+        return self.n_misses
+
+
+class DiskCache(Cache):
+    """
+    Cache in an sqlite database file. Results are pickled, survive between
+    runs and are shared by every worker, threads and processes alike, as
+    are the hit and miss counts.
+    """
+
+    def __init__(self, path: str, ttl: float = None, key: Callable = None):
+        """
+        Args:
+            path (str): Database file, created if it doesn't exist.
+            ttl (float, optional): See Cache.
+            key (Callable, optional): See Cache. Keys must be strings,
+                numbers or bytes.
+        """
+        super().__init__(ttl, key)
+        self.path = os.fspath(path)
+
+        # sqlite connections can't be shared between threads or pickled
+        self.local = threading.local()
+
+        db = self.connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key PRIMARY KEY, result BLOB, stored REAL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS counts (name TEXT PRIMARY KEY, count INTEGER)"
+        )
+        db.execute(
+            "INSERT OR IGNORE INTO counts VALUES ('hits', 0), ('misses', 0)"
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        """This thread's connection to the database"""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            # autocommit, so every statement is visible to other workers at once
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self.local.db = db
+
+        return db
+
+    def lookup(self, key: Hashable) -> Tuple[bool, object]:
+        db = self.connect()
+        row = db.execute(
+            "SELECT result, stored FROM results WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is not None and self.ttl is not None and time.time() - row[1] > self.ttl:
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+            row = None
+
+        name = "misses" if row is None else "hits"
+        db.execute("UPDATE counts SET count = count + 1 WHERE name = ?", (name,))
+
+        if row is None:
+            return False, None
+
+        return True, pickle.loads(row[0])
+
+    def store(self, key: Hashable, result) -> None:
+        self.connect().execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            (key, pickle.dumps(result), time.time()),
+        )
+
+    def count(self, name: str) -> int:
+        return self.connect().execute(
+            "SELECT count FROM counts WHERE name = ?", (name,)
+        ).fetchone()[0]
+
+    @property
+    def hits(self) -> int:
+        return self.count("hits")
+
+    @property
+    def misses(self) -> int:
+        return self.count("misses")
+
+    def clear(self) -> None:
+        """Forget every result and reset the counts"""
+        db = self.connect()
+        db.execute("DELETE FROM results")
+        db.execute("UPDATE counts SET count = 0")
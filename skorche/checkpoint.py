@@ -0,0 +1,155 @@
+from .cache import Cache
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Hashable, Tuple
+
+# Longest time, in seconds, a completed item goes unrecorded
+CHECKPOINT_INTERVAL = 5.0
+
+
+class Checkpoint:
+    """
+    Results of every item each task of a run has completed, in an sqlite
+    file. A run resumed from it replays its inputs, and tasks hand back the
+    recorded result of an item instead of performing it again.
+
+    Results are written in batches, at most every interval seconds and when
+    each worker stops, so a crash loses at most interval seconds of work.
+    """
+
+    def __init__(
+        self, path: str, interval: float = CHECKPOINT_INTERVAL, resume: bool = False
+    ):
+        """
+        Args:
+            path (str): Database file.
+            interval (float, optional): Seconds between writes.
+            resume (bool, optional): Keep the results already in the file.
+                Otherwise they are deleted.
+        """
+        self.path = os.fspath(path)
+        self.interval = interval
+
+        self.setup()
+
+        db = self.connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(task TEXT, key TEXT, result BLOB, PRIMARY KEY (task, key))"
+        )
+        if not resume:
+            db.execute("DELETE FROM results")
+
+    def setup(self) -> None:
+        # sqlite connections can't be shared between threads or pickled, and
+        # results not yet written belong to the process that recorded them
+        self.local = threading.local()
+        self.pending = []
+        self.lock = threading.Lock()
+        self.last_write = time.monotonic()
+
+    def __getstate__(self):
+        return {"path": self.path, "interval": self.interval}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.setup()
+
+    def connect(self) -> sqlite3.Connection:
+        """This thread's connection to the database"""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self.local.db = db
+
+        return db
+
+    def lookup(self, task: str, key: str) -> Tuple[bool, object]:
+        row = self.connect().execute(
+            "SELECT result FROM results WHERE task = ? AND key = ?", (task, key)
+        ).fetchone()
+
+        if row is None:
+            return False, None
+
+        return True, pickle.loads(row[0])
+
+    def record(self, task: str, key: str, result) -> None:
+        """Record a completed item, to be written with the next batch"""
+        try:
+            blob = pickle.dumps(result)
+        except Exception:
+            # the item is simply performed again on resume
+            return
+
+        with self.lock:
+            self.pending.append((task, key, blob))
+            due = time.monotonic() - self.last_write >= self.interval
+
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every result recorded so far"""
+        with self.lock:
+            pending = self.pending
+            self.pending = []
+            self.last_write = time.monotonic()
+
+        if not pending:
+            return
+
+        db = self.connect()
+        db.execute("BEGIN")
+        db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", pending)
+        db.execute("COMMIT")
+
+    def completed(self, task: str) -> int:
+        """Number of items of task recorded"""
+        return self.connect().execute(
+            "SELECT COUNT(*) FROM results WHERE task = ?", (task,)
+        ).fetchone()[0]
+
+    def for_task(self, task: str) -> "TaskCheckpoint":
+        return TaskCheckpoint(self, task)
+
+
+class TaskCheckpoint(Cache):
+    """A task's view of a Checkpoint, looked up like its cache"""
+
+    def __init__(self, checkpoint: Checkpoint, task: str):
+        super().__init__()
+        self.checkpoint = checkpoint
+        self.task = task
+
+        # counted in this process only
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def lookup(self, key: Hashable) -> Tuple[bool, object]:
+        hit, result = self.checkpoint.lookup(self.task, key)
+        if hit:
+            self.n_hits += 1
+        else:
+            self.n_misses += 1
+
+        return hit, result
+
+    def store(self, key: Hashable, result) -> None:
+        self.checkpoint.record(self.task, key, result)
+
+    def flush(self) -> None:
+        self.checkpoint.flush()
+
+    @property
+    def hits(self) -> int:
+        return self.n_hits
+
+    @property
+    def misses(self) -> int:
+        return self.n_misses
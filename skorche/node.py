@@ -12,3 +12,10 @@ class Node:
         self.type = type
 
         self.children = set()
+
+    def __getstate__(self):
+        # Graph edges are only needed in the process that built the pipeline,
+        # so don't drag the rest of the graph along when pickling a node
+        state = self.__dict__.copy()
+        state["children"] = set()
+        return state
@@ -1,8 +1,17 @@
+from .cache import default_key
 from .constants import QUEUE_SENTINEL
 from .node import Node, NodeType
+from .ordering import SKIPPED, Reorderer, retag, untag
 from .queue import Queue
 
-from typing import Callable, Dict, Tuple
+import asyncio
+from collections import deque
+import copy
+import math
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
 
 
 class Op(Node):
@@ -10,6 +19,67 @@ class Op(Node):
 
     def __init__(self):
         super().__init__(NodeType.OP)
+        self.shutdown = False
+        self.fail_lock = threading.Lock()
+
+        # NodeStats set by skorche.run(profile=True)
+        self.stats = None
+
+    def inputs(self) -> List[Queue]:
+        """Queues this op consumes from"""
+        return [self.queue_in]
+
+    def outputs(self) -> List[Queue]:
+        """Queues this op produces to"""
+        return [self.queue_out]
+
+    def handle_item(self, queue_in: Queue, task_item):
+        """Handles a single task item (or sentinel) popped from queue_in"""
+        raise NotImplementedError
+
+    def handle(self, queue_in: Queue, task_item):
+        """handle_item, timed if the op is being profiled"""
+        if self.stats is None or task_item is QUEUE_SENTINEL:
+            return self.handle_item(queue_in, task_item)
+
+        start = time.perf_counter()
+        try:
+            return self.handle_item(queue_in, task_item)
+        finally:
+            self.stats.record(time.perf_counter() - start)
+
+    def fail(self):
+        """
+        Called when the op raised. Ends every output queue, once, so the
+        nodes downstream finish instead of waiting on the op forever.
+        """
+        with self.fail_lock:
+            if self.shutdown:
+                return
+            self.shutdown = True
+
+        for queue_out in self.outputs():
+            queue_out.put(QUEUE_SENTINEL)
+
+    def emit(self, item, queue_out: Queue):
+        """Push an item, or batch, downstream"""
+        queue_out.put(item)
+
+        if self.stats:
+            self.stats.count_out()
+
+    def handle_op(self):
+        """
+        Handles whatever is currently waiting on the input queues without
+        blocking. Used by the "poll" scheduler which calls this in a loop.
+        """
+        for queue_in in self.inputs():
+            while not self.shutdown and not queue_in.empty():
+                task_item = queue_in.get()
+                queue_in.task_done()
+                self.handle(queue_in, task_item)
+
+        return self.shutdown
 
 
 class SplitOp(Op):
@@ -20,31 +90,31 @@ class SplitOp(Op):
         self.predicate_fn = predicate_fn
         self.queue_in = queue_in
         self.queue_out_dict = queue_out_dict
-        self.shutdown = False
 
     def __str__(self):
         return f"Split({self.predicate_fn.__name__})"
 
-    def handle_op(self):
+    def outputs(self) -> List[Queue]:
+        return list(self.queue_out_dict.values())
+
+    def handle_item(self, queue_in: Queue, task_item):
         """
-        Gets task item, evaluates a predicate function, and pushes item
+        Evaluates a predicate function on the task item, and pushes it
         on to appropriate output queue.
         """
 
-        if not self.queue_in.empty():
-            task_item = self.queue_in.get()
-            self.queue_in.task_done()
-
-            if task_item == QUEUE_SENTINEL:
-                # push sentinel to output queues and set shutdown flag
-                self.handle_sentinel()
+        if task_item is QUEUE_SENTINEL:
+            # push sentinel to output queues and set shutdown flag
+            self.handle_sentinel()
 
+        else:
+            _, value = untag(task_item)
+            if value is SKIPPED:
+                # any branch will do, as long as the ordered stage hears of it
+                queue_to_push = next(iter(self.queue_out_dict.values()))
             else:
-                predicate_value = self.predicate_fn(task_item)
-                queue_to_push = self.queue_out_dict[predicate_value]
-                queue_to_push.put(task_item)
-
-        return self.shutdown
+                queue_to_push = self.queue_out_dict[self.predicate_fn(value)]
+            self.emit(task_item, queue_to_push)
 
     def handle_sentinel(self):
         """Push the sentinel to all consumers"""
@@ -55,101 +125,477 @@ class SplitOp(Op):
         self.shutdown = True
 
 
+class PartitionOp(SplitOp):
+    def __init__(self, key_fn: Callable, queue_in: Queue, queues_out: List[Queue]):
+        """
+        Op node hash partitioning a queue by the key of each item, so that
+        items with equal keys always reach the same output queue
+        """
+        super().__init__(self.partition_of, queue_in, dict(enumerate(queues_out)))
+        self.key_fn = key_fn
+        self.n_partitions = len(queues_out)
+
+    def __str__(self):
+        return f"Partition({self.key_fn.__name__})"
+
+    def partition_of(self, item) -> int:
+        # unlike hash(), the digest is the same in every run, so a resumed
+        # run sends each key to the same partition as before
+        return int(default_key(self.key_fn(item)), 16) % self.n_partitions
+
+
+class BalanceOp(SplitOp):
+    def __init__(self, queue_in: Queue, queues_out: List[Queue]):
+        """
+        Op node sending each item to whichever output queue holds the fewest,
+        taking turns between queues that hold as few
+        """
+        super().__init__(self.shortest, queue_in, dict(enumerate(queues_out)))
+        self.queues = list(queues_out)
+        self.turn = 0
+
+    def __str__(self):
+        return "Balance"
+
+    def shortest(self, item) -> int:
+        n = len(self.queues)
+        order = [(self.turn + i) % n for i in range(n)]
+        index = min(order, key=lambda i: self.queues[i].qsize())
+
+        self.turn = (index + 1) % n
+        return index
+
+
 class MergeOp(Op):
-    def __init__(self, queues_in: Tuple[Queue], queue_out: Queue):
-        """Op node for merging a number of input queues"""
+    def __init__(
+        self,
+        queues_in: Tuple[Queue],
+        queue_out: Queue,
+        reorderer: Reorderer = None,
+        weights=None,
+        burst: int = 1,
+    ):
+        """
+        Op node for merging a number of input queues. Given a reorderer,
+        items are merged back into the order they were tagged in upstream.
+
+        Each input hands over up to burst items already waiting at once.
+        While the output queue is slow to take them, waiting bursts are
+        sent in proportion to the weight of their input, or, with weights
+        "depth", to how many items it has waiting.
+        """
         super().__init__()
+
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        if weights not in (None, "depth"):
+            weights = tuple(weights)
+            if len(weights) != len(queues_in) or min(weights) <= 0:
+                raise ValueError("Need one positive weight per input queue")
+
         self.queues_in = queues_in
         self.queue_out = queue_out
-        self.shutdown = False
+        self.reorderer = reorderer
+        self.weights = weights
+        self.burst = burst
 
         # for N input queues, expect N sentinels, but only push sentinel
         # to output when N sentinels have been reached
         self.sentinels_reached = 0
         self.sentinels_expected = len(self.queues_in)
 
+        # input queues may be handled from separate threads
+        self.lock = threading.Lock()
+
+        # the burst each input is waiting to send, sent by whichever of
+        # their listeners is sending, in weighted round robin order
+        self.pending = {}
+        self.credit = {queue_in: 0.0 for queue_in in self.queues_in}
+        self.sending = False
+        self.sent = threading.Condition(self.lock)
+
     def __str__(self):
         return "Merge"
 
-    def handle_op(self):
+    def inputs(self) -> List[Queue]:
+        return list(self.queues_in)
+
+    def handle_item(self, queue_in: Queue, task_item):
         """
-        Pops a value from any input queue and pushes to the output queue
+        Pushes a value popped from any input queue to the output queue
         """
-        for q_in in self.queues_in:
-            if not q_in.empty():
-                task_item = q_in.get()
-                q_in.task_done()
+        if task_item is QUEUE_SENTINEL:
+            self.handle_sentinel()
+
+        elif self.weights is None and self.burst == 1 or on_loop():
+            # a single listener, or one on the loop, has nobody to take turns with
+            self.send(task_item)
+
+        else:
+            self.send_burst(queue_in, self.take_burst(queue_in, task_item))
+
+    def send(self, item):
+        if self.reorderer:
+            self.reorderer.push(item, self.emit_out)
+        else:
+            self.emit(item, self.queue_out)
+
+    def emit_out(self, item):
+        self.emit(item, self.queue_out)
+
+    def take_burst(self, queue_in: Queue, first_item) -> List:
+        """first_item and up to burst - 1 more items already waiting on queue_in"""
+        burst = [first_item]
+        while len(burst) < self.burst:
+            try:
+                task_item = queue_in.get(block=False)
+            except queue.Empty:
+                break
+            queue_in.task_done()
 
-                if task_item == QUEUE_SENTINEL:
-                    self.handle_sentinel()
+            if task_item is QUEUE_SENTINEL:
+                # handed back, so the listener of queue_in sees it and stops
+                queue_in.put(QUEUE_SENTINEL)
+                break
 
-                else:
-                    self.queue_out.put(task_item)
+            burst.append(task_item)
 
-        return self.shutdown
+        if self.stats:
+            self.stats.count_in(len(burst) - 1)
+
+        return burst
+
+    def send_burst(self, queue_in: Queue, burst: List):
+        """
+        Queue the burst and wait until it has been sent. A listener finding
+        nobody sending sends waiting bursts in turn until its own is out,
+        then leaves the sending to a listener still waiting.
+        """
+        with self.lock:
+            self.pending[queue_in] = burst
+
+            while queue_in in self.pending:
+                if self.sending:
+                    self.sent.wait()
+                    continue
+
+                self.sending = True
+                try:
+                    while queue_in in self.pending:
+                        turn = self.next_turn()
+                        items = self.pending.pop(turn)
+
+                        self.lock.release()
+                        try:
+                            for item in items:
+                                self.send(item)
+                        finally:
+                            self.lock.acquire()
+
+                        self.sent.notify_all()
+                finally:
+                    self.sending = False
+                    self.sent.notify_all()
+
+    def weight(self, queue_in: Queue) -> float:
+        if self.weights is None:
+            return 1.0
+
+        if self.weights == "depth":
+            # the burst taken counts too, so an input that just emptied still gets a turn
+            return 1.0 + queue_in.qsize()
+
+        return self.weights[self.queues_in.index(queue_in)]
+
+    def next_turn(self) -> Queue:
+        """
+        Smooth weighted round robin: every waiting input earns its weight in
+        credit, and the one with the most is sent and pays back the total
+        """
+        weights = {queue_in: self.weight(queue_in) for queue_in in self.pending}
+        for queue_in, weight in weights.items():
+            self.credit[queue_in] += weight
+
+        turn = max(weights, key=lambda queue_in: self.credit[queue_in])
+        self.credit[turn] -= sum(weights.values())
+        return turn
 
     def handle_sentinel(self):
         """if expected number of sentinels have been encountered, push sentinel to output"""
 
-        self.sentinels_reached += 1
-        if self.sentinels_reached == self.sentinels_expected:
-            self.queue_out.put(QUEUE_SENTINEL)
+        with self.lock:
+            self.sentinels_reached += 1
+            if self.sentinels_reached == self.sentinels_expected:
+                if self.reorderer:
+                    self.reorderer.drain(self.emit_out)
 
-            self.shutdown = True
+                self.queue_out.put(QUEUE_SENTINEL)
+
+                self.shutdown = True
+
+
+def on_loop() -> bool:
+    """True if called from the async engine's event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+
+    return True
+
+
+class TimedOp(Op):
+    """
+    Op that also has to act when time passes, not only when items arrive.
+    Once started, a flusher thread calls send_due() at every deadline().
+    Every change to the op's state is made under its lock.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.wakeup = threading.Condition(self.lock)
+        self.flusher = None
+
+    def deadline(self) -> float:
+        """time.monotonic() by which send_due() must be called, or None"""
+        raise NotImplementedError
+
+    def send_due(self):
+        """Send whatever is due, and notify wakeup"""
+        raise NotImplementedError
+
+    def start_flusher(self):
+        if self.flusher is not None:
+            return
+
+        # an op on the async engine's loop must send from the loop
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        self.flusher = threading.Thread(
+            target=self.flush_when_due,
+            args=(loop,),
+            name="skorche-flusher",
+            daemon=True,
+        )
+        self.flusher.start()
+
+    def flush_when_due(self, loop: asyncio.AbstractEventLoop = None):
+        """Flusher thread calling send_due() by each deadline"""
+        with self.lock:
+            while not self.shutdown:
+                deadline = self.deadline()
+                if deadline is None:
+                    self.wakeup.wait()
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self.wakeup.wait(remaining)
+
+                elif loop is None:
+                    self.send_due()
+
+                else:
+                    loop.call_soon_threadsafe(self.send_due)
+                    self.wakeup.wait()
 
 
-class BatchOp(Op):
+class BatchOp(TimedOp):
     def __init__(
-        self, queue_in: Queue, queue_out: Queue, batch_size: int, fill_batch: bool
+        self,
+        queue_in: Queue,
+        queue_out: Queue,
+        batch_size: int,
+        fill_batch: bool,
+        max_wait: float = None,
+        min_size: int = 1,
+        target_latency: float = None,
+        max_bytes: int = None,
+        sizeof: Callable = None,
     ):
-        """Op node for batching"""
+        """
+        Op node for batching.
+
+        A batch is sent once it holds batch_size items or max_bytes bytes,
+        once its first item has waited max_wait seconds, or, if fill_batch
+        is False, as soon as nothing more is waiting and it holds at least
+        min_size items. With a target_latency the wait adapts to how fast
+        items arrive and how long the next stage takes over a batch.
+        """
         super().__init__()
+
+        if batch_size is None and max_bytes is None:
+            raise ValueError("Need a batch_size or max_bytes")
+
+        if min_size < 1 or (batch_size is not None and min_size > batch_size):
+            raise ValueError("Need 1 <= min_size <= batch_size")
+
+        if sizeof is not None and max_bytes is None:
+            raise ValueError("sizeof is only used with max_bytes")
+
+        for name, value in (("max_wait", max_wait), ("target_latency", target_latency)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive")
+
         self.queue_in = queue_in
         self.queue_out = queue_out
         self.batch_size = batch_size
         self.fill_batch = fill_batch
+        self.max_wait = max_wait
+        self.min_size = min_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or len
 
         # Buffer for collecting tasks
         self.buffer = []
+        self.buffer_bytes = 0
+        self.first_item_time = None
 
-        self.shutdown = False
+        # the buffer is sent on time by the flusher if batches have a deadline
+        # mean seconds between items, and counts to turn the consumer's
+        # time per batch into a time per item, for the adaptive mode
+        self.mean_gap = None
+        self.last_item_time = None
+        self.items_sent = 0
+        self.batches_sent = 0
 
     def __str__(self):
         return f"Batch(batch_size={self.batch_size})"
 
-    def handle_op(self):
+    def handle_item(self, queue_in: Queue, task_item):
         """
         Handles task batching
         """
-        while not self.queue_in.empty():
-            task_item = self.queue_in.get()
-            self.queue_in.task_done()
-
-            if task_item == QUEUE_SENTINEL:
+        with self.lock:
+            if task_item is QUEUE_SENTINEL:
                 # send whatever is currently in buffer as a batch
-                self.send_batch()
+                if len(self.buffer):
+                    self.send_batch()
 
                 # send sentinel value
                 self.queue_out.put(QUEUE_SENTINEL)
                 self.shutdown = True
-                break
+                self.wakeup.notify_all()
+                return
+
+            now = time.monotonic()
+            if self.last_item_time is not None:
+                gap = now - self.last_item_time
+                if self.mean_gap is None:
+                    self.mean_gap = gap
+                else:
+                    self.mean_gap = 0.8 * self.mean_gap + 0.2 * gap
+            self.last_item_time = now
 
-            else:
-                # Add task to buffer and send if batch_size reached
-                self.buffer.append(task_item)
-                if len(self.buffer) == self.batch_size:
+            size = self.sizeof(task_item) if self.max_bytes is not None else 0
+            if self.buffer and self.buffer_bytes + size > self.max_bytes_or_inf():
+                # the item would overflow the batch, so it starts the next one
+                self.send_batch()
+
+            # Add task to buffer and send if batch_size or max_bytes reached
+            if not self.buffer:
+                self.first_item_time = now
+            self.buffer.append(task_item)
+            self.buffer_bytes += size
+
+            if self.full():
+                self.send_batch()
+
+            # send whatever else is left in the buffer if nothing more is waiting
+            elif (
+                not self.fill_batch
+                and len(self.buffer) >= self.min_size
+                and queue_in.empty()
+            ):
+                self.send_batch()
+
+            elif self.timed():
+                deadline = self.deadline()
+                if deadline <= time.monotonic():
                     self.send_batch()
+                else:
+                    self.start_flusher()
+                    self.wakeup.notify()
 
-        # send whatever else is left in the buffer
-        if not self.fill_batch and len(self.buffer):
-            self.send_batch()
+    def max_bytes_or_inf(self) -> float:
+        return float("inf") if self.max_bytes is None else self.max_bytes
 
-        return self.shutdown
+    def full(self) -> bool:
+        return (
+            self.batch_size is not None and len(self.buffer) >= self.batch_size
+        ) or self.buffer_bytes >= self.max_bytes_or_inf()
+
+    def timed(self) -> bool:
+        """Whether batches have a deadline"""
+        return self.max_wait is not None or self.target_latency is not None
+
+    def deadline(self) -> float:
+        """
+        time.monotonic() by which the buffered batch must be sent, or None
+        if the buffer is empty or batches are only sent once full.
+
+        In the adaptive mode that is the last moment waiting for one more
+        item still has the first item through the next stage within
+        target_latency.
+        """
+        if not self.buffer or not self.timed():
+            return None
+
+        deadline = float("inf")
+        if self.max_wait is not None:
+            deadline = self.first_item_time + self.max_wait
+
+        if self.target_latency is not None:
+            wait = (
+                self.target_latency
+                - self.consumer_time(len(self.buffer) + 1)
+                - (self.mean_gap or 0.0)
+            )
+            deadline = min(deadline, self.first_item_time + wait)
+
+        return deadline
+
+    def consumer_time(self, n_items: int) -> float:
+        """
+        Seconds the stage consuming queue_out is expected to take over a
+        batch of n_items, learned from its NodeStats. Zero until it has
+        handled a batch.
+        """
+        consumer = next(iter(self.queue_out.children), None)
+        stats = getattr(consumer, "stats", None)
+        if not stats or not stats.items_in or not self.items_sent:
+            return 0.0
+
+        time_per_batch = stats.busy / stats.items_in
+        items_per_batch = self.items_sent / self.batches_sent
+        return n_items * time_per_batch / items_per_batch
+
+    def send_due(self):
+        """Send the buffered batch if its deadline has passed"""
+        with self.lock:
+            deadline = self.deadline()
+            if deadline is not None and deadline <= time.monotonic():
+                self.send_batch()
+
+            self.wakeup.notify()
 
     def send_batch(self):
         """Sends buffer into output queue and clear buffer"""
-        self.queue_out.put(self.buffer)
-        self.buffer = []
+        with self.lock:
+            self.emit(self.buffer, self.queue_out)
+            self.items_sent += len(self.buffer)
+            self.batches_sent += 1
+
+            self.buffer = []
+            self.buffer_bytes = 0
+            self.first_item_time = None
+            self.wakeup.notify()
 
 
 class UnbatchOp(Op):
@@ -159,63 +605,373 @@ class UnbatchOp(Op):
         self.queue_in = queue_in
         self.queue_out = queue_out
 
-        self.shutdown = False
-
     def __str__(self):
         return "Unbatch"
 
-    def handle_op(self):
+    def handle_item(self, queue_in: Queue, task_batch):
         """
         Handles task unbatching
         """
 
-        while not self.queue_in.empty():
-            task_batch = self.queue_in.get()
-            self.queue_in.task_done()
-
-            if task_batch == QUEUE_SENTINEL:
-                # send sentinel value
-                self.queue_out.put(QUEUE_SENTINEL)
-                self.shutdown = True
-                break
-
-            else:
-                for task_item in task_batch:
-                    self.queue_out.put(task_item)
+        if task_batch is QUEUE_SENTINEL:
+            # send sentinel value
+            self.queue_out.put(QUEUE_SENTINEL)
+            self.shutdown = True
 
-        return self.shutdown
+        else:
+            for task_item in task_batch:
+                self.emit(task_item, self.queue_out)
 
 
 class FilterOp(Op):
     def __init__(self, predicate_fn: Callable, queue_in: Queue, queue_out: Queue):
-        """Op node for unbatching"""
+        """Op node for filtering"""
         super().__init__()
         self.queue_in = queue_in
         self.queue_out = queue_out
         self.predicate_fn = predicate_fn
 
-        self.shutdown = False
-
     def __str__(self):
         return f"Filter({self.predicate_fn.__name__})"
 
-    def handle_op(self):
+    def handle_item(self, queue_in: Queue, task_item):
         """
-        Handles task unbatching
+        Handles task filtering
         """
 
-        while not self.queue_in.empty():
-            task_item = self.queue_in.get()
-            self.queue_in.task_done()
+        if task_item is QUEUE_SENTINEL:
+            # send sentinel value
+            self.queue_out.put(QUEUE_SENTINEL)
+            self.shutdown = True
 
-            if task_item == QUEUE_SENTINEL:
-                # send sentinel value
+        else:
+            tags, value = untag(task_item)
+            if value is SKIPPED or self.predicate_fn(value):
+                self.emit(task_item, self.queue_out)
+            elif tags:
+                # still accounted for, so the ordered stage doesn't wait on it
+                self.emit(retag(tags, SKIPPED), self.queue_out)
+
+
+class ReorderOp(Op):
+    def __init__(self, queue_in: Queue, queue_out: Queue, reorderer: Reorderer):
+        """Op node putting the results of an ordered map back in input order"""
+        super().__init__()
+        self.queue_in = queue_in
+        self.queue_out = queue_out
+        self.reorderer = reorderer
+
+    def __str__(self):
+        return "Reorder"
+
+    def handle_item(self, queue_in: Queue, task_item):
+        if task_item is QUEUE_SENTINEL:
+            self.reorderer.drain(self.emit_out)
+            self.queue_out.put(QUEUE_SENTINEL)
+            self.shutdown = True
+
+        else:
+            self.reorderer.push(task_item, self.emit_out)
+
+    def emit_out(self, item):
+        self.emit(item, self.queue_out)
+
+
+# Stands in for the initial value of a fold that starts from its first item
+NO_INITIAL = object()
+
+
+class Fold:
+    """agg_fn applied to every item in turn, starting from initial"""
+
+    def __init__(self, agg_fn: Callable, initial=NO_INITIAL):
+        self.agg_fn = agg_fn
+
+        # initial may be mutable, and every fold changes its own copy
+        self.value = initial if initial is NO_INITIAL else copy.deepcopy(initial)
+
+    def add(self, item):
+        if self.value is NO_INITIAL:
+            self.value = item
+        else:
+            self.value = self.agg_fn(self.value, item)
+
+    def empty(self) -> bool:
+        return self.value is NO_INITIAL
+
+
+class ReduceOp(Op):
+    def __init__(self, fn: Callable, queue_in: Queue, queue_out: Queue, initial=NO_INITIAL):
+        """
+        Op node folding every item into a single result with fn(result, item),
+        sent on once the input ends
+        """
+        super().__init__()
+        self.queue_in = queue_in
+        self.queue_out = queue_out
+        self.fn = fn
+        self.fold = Fold(fn, initial)
+
+    def __str__(self):
+        return f"Reduce({self.fn.__name__})"
+
+    def handle_item(self, queue_in: Queue, task_item):
+        if task_item is QUEUE_SENTINEL:
+            if not self.fold.empty():
+                self.emit(self.fold.value, self.queue_out)
+
+            self.queue_out.put(QUEUE_SENTINEL)
+            self.shutdown = True
+
+        else:
+            self.fold.add(task_item)
+
+
+class GroupByOp(Op):
+    def __init__(
+        self,
+        key_fn: Callable,
+        agg_fn: Callable,
+        queue_in: Queue,
+        queue_out: Queue,
+        initial=NO_INITIAL,
+    ):
+        """
+        Op node folding the items of each key_fn(item) separately with
+        agg_fn(result, item). A (key, result) pair per key, in the order the
+        keys were first seen, is sent on once the input ends.
+        """
+        super().__init__()
+        self.queue_in = queue_in
+        self.queue_out = queue_out
+        self.key_fn = key_fn
+        self.agg_fn = agg_fn
+        self.initial = initial
+        self.folds = {}
+
+    def __str__(self):
+        return f"GroupBy({self.key_fn.__name__})"
+
+    def handle_item(self, queue_in: Queue, task_item):
+        if task_item is QUEUE_SENTINEL:
+            for key, fold in self.folds.items():
+                self.emit((key, fold.value), self.queue_out)
+
+            self.folds = {}
+            self.queue_out.put(QUEUE_SENTINEL)
+            self.shutdown = True
+
+        else:
+            key = self.key_fn(task_item)
+            if key not in self.folds:
+                self.folds[key] = Fold(self.agg_fn, self.initial)
+            self.folds[key].add(task_item)
+
+
+class WindowOp(TimedOp):
+    def __init__(
+        self,
+        queue_in: Queue,
+        queue_out: Queue,
+        size: int = None,
+        step: int = None,
+        duration: float = None,
+        every: float = None,
+        agg_fn: Callable = None,
+        initial=NO_INITIAL,
+        timestamp: Callable = None,
+    ):
+        """
+        Op node for tumbling and sliding windows. A window holds size items
+        and one starts every step items, or it spans duration seconds and
+        one starts every every seconds. Time is when items arrive, or
+        timestamp(item). Each window is sent on once complete, as agg_fn
+        folded over its items or as a list of them. Windows with items not
+        yet sent in an earlier one are sent, incomplete, when the input
+        ends. Empty windows are not sent, nor are items timestamped before
+        a window already sent.
+        """
+        super().__init__()
+
+        if (size is None) == (duration is None):
+            raise ValueError("Need either a size or a duration")
+
+        if size is not None:
+            if every is not None or timestamp is not None:
+                raise ValueError("every and timestamp are only used with a duration")
+
+            step = size if step is None else step
+            if size < 1 or step < 1:
+                raise ValueError("size and step must be at least 1")
+
+        else:
+            if step is not None:
+                raise ValueError("step is only used with a size")
+
+            every = duration if every is None else every
+            if duration <= 0 or every <= 0:
+                raise ValueError("duration and every must be positive")
+
+        self.queue_in = queue_in
+        self.queue_out = queue_out
+        self.size = size
+        self.duration = duration
+        self.agg_fn = agg_fn
+        self.initial = initial
+        self.timestamp = timestamp
+
+        # windows are [start, start + length) in item counts or seconds,
+        # and one starts every hop
+        self.length = size if size is not None else duration
+        self.hop = step if size is not None else every
+
+        # start of the earliest window not sent yet, and end of the last sent
+        self.next_start = 0 if size is not None else None
+        self.sent_until = self.next_start
+        self.last_position = None
+        self.n_items = 0
+
+        # (position, item) of every item still in a window to be sent, or,
+        # for tumbling windows with an agg_fn, a running fold of the window
+        self.items = deque()
+        self.incremental = agg_fn is not None and self.hop == self.length
+        self.fold = None
+        self.fold_start = None
+
+    def __str__(self):
+        if self.size is not None:
+            return f"Window(size={self.size}, step={self.hop})"
+
+        return f"Window(duration={self.duration}, every={self.hop})"
+
+    def handle_item(self, queue_in: Queue, task_item):
+        with self.lock:
+            if task_item is QUEUE_SENTINEL:
+                self.send_remaining()
                 self.queue_out.put(QUEUE_SENTINEL)
                 self.shutdown = True
-                break
-
+                self.wakeup.notify_all()
+                return
+
+            # an item completes a count window, but only follows a time window
+            if self.size is not None:
+                self.add(self.n_items, task_item)
+                self.n_items += 1
+                self.send_complete(self.n_items)
+                return
+
+            if self.timestamp is None:
+                position = time.monotonic()
             else:
-                if self.predicate_fn(task_item):
-                    self.queue_out.put(task_item)
-
-        return self.shutdown
+                position = self.timestamp(task_item)
+
+            if self.next_start is None:
+                self.next_start = self.sent_until = position
+
+            self.send_complete(position)
+            self.add(position, task_item)
+
+            if self.timestamp is None:
+                self.start_flusher()
+                self.wakeup.notify()
+
+    def add(self, position, item):
+        if position < self.next_start:
+            # too late for its windows, or between two hopping windows
+            return
+
+        if self.last_position is None or position > self.last_position:
+            self.last_position = position
+
+        if not self.incremental:
+            self.items.append((position, item))
+            return
+
+        if self.fold is None:
+            self.fold = Fold(self.agg_fn, self.initial)
+            self.fold_start = position
+        self.fold.add(item)
+
+    def first_position(self):
+        """Position of the earliest item held, or None"""
+        if self.incremental:
+            return self.fold_start if self.fold is not None else None
+
+        return min((position for position, _ in self.items), default=None)
+
+    def skip_to(self, position):
+        """Move next_start on to the earliest window holding position"""
+        n_hops = math.floor((position - self.length - self.next_start) / self.hop) + 1
+        if n_hops > 0:
+            self.next_start += n_hops * self.hop
+
+    def send_complete(self, position):
+        """Send every window ending by position"""
+        while self.next_start + self.length <= position:
+            first = self.first_position()
+            if first is None:
+                self.skip_to(position)
+                return
+
+            if first >= self.next_start + self.length:
+                self.skip_to(first)
+                continue
+
+            self.send_window()
+
+    def send_remaining(self):
+        """Send every window holding items not sent in an earlier one"""
+        while self.last_position is not None and self.last_position >= self.sent_until:
+            first = self.first_position()
+            if first is None:
+                return
+
+            if first >= self.next_start + self.length:
+                self.skip_to(first)
+                continue
+
+            self.send_window()
+
+    def send_window(self):
+        """Send the window starting at next_start and move on to the next"""
+        end = self.next_start + self.length
+
+        if self.incremental:
+            if self.fold is not None:
+                self.emit(self.fold.value, self.queue_out)
+            self.fold = None
+
+        else:
+            window = [item for position, item in self.items if position < end]
+            if window and self.agg_fn is None:
+                self.emit(window, self.queue_out)
+            elif window:
+                fold = Fold(self.agg_fn, self.initial)
+                for item in window:
+                    fold.add(item)
+                self.emit(fold.value, self.queue_out)
+
+        self.sent_until = end
+        self.next_start += self.hop
+
+        # items before the next window won't be in any other
+        self.items = deque(
+            (position, item) for position, item in self.items if position >= self.next_start
+        )
+
+    def deadline(self) -> float:
+        """End of the earliest window, when windows close as time passes"""
+        if self.timestamp is not None or self.size is not None:
+            return None
+
+        if self.first_position() is None:
+            return None
+
+        return self.next_start + self.length
+
+    def send_due(self):
+        with self.lock:
+            if self.next_start is not None:
+                self.send_complete(time.monotonic())
+
+            self.wakeup.notify()
@@ -0,0 +1,105 @@
+import threading
+from typing import Callable, Tuple
+
+# Default number of items an ordered stage lets into flight at once
+ORDER_WINDOW = 1024
+
+
+class Sequenced:
+    """An item tagged with its position in the input of an ordered stage"""
+
+    def __init__(self, seq: int, item):
+        self.seq = seq
+        self.item = item
+
+
+class Skipped:
+    """
+    Stands in for an item dropped by a filter, or failed by a task, inside
+    an ordered stage so that the stage does not wait for it.
+    """
+
+    def __reduce__(self):
+        # pickled by reference, so it stays a singleton across processes
+        return "SKIPPED"
+
+    def __repr__(self):
+        return "SKIPPED"
+
+
+SKIPPED = Skipped()
+
+
+def untag(item) -> Tuple[tuple, object]:
+    """
+    Splits an item into the sequence numbers of the ordered stages it is
+    inside, outermost first, and the item itself
+    """
+    tags = ()
+    while isinstance(item, Sequenced):
+        tags += (item.seq,)
+        item = item.item
+
+    return tags, item
+
+
+def retag(tags: tuple, item):
+    """Inverse of untag()"""
+    for seq in reversed(tags):
+        item = Sequenced(seq, item)
+
+    return item
+
+
+class Reorderer:
+    """
+    Reorder buffer of an ordered stage. Items tagged by the queue at the
+    start of the stage are emitted in sequence order, with their tag taken
+    off, as soon as every item before them has been. At most window items
+    are held, as the tagging queue lets no more than that into flight.
+    """
+
+    def __init__(self, queue_tagged, window: int):
+        """
+        Args:
+            queue_tagged (Queue): Queue tagging the items at the start of
+                the stage, told how far the stage has got.
+            window (int): Number of items let into flight at once.
+        """
+        self.queue_tagged = queue_tagged
+        self.window = window
+
+        self.pending = {}
+        self.next_seq = 0
+        self.lock = threading.Lock()
+
+        # release in steps rather than on every item, it may mean a round
+        # trip to the manager
+        self.released = 0
+        self.release_every = max(1, window // 8)
+
+    def push(self, item: Sequenced, emit: Callable) -> None:
+        """Buffer item and emit every item now in order"""
+        with self.lock:
+            self.pending[item.seq] = item.item
+
+            while self.next_seq in self.pending:
+                self.emit(self.pending.pop(self.next_seq), emit)
+                self.next_seq += 1
+
+            if self.next_seq - self.released >= self.release_every:
+                self.released = self.next_seq
+                self.queue_tagged.sequence.release(self.next_seq)
+
+    def drain(self, emit: Callable) -> None:
+        """Emit whatever is left in order, once the input has ended"""
+        with self.lock:
+            for seq in sorted(self.pending):
+                self.emit(self.pending[seq], emit)
+
+            self.pending = {}
+
+    def emit(self, item, emit: Callable) -> None:
+        # items still inside an outer ordered stage keep their skip marker
+        if item is not SKIPPED:
+            emit(item)
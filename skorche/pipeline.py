@@ -1,15 +1,38 @@
 # package imports
+from .aio import AsyncEngine
+from .autoscaler import Autoscaler
+from .backend import AsyncQueueBackend, get_queue_backend
+from .checkpoint import CHECKPOINT_INTERVAL, Checkpoint
+from .constants import QUEUE_SENTINEL
 from .node import Node, NodeType
-from .op import SplitOp, MergeOp, BatchOp, UnbatchOp, FilterOp, Op
+from .op import (
+    NO_INITIAL,
+    SplitOp,
+    PartitionOp,
+    BalanceOp,
+    MergeOp,
+    BatchOp,
+    UnbatchOp,
+    FilterOp,
+    Op,
+    ReorderOp,
+    ReduceOp,
+    GroupByOp,
+    WindowOp,
+)
+from .ordering import ORDER_WINDOW, Reorderer
+from .pipeline_run import PipelineRun
+from .pool import WorkerPool
+from .profiler import NodeStats, Profiler
 from .queue import Queue
-from .task import Task
+from .task import FusedTask, Task
 
 
 # standard library imports
 from collections import deque
 import concurrent.futures
-from multiprocessing import Manager
-from typing import Callable, List, Tuple
+import pickle
+from typing import Callable, Dict, List, Tuple
 
 
 # dependency imports
@@ -24,6 +47,9 @@ class PipelineManager:
         self.ops = []
         self.op_table = {}
         self.pool_table = {}
+        self.op_pool = None
+        self.feeder_pool = None
+        self.pipeline_run = None
 
         # To keep track of all queues
         self.queues = set()
@@ -31,8 +57,20 @@ class PipelineManager:
         # this should only ever be touched with new_qid()
         self._queue_counter = 0
 
-        # This will be initialized in run()
-        self.mp_manager = None 
+        # These will be initialized in run()
+        self.queue_backend = None
+        self.async_engine = None
+        self.autoscaler = None
+
+        # stages replaced by a FusedTask in run(), see fuse_stages()
+        self.fused = {}
+
+        # op restoring the order of each ordered stage -> the queue tagging it
+        self.ordered = {}
+
+        # set in run() when checkpointing, with the tasks recording into it
+        self.checkpoint = None
+        self.checkpointed = []
 
 
     def new_qid(self) -> int:
@@ -40,10 +78,37 @@ class PipelineManager:
         self._queue_counter += 1
         return self._queue_counter
 
-    def map(self, task: Task, queue_in: Queue, queue_out: Queue = None) -> Queue:
+    def map(
+        self,
+        task: Task,
+        queue_in: Queue,
+        queue_out: Queue = None,
+        ordered: bool = False,
+        window: int = ORDER_WINDOW,
+    ) -> Queue:
+        if task.executor == "process":
+            # fail while building the pipeline rather than inside the pool
+            task.check_picklable()
+
         if queue_out == None:
             queue_out = Queue(id=self.new_qid())
 
+        if ordered:
+            # the task's results are put back in order by a ReorderOp
+            queue_tagged = self.map(task, queue_in, Queue(id=self.new_qid()))
+            reorderer = self.order(queue_in, window)
+
+            op = ReorderOp(queue_tagged, queue_out, reorderer)
+            self.ops.append(op)
+            self.op_table[op] = {"queues_in": [queue_tagged], "queues_out": [queue_out]}
+            self.ordered[op] = queue_in
+
+            queue_tagged.children.add(op)
+            op.children.add(queue_out)
+            self.queues.add(queue_out)
+
+            return queue_out
+
         self.task_table[task] = {"queue_in": queue_in, "queue_out": queue_out}
 
         self.queues.add(queue_in)
@@ -52,8 +117,23 @@ class PipelineManager:
         queue_in.children.add(task)
         task.children.add(queue_out)
 
+        if task.dead_letter:
+            # nothing consumes it while the run goes on, so a bound would stall the task
+            task.dead_letter_queue = Queue(
+                name="Dead letters", id=self.new_qid(), maxsize=0
+            )
+            self.queues.add(task.dead_letter_queue)
+            task.children.add(task.dead_letter_queue)
+
         return queue_out
 
+    def dead_letters(self, task: Task) -> Queue:
+        """Queue receiving a Failure for every item task gave up on"""
+        if task not in self.task_table or task.dead_letter_queue is None:
+            raise ValueError(f"{task} isn't mapped with dead_letter=True")
+
+        return task.dead_letter_queue
+
     def chain(
         self, task_list: List[Task], queue_in: Queue, queue_out: Queue = None
     ) -> Queue:
@@ -103,11 +183,66 @@ class PipelineManager:
 
         return (out_queue_map[value] for value in predicate_values)
 
-    def merge(self, queues_in: Tuple[Queue], queue_out: Queue = None) -> Queue:
+    def partition(self, key_fn: Callable, queue_in: Queue, n: int) -> Tuple[Queue]:
+        if n < 1:
+            raise ValueError("n must be at least 1")
+
+        queues_out = [Queue(name=f"Partition {i}", id=self.new_qid()) for i in range(n)]
+        op = PartitionOp(key_fn, queue_in, queues_out)
+        self.ops.append(op)
+        self.op_table[op] = {"queues_in": [queue_in], "queues_out": queues_out}
+        self.queues.add(queue_in)
+
+        queue_in.children.add(op)
+        for out_queue in queues_out:
+            op.children.add(out_queue)
+            self.queues.add(out_queue)
+
+        return tuple(queues_out)
+
+    def balance(self, queue_in: Queue, n: int) -> Tuple[Queue]:
+        if n < 1:
+            raise ValueError("n must be at least 1")
+
+        queues_out = [Queue(name=f"Branch {i}", id=self.new_qid()) for i in range(n)]
+        op = BalanceOp(queue_in, queues_out)
+        self.ops.append(op)
+        self.op_table[op] = {"queues_in": [queue_in], "queues_out": queues_out}
+        self.queues.add(queue_in)
+
+        queue_in.children.add(op)
+        for out_queue in queues_out:
+            op.children.add(out_queue)
+            self.queues.add(out_queue)
+
+        return tuple(queues_out)
+
+    def merge(
+        self,
+        queues_in: Tuple[Queue],
+        queue_out: Queue = None,
+        ordered: bool = False,
+        window: int = ORDER_WINDOW,
+        weights=None,
+        burst: int = 1,
+    ) -> Queue:
         if queue_out == None:
             queue_out = Queue(id=self.new_qid())
 
-        op = MergeOp(queues_in, queue_out)
+        reorderer = None
+        if ordered:
+            # items are tagged where the merged queues last had a common queue
+            queue_tagged = self.common_upstream(queues_in)
+            if queue_tagged is None:
+                raise ValueError(
+                    "An ordered merge needs its input queues to come from a common queue"
+                )
+            reorderer = self.order(queue_tagged, window)
+
+        op = MergeOp(queues_in, queue_out, reorderer, weights, burst)
+        if ordered:
+            self.ordered[op] = queue_tagged
+
         self.ops.append(op)
         self.op_table[op] = {"queues_in": list(queues_in), "queues_out": [queue_out]}
 
@@ -120,17 +255,135 @@ class PipelineManager:
 
         return queue_out
 
+    def order(self, queue_tagged: Queue, window: int) -> Reorderer:
+        """Make queue_tagged the start of an ordered stage"""
+        if window < 1:
+            raise ValueError("window must be at least 1")
+
+        if queue_tagged.window is not None:
+            raise ValueError(f"{queue_tagged} already starts an ordered stage")
+
+        queue_tagged.window = window
+        return Reorderer(queue_tagged, window)
+
+    def producers(self) -> Dict[Queue, List[Node]]:
+        """Nodes putting to each queue"""
+        producer_of = {}
+        for node in list(self.task_table) + self.ops:
+            for q in self.node_outputs(node):
+                producer_of.setdefault(q, []).append(node)
+
+        return producer_of
+
+    def common_upstream(self, queues: Tuple[Queue]) -> Queue:
+        """
+        The queue nearest to all of queues that every item in them came
+        through, or None if they don't share one
+        """
+        producer_of = self.producers()
+
+        distances = []
+        for q in queues:
+            distance = {q: 0}
+            frontier = deque([q])
+            while frontier:
+                queue_up = frontier.popleft()
+                for node in producer_of.get(queue_up, []):
+                    for queue_in in self.node_inputs(node):
+                        if queue_in not in distance:
+                            distance[queue_in] = distance[queue_up] + 1
+                            frontier.append(queue_in)
+            distances.append(distance)
+
+        common = set(distances[0]).intersection(*distances[1:])
+        if not common:
+            return None
+
+        return min(common, key=lambda q: max(distance[q] for distance in distances))
+
+    def check_ordered_stages(self) -> None:
+        """
+        Raises ValueError unless every path from the queue tagging each
+        ordered stage leads to the op restoring its order, and every path
+        to that op from the queue, through stages that pass sequence
+        numbers on: unbatched tasks, filters, splits and merges.
+        """
+        producer_of = self.producers()
+
+        for op, queue_tagged in self.ordered.items():
+            queues = list(op.inputs())
+            seen = set()
+            while queues:
+                q = queues.pop()
+                if q is queue_tagged or q in seen:
+                    continue
+                seen.add(q)
+
+                if q not in producer_of:
+                    raise ValueError(
+                        f"Every item reaching the {op} op must come from "
+                        f"{queue_tagged}, but {q} doesn't"
+                    )
+
+                for node in producer_of[q]:
+                    queues.extend(self.node_inputs(node))
+
+            seen = set()
+            queues = [queue_tagged]
+            while queues:
+                q = queues.pop()
+                if q in seen:
+                    continue
+                seen.add(q)
+
+                if not q.children:
+                    raise ValueError(
+                        f"Every path from {queue_tagged} must lead to the {op} op "
+                        f"ordering it, but {q} doesn't"
+                    )
+
+                for node in q.children:
+                    if node is op:
+                        continue
+
+                    if (
+                        node.type == NodeType.TASK and node.batched
+                    ) or isinstance(
+                        node, (BatchOp, UnbatchOp, ReduceOp, GroupByOp, WindowOp)
+                    ):
+                        raise ValueError(
+                            f"{node} can't be inside an ordered stage, it doesn't "
+                            "keep items one to one"
+                        )
+
+                    queues.extend(self.node_outputs(node))
+
     def batch(
         self,
         queue_in: Queue,
         queue_out: Queue = None,
         batch_size: int = 1,
         fill_batch: bool = False,
+        max_wait: float = None,
+        min_size: int = 1,
+        target_latency: float = None,
+        max_bytes: int = None,
+        sizeof: Callable = None,
     ):
         if queue_out == None:
             queue_out = Queue(id=self.new_qid())
 
-        op = BatchOp(queue_in, queue_out, batch_size, fill_batch)
+        op = BatchOp(
+            queue_in,
+            queue_out,
+            batch_size,
+            fill_batch,
+            max_wait,
+            min_size,
+            target_latency,
+            max_bytes,
+            sizeof,
+        )
         self.ops.append(op)
         self.op_table[op] = {"queues_in": [queue_in], "queues_out": [queue_out]}
 
@@ -174,69 +427,620 @@ class PipelineManager:
 
         return queue_out
 
-    def run(self) -> None:
+    def reduce(
+        self, fn: Callable, queue_in: Queue, initial=NO_INITIAL, queue_out: Queue = None
+    ) -> Queue:
+        if queue_out == None:
+            queue_out = Queue(id=self.new_qid())
+
+        return self.add_op(ReduceOp(fn, queue_in, queue_out, initial))
+
+    def group_by(
+        self,
+        key_fn: Callable,
+        agg_fn: Callable,
+        queue_in: Queue,
+        initial=NO_INITIAL,
+        queue_out: Queue = None,
+    ) -> Queue:
+        if queue_out == None:
+            queue_out = Queue(id=self.new_qid())
+
+        return self.add_op(GroupByOp(key_fn, agg_fn, queue_in, queue_out, initial))
+
+    def window(
+        self,
+        queue_in: Queue,
+        size: int = None,
+        step: int = None,
+        duration: float = None,
+        every: float = None,
+        agg_fn: Callable = None,
+        initial=NO_INITIAL,
+        timestamp: Callable = None,
+        queue_out: Queue = None,
+    ) -> Queue:
+        if queue_out == None:
+            queue_out = Queue(id=self.new_qid())
+
+        op = WindowOp(
+            queue_in, queue_out, size, step, duration, every, agg_fn, initial, timestamp
+        )
+        return self.add_op(op)
+
+    def add_op(self, op: Op) -> Queue:
+        """Add an op with one input and one output queue, returning its output"""
+        self.ops.append(op)
+        self.op_table[op] = {"queues_in": [op.queue_in], "queues_out": [op.queue_out]}
+
+        op.queue_in.children.add(op)
+        op.children.add(op.queue_out)
+
+        self.queues.add(op.queue_in)
+        self.queues.add(op.queue_out)
+
+        return op.queue_out
+
+    def stage_steps(self, node: Node):
         """
-        Runs pipeline until all tasks are completed.
-        
-        This function currently blocks by calling self.op_worker()
-        and fixing this is a TODO for the future
+        Steps node contributes to a FusedTask, or None if it can't be fused.
+        Only unbatched thread and process tasks, and filter ops, are candidates.
         """
-        
-        mp_manager = Manager()
+        if isinstance(node, FusedTask):
+            return node.steps
+
+        if node.type == NodeType.TASK:
+            if node.fuse and node.executor != "async" and not node.batched:
+                return [("map", node)]
 
-        # Give every skorche Queue a multiprocessing Queue
-        # and flush the buffer into it
+        elif isinstance(node, FilterOp):
+            return [("filter", node.predicate_fn)]
+
+        return None
+
+    def stage_queues(self, node: Node) -> Tuple[Queue, Queue]:
+        """(queue_in, queue_out) of a task or filter op"""
+        if node.type == NodeType.TASK:
+            return self.task_table[node]["queue_in"], self.task_table[node]["queue_out"]
+
+        return node.queue_in, node.queue_out
+
+    def fusable(self, producer: Node, consumer: Node) -> Task:
+        """
+        Returns the task whose settings a fusion of producer and consumer
+        would run with, or None if they can't be fused.
+        """
+        tasks = [node for node in (producer, consumer) if node.type == NodeType.TASK]
+        if not tasks:
+            return None
+
+        # a fused task fails as a whole, so it can't retry, fail or time out
+        # one step
+        if any(
+            task.retry is not None
+            or task.dead_letter
+            or task.timeout is not None
+            or task.speculate is not None
+            for task in tasks
+        ):
+            return None
+
+        like = tasks[0]
+        if any(
+            (task.executor, task.min_workers, task.max_workers)
+            != (like.executor, like.min_workers, like.max_workers)
+            for task in tasks
+        ):
+            return None
+
+        if like.executor == "process":
+            # filter predicates are usually lambdas, which can't go to a process
+            for node in (producer, consumer):
+                if isinstance(node, FilterOp):
+                    try:
+                        pickle.dumps(node.predicate_fn)
+                    except Exception:
+                        return None
+
+        return like
+
+    def fuse_stages(self) -> None:
+        """
+        Optimization pass fusing every pair of stages joined by a queue with
+        no other producer or consumer into a FusedTask, until none are left.
+
+        Fused stages must be thread or process tasks with the same executor
+        and worker counts, or filter ops. The queue between them must be
+        unbounded and hold nothing yet. Tasks opt out with fuse=False, and
+        tasks with a retry policy, dead letter queue, timeout or speculation
+        are never fused.
+        """
+        producer_of = self.producers()
+
+        fused_any = True
+        while fused_any:
+            fused_any = False
+            for q in list(self.queues):
+                producers = producer_of.get(q, [])
+                if len(producers) != 1 or len(q.children) != 1:
+                    continue
+
+                if q.maxsize is not None or q.buffer or q.source is not None:
+                    continue
+
+                # a queue tagging an ordered stage must stay
+                if q.window is not None:
+                    continue
+
+                producer = producers[0]
+                (consumer,) = q.children
+                producer_steps = self.stage_steps(producer)
+                consumer_steps = self.stage_steps(consumer)
+                if producer_steps is None or consumer_steps is None:
+                    continue
+
+                like = self.fusable(producer, consumer)
+                if like is None:
+                    continue
+
+                fused_task = FusedTask(producer_steps + consumer_steps, like)
+                queue_in, _ = self.stage_queues(producer)
+                _, queue_out = self.stage_queues(consumer)
+
+                # splice the fused task into the graph in place of both stages
+                for node in (producer, consumer):
+                    if node.type == NodeType.TASK:
+                        del self.task_table[node]
+                    else:
+                        self.ops.remove(node)
+                        del self.op_table[node]
+
+                self.queues.remove(q)
+                queue_in.children.discard(producer)
+                queue_in.children.add(fused_task)
+                fused_task.children.add(queue_out)
+                producer_of[queue_out] = [fused_task]
+                self.task_table[fused_task] = {"queue_in": queue_in, "queue_out": queue_out}
+
+                for node in (producer, consumer):
+                    for stage, by in list(self.fused.items()):
+                        if by is node:
+                            self.fused[stage] = fused_task
+
+                    if not isinstance(node, FusedTask):
+                        self.fused[node] = fused_task
+
+                fused_any = True
+
+    def attach_checkpoint(self) -> None:
+        """
+        Give every task, including the steps of fused tasks, its view of the
+        checkpoint. Tasks are told apart by name. Batched tasks aren't
+        checkpointed, as their batches differ from run to run.
+        """
+        tasks = []
+        for task in self.task_table:
+            if isinstance(task, FusedTask):
+                tasks.extend(fn for kind, fn in task.steps if kind == "map")
+            else:
+                tasks.append(task)
+
+        tasks = [task for task in tasks if not task.batched]
+
+        names = [str(task) for task in tasks]
+        for name in set(names):
+            if names.count(name) > 1:
+                raise ValueError(
+                    f"Checkpointed tasks need distinct names, {names.count(name)} "
+                    f"are called '{name}'"
+                )
+
+        for task in tasks:
+            task.checkpoint = self.checkpoint.for_task(str(task))
+
+        self.checkpointed = tasks
+
+    def select_queue_backend(self) -> str:
+        """
+        Pick the cheapest queue backend able to serve every task.
+
+        Queues only need to cross a process boundary if a task runs on a
+        process pool, otherwise the in-process backend is sufficient.
+        """
+        if any(task.executor == "process" for task in self.task_table):
+            return "manager"
+
+        return "thread"
+
+    def node_inputs(self, node: Node) -> List[Queue]:
+        """Queues consumed by a task or op node"""
+        if node.type == NodeType.TASK:
+            return [self.task_table[node]["queue_in"]]
+
+        return node.inputs()
+
+    def node_outputs(self, node: Node) -> List[Queue]:
+        """Queues produced to by a task or op node"""
+        if node.type == NodeType.TASK:
+            return [self.task_table[node]["queue_out"]]
+
+        return node.outputs()
+
+    def on_loop(self, node: Node, scheduler: str) -> bool:
+        """True if node runs as a coroutine on the async engine"""
+        if node.type == NodeType.TASK:
+            return node.executor == "async"
+
+        return scheduler == "async"
+
+    def is_loop_queue(self, queue: Queue, scheduler: str) -> bool:
+        """
+        True if every producer and consumer of queue runs on the async engine,
+        so that it can be an asyncio.Queue. Pipeline inputs and outputs are
+        touched by the user's threads and never qualify.
+        """
+        nodes = list(self.task_table) + self.ops
+        producers = [node for node in nodes if queue in node.children]
+        consumers = list(queue.children)
+
+        return (
+            len(producers) > 0
+            and len(consumers) > 0
+            and all(self.on_loop(node, scheduler) for node in producers + consumers)
+        )
+
+    def run(
+        self,
+        queue_backend: str = None,
+        scheduler: str = None,
+        max_threads: int = None,
+        max_processes: int = None,
+        queue_maxsize: int = 0,
+        fuse: bool = True,
+        chunk_size: int = 1,
+        chunk_linger: float = 0.005,
+        profile: bool = False,
+        autoscale: bool = False,
+        shared_memory: bool = False,
+        checkpoint: str = None,
+        resume: str = None,
+        checkpoint_interval: float = CHECKPOINT_INTERVAL,
+    ) -> PipelineRun:
+        """
+        Starts the pipeline in the background and returns a handle on it.
+
+        Args:
+            queue_backend (str, optional): "thread" or "manager". Selected
+                automatically from the pipeline's tasks if not given.
+            scheduler (str, optional): "event" runs each Op input on a thread
+                blocking on get(). "async" runs them as coroutines on the async
+                engine. "poll" is the legacy busy loop over every Op on a
+                single thread. Default = "async" if any task is a coroutine
+                function, otherwise "event".
+            max_threads (int, optional): Budget of worker threads shared by
+                all thread tasks. By default each gets its max_workers.
+            max_processes (int, optional): Budget of worker processes shared
+                by all process tasks. Default = os.cpu_count().
+            queue_maxsize (int, optional): maxsize of every queue that wasn't
+                given its own. Producers block while a queue is full, so
+                memory stays bounded. Default = 0 (unbounded).
+            fuse (bool, optional): Fuse adjacent map and filter stages with
+                compatible settings so items skip the queue between them.
+                Default = True.
+            chunk_size (int, optional): Number of items producers send
+                through every queue that wasn't given its own at once,
+                dividing the number of backend put/get calls. Default = 1.
+            chunk_linger (float, optional): Seconds a partly filled chunk
+                waits for more items before it is sent. Default = 0.005.
+            profile (bool, optional): Time every item handled by every task
+                and op and sample queue depths. See graph_analyzer().
+                Default = False.
+            autoscale (bool, optional): Start every thread and process task
+                with min_workers and let an Autoscaler grow it, up to
+                max_workers and within max_threads or max_processes, while
+                its input queue backs up. Implies profile. Default = False.
+            shared_memory (bool, optional): Send large arrays, bytes and
+                memoryviews through a SharedArena when queues go through
+                the manager. Has no effect on in-process queues, which
+                never copy items. Default = False.
+            checkpoint (str, optional): sqlite file to record the result
+                of every item each task completes in, replacing what it
+                held. Default = None.
+            resume (str, optional): Checkpoint file of an earlier run of the
+                same pipeline to resume. Inputs are replayed, but items a
+                task completed before are not performed again. Recording
+                continues into the same file. Default = None.
+            checkpoint_interval (float, optional): Seconds between writes
+                to the checkpoint. Default = 5.
+        Returns:
+            PipelineRun: Handle to wait on, cancel or query the run.
+        """
+
+        if checkpoint and resume and checkpoint != resume:
+            raise ValueError("A resumed run records into the checkpoint it resumes")
+
+        if fuse:
+            self.fuse_stages()
+
+        if checkpoint or resume:
+            self.checkpoint = Checkpoint(
+                resume or checkpoint, checkpoint_interval, resume=resume is not None
+            )
+            self.attach_checkpoint()
+
+        if scheduler is None:
+            has_async = any(task.executor == "async" for task in self.task_table)
+            scheduler = "async" if has_async else "event"
+
+        if scheduler not in ("event", "poll", "async"):
+            raise ValueError(f"Unknown scheduler '{scheduler}'")
+
+        # only the feeder thread puts to a source queue, so its bound is harmless
+        bounded = queue_maxsize or any(
+            q.maxsize for q in self.queues if q.source is None
+        )
+        if scheduler == "poll" and bounded:
+            # one op blocked on a full queue would stall every other op
+            raise ValueError("The 'poll' scheduler does not support bounded queues")
+
+        # an ordered stage's window bounds its tagging queue in the same way
+        if scheduler == "poll" and self.ordered:
+            raise ValueError("The 'poll' scheduler does not support ordered stages")
+
+        self.check_ordered_stages()
+
+        if queue_backend is None:
+            queue_backend = self.select_queue_backend()
+
+        if queue_backend == "thread" and self.select_queue_backend() != "thread":
+            raise ValueError("Process tasks cannot use the 'thread' queue backend")
+
+        self.queue_backend = get_queue_backend(queue_backend)
+        if shared_memory and self.queue_backend.name == "manager":
+            self.queue_backend.share_memory()
+
+        # Start the async engine if any node runs on it. Queues between two
+        # such nodes are awaited on the loop, every other queue a loop node
+        # consumes needs a bridge thread to block in get().
+        nodes = list(self.task_table) + self.ops
+        loop_nodes = [node for node in nodes if self.on_loop(node, scheduler)]
+        loop_queues = {q for q in self.queues if self.is_loop_queue(q, scheduler)}
+
+        if loop_nodes:
+            n_bridges = sum(
+                q not in loop_queues
+                for node in loop_nodes
+                for q in self.node_inputs(node)
+            )
+            self.async_engine = AsyncEngine(n_bridges)
+            self.async_engine.start()
+            loop_backend = AsyncQueueBackend(self.async_engine.loop)
+
+        # Give every skorche Queue a backend queue and flush the buffer into
+        # it. Buffers too big for a bounded queue, and source iterables, are
+        # fed in the background by a thread each.
+        futures = {}
+        feeders = []
         for q in self.queues:
-            q.set_queue(mp_manager)
-            q.buffer_to_mp_queue()
+            backend = loop_backend if q in loop_queues else self.queue_backend
+            q.set_queue(backend, queue_maxsize, chunk_size, chunk_linger)
 
-        # Submit all tasks to pool
-        for task, queue_dict in self.task_table.items():
-            queue_in = queue_dict["queue_in"]
-            queue_out = queue_dict["queue_out"]
+            if not q.buffer_to_mp_queue():
+                feeders.append(q)
+
+        if feeders:
+            self.feeder_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(feeders), thread_name_prefix="skorche-feeder"
+            )
+            for q in feeders:
+                futures[q] = [self.feeder_pool.submit(q.feed)]
+
+        profiler = None
+        if profile or autoscale:
+            # the autoscaler needs the service time of every task
+            profiler = Profiler(list(self.task_table) + self.ops, self.queues)
+
+        # adaptive batching learns how long the stage after it takes per batch
+        for op in self.ops:
+            if isinstance(op, BatchOp) and op.target_latency is not None:
+                for consumer in op.queue_out.children:
+                    if consumer.stats is None:
+                        consumer.stats = NodeStats()
+
+        # speculation compares every item with the task's p95
+        for task in self.task_table:
+            if task.speculate is not None and task.stats is None:
+                task.stats = NodeStats()
+
+        # Submit all tasks to one shared pool per executor kind
+        self.pool_table = {
+            "thread": WorkerPool("thread", max_threads),
+            "process": WorkerPool("process", max_processes),
+        }
+        for pool in self.pool_table.values():
+            pool.start(self.task_table, self.queue_backend, autoscale)
 
-            # TODO: have one centrally managed pool rather than one pool per task
-            # This is just temporary
-            process_pool = concurrent.futures.ThreadPoolExecutor(
-                max_workers=task.max_workers
+        for pool in self.pool_table.values():
+            futures.update(pool.futures)
+
+        for task, queue_dict in self.task_table.items():
+            if task.executor == "async":
+                futures[task] = [
+                    self.async_engine.submit(
+                        task.handle_task_async(
+                            queue_dict["queue_in"],
+                            queue_dict["queue_out"],
+                            self.async_engine.bridge_pool,
+                        )
+                    )
+                ]
+
+        # Run Op nodes in the background
+        if scheduler == "event":
+            futures.update(self.op_scheduler(self.ops))
+        elif scheduler == "async":
+            futures.update(self.op_coroutines(self.ops))
+        else:
+            futures.update(self.op_poller(self.ops))
+
+        if profiler:
+            for pool in self.pool_table.values():
+                profiler.workers.update(pool.allocation)
+            for task in self.task_table:
+                if task.executor == "async":
+                    profiler.workers[task] = task.max_workers
+            for op in self.ops:
+                profiler.workers[op] = len(op.inputs()) if scheduler == "event" else 1
+            profiler.start()
+
+        if autoscale:
+            self.autoscaler = Autoscaler(
+                list(self.pool_table.values()), self.task_table, profiler
             )
+            self.autoscaler.start()
 
-            self.pool_table[task] = process_pool
+        # fused stages report the status of the task that replaced them
+        for node, fused_task in self.fused.items():
+            futures[node] = futures[fused_task]
 
-            for worker_id in range(task.max_workers):
-                process_pool.submit(task.handle_task, worker_id, queue_in, queue_out)
+        self.pipeline_run = PipelineRun(futures, self.queues, profiler)
+        return self.pipeline_run
 
-        # Run Op nodes
-        # TODO: Make this non-blocking in the main thread
-        self.op_worker(self.ops)
+    def op_scheduler(self, ops: List[Op]) -> Dict[Op, List[concurrent.futures.Future]]:
+        """
+        Runs a listener thread per Op input queue. Listeners block on get()
+        so an idle pipeline costs no CPU and ops wake as soon as items arrive.
+        """
+        listeners = [(op, queue_in) for op in ops for queue_in in op.inputs()]
+        if not listeners:
+            return {}
 
+        self.op_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(listeners), thread_name_prefix="skorche-op"
+        )
+
+        futures = {op: [] for op in ops}
+        for op, queue_in in listeners:
+            futures[op].append(self.op_pool.submit(self.op_listener, op, queue_in))
+
+        return futures
+
+    def op_listener(self, op: Op, queue_in: Queue):
+        """Hands items from queue_in to op until the sentinel is reached"""
+        sentinel_reached = False
+
+        try:
+            while not sentinel_reached:
+                task_item = queue_in.get()
+                queue_in.task_done()
+
+                op.handle(queue_in, task_item)
+                sentinel_reached = task_item is QUEUE_SENTINEL
+
+        finally:
+            # a failed op still ends its outputs, so nothing downstream waits forever
+            if not sentinel_reached:
+                op.fail()
+
+    def op_coroutines(self, ops: List[Op]) -> Dict[Op, List[concurrent.futures.Future]]:
+        """Runs a listener coroutine per Op input queue on the async engine"""
+        return {
+            op: [
+                self.async_engine.submit(self.async_engine.op_listener(op, queue_in))
+                for queue_in in op.inputs()
+            ]
+            for op in ops
+        }
+
+    def op_poller(self, ops: List[Op]) -> Dict[Op, List[concurrent.futures.Future]]:
+        """Runs op_worker on a single background thread"""
+        if not ops:
+            return {}
+
+        self.op_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="skorche-op"
+        )
+        future = self.op_pool.submit(self.op_worker, ops)
+
+        return {op: [future] for op in ops}
 
     def op_worker(self, ops: List[Op]):
-        """Run op loop on the pool so it doesn't block the main thread"""
-        while len(ops):
+        """Busy loop polling every op until all have handled their sentinel"""
+        ops = list(ops)
+        try:
+            while len(ops):
+                for op in list(ops):
+                    # Op node returns a shutdown signal when it handles the queue sentinel.
+                    shutdown = op.handle_op()
+
+                    if shutdown:
+                        ops.remove(op)
+
+        except BaseException:
+            # the ops still polled share this thread, so none of them can go on
             for op in ops:
-                # Op node returns a shutdown signal when it handles the queue sentinel.
-                shutdown = op.handle_op()
-
-                if shutdown:
-                    ops.remove(op)
+                op.fail()
+            raise
 
     def shutdown(self):
+        """Blocks until the pipeline is done, then releases its pools"""
+        try:
+            if self.pipeline_run:
+                self.pipeline_run.wait()
+        finally:
+            self.release()
+
+    def release(self):
+        """Stop every pool and background thread of the run and reset the pipeline"""
+        if self.autoscaler:
+            self.autoscaler.stop()
+
         for pool in self.pool_table.values():
             pool.shutdown(wait=True)
 
+        if self.op_pool:
+            self.op_pool.shutdown(wait=True)
+
+        if self.feeder_pool:
+            self.feeder_pool.shutdown(wait=True)
+
+        if self.async_engine:
+            self.async_engine.shutdown()
+
+        if self.pipeline_run and self.pipeline_run.profiler:
+            self.pipeline_run.profiler.stop()
+
+        if self.queue_backend and self.queue_backend.arena:
+            self.queue_backend.arena.close()
+
+        if self.checkpoint:
+            self.checkpoint.flush()
+            for task in self.checkpointed:
+                task.checkpoint = None
+
         self.__init__()
 
-    def graph_analyzer(self) -> None:
-        """To be implemented. For now here is a running list of asserts we should make in the future
-        * TODO: Assert each Op node is the only consumer for it's queue (they rely on q.empty())
+    def graph_analyzer(self) -> str:
         """
-        pass
+        Report of the running pipeline's profile naming its bottleneck stage.
+        Requires skorche.run(profile=True). After shutdown, use the profiler
+        of the PipelineRun instead.
+        """
+        if not self.pipeline_run or not self.pipeline_run.profiler:
+            raise ValueError("Pipeline is not being profiled. Use run(profile=True).")
+
+        return self.pipeline_run.profiler.report()
 
     def render_pipeline(
-        self, filename="pipeline", root=None, skip_anon_ques=True
+        self, filename="pipeline", root=None, skip_anon_ques=True, profiler=None
     ) -> None:
-        """Render pipeline to png"""
+        """
+        Render pipeline to svg. Given the Profiler of a run, edges are
+        labelled with their throughput and the high-water mark of their
+        queue, and tasks and ops are shaded by how busy their workers were.
+        """
+        snapshot = profiler.snapshot() if profiler else None
+
         dot = Digraph(
             "Pipeline",
             format="svg",
@@ -254,6 +1058,8 @@ class PipelineManager:
         for root in roots:
             q.append(root)
             dot.node(name=str(root),shape="plaintext")
+            if snapshot:
+                dot.node(name=str(root), **profile_node_attrs(root, snapshot))
             visited.add(root)
 
         while len(q):
@@ -263,6 +1069,7 @@ class PipelineManager:
                 # want to draw an edge to the child of the queue, if any exist
 
                 edge_label = ""
+                edge_queue = node if node.type == NodeType.QUEUE else child
                 if (
                     skip_anon_ques
                     and child.type == NodeType.QUEUE
@@ -284,6 +1091,12 @@ class PipelineManager:
                 else:
                     attr = {"shape": "plaintext"}
 
+                if snapshot:
+                    attr.update(profile_node_attrs(child, snapshot))
+                    edge_label = profile_edge_label(
+                        edge_label, node, edge_queue, child, snapshot, profiler.elapsed()
+                    )
+
                 dot.node(str(child), **attr)
                 dot.edge(str(node), str(child), label=edge_label)
                 if child not in visited:
@@ -293,4 +1106,57 @@ class PipelineManager:
         dot.render(directory="graphviz", filename=filename)
 
 
+def heat_color(utilization: float) -> str:
+    """Graphviz HSV colour from white at 0 to red at 1"""
+    return f"0.000 {min(max(utilization, 0.0), 1.0):.3f} 1.000"
+
+
+def profile_node_attrs(node: Node, snapshot: Dict) -> Dict:
+    """Label and fill of a node rendered with its profile"""
+    stats = snapshot.get(node)
+    if stats is None:
+        return {}
+
+    if node.type == NodeType.QUEUE:
+        return {"label": f"{node}\nmax {stats['max_depth']}"}
+
+    return {
+        "label": (
+            f"{node}\n{stats['workers']} worker{'s' if stats['workers'] > 1 else ''}, "
+            f"{stats['utilization']:.0%} busy"
+        ),
+        "style": "filled",
+        "fillcolor": heat_color(stats["utilization"]),
+    }
+
+
+def profile_edge_label(
+    label: str, node: Node, queue: Queue, child: Node, snapshot: Dict, elapsed: float
+) -> str:
+    """
+    Edge label with the throughput of the edge and the high-water mark of
+    the queue it passes through. The throughput is what node sent, or what
+    child took if node fans out to several queues.
+    """
+    lines = [label] if label else []
+
+    n_inputs = len(child.inputs()) if child.type == NodeType.OP else 1
+
+    rate = None
+    if not elapsed:
+        pass
+    elif node.type != NodeType.QUEUE and node in snapshot and len(node.children) == 1:
+        rate = snapshot[node]["items_out"] / elapsed
+    elif child.type != NodeType.QUEUE and child in snapshot and n_inputs == 1:
+        rate = snapshot[child]["items_in"] / elapsed
+
+    if rate is not None:
+        lines.append(f"{rate:.0f} items/s")
+
+    if queue in snapshot and queue is not child and queue is not node:
+        lines.append(f"max {snapshot[queue]['max_depth']} queued")
+
+    return "\n".join(lines)
+
+
 _global_pipeline = PipelineManager()
@@ -0,0 +1,132 @@
+from .constants import QUEUE_SENTINEL
+from .node import Node
+from .profiler import Profiler
+from .queue import Queue
+
+import concurrent.futures
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List
+
+
+class PipelineRun:
+    """
+    Handle on a pipeline started by skorche.run().
+
+    Tasks and ops run in the background, so the caller is free to keep
+    feeding input queues while the pipeline drains.
+    """
+
+    def __init__(
+        self,
+        futures: Dict[Node, List[concurrent.futures.Future]],
+        queues: Iterable[Queue],
+        profiler: Profiler = None,
+    ):
+        """
+        Args:
+            futures (Dict): The futures of every worker or listener running
+                each task and op node.
+            queues (Iterable[Queue]): Every queue in the pipeline.
+            profiler (Profiler, optional): Profiler of a run started with
+                profile=True, for its snapshot() and report().
+        """
+        self.futures = futures
+        self.queues = queues
+        self.profiler = profiler
+        self.cancelled = False
+
+    def all_futures(self) -> List[concurrent.futures.Future]:
+        return [future for futures in self.futures.values() for future in futures]
+
+    def done(self) -> bool:
+        """True once every task and op has handled its sentinel"""
+        return all(future.done() for future in self.all_futures())
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Blocks until the pipeline is done or timeout seconds have passed.
+        If an op or a task worker fails, the rest of the pipeline is
+        cancelled, as it can't finish without it, and the error is raised
+        straight away.
+
+        Returns:
+            True if the pipeline is done.
+        Raises:
+            The first exception raised by an op or a task worker.
+        """
+        futures = self.all_futures()
+        concurrent.futures.wait(
+            futures, timeout=timeout, return_when=concurrent.futures.FIRST_EXCEPTION
+        )
+
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception():
+                if not self.cancelled:
+                    self.cancel()
+                raise future.exception()
+
+        return self.done()
+
+    def cancel(self) -> None:
+        """
+        Stops the pipeline early. Items waiting on queues with a consumer are
+        dropped and replaced by a sentinel, so every task and op stops once it
+        finishes its current item. Output queues keep what reached them.
+        """
+        self.cancelled = True
+
+        for q in self.queues:
+            q.stop_feeding()
+
+        # A producer whose consumer has already stopped would block forever
+        # on a full queue, so keep emptying those until the run is done
+        threading.Thread(
+            target=self.drain_stopped_queues, name="skorche-drain", daemon=True
+        ).start()
+
+        for q in self.queues:
+            if q.children:
+                self.drain(q)
+                q.put(QUEUE_SENTINEL)
+
+    def drain(self, q: Queue) -> None:
+        """Discard everything currently waiting on q"""
+        while True:
+            try:
+                q.get(block=False)
+                q.task_done()
+            except queue.Empty:
+                break
+
+    def drain_stopped_queues(self) -> None:
+        while not self.done():
+            for q in self.queues:
+                if q.children and all(
+                    future.done()
+                    for node in q.children
+                    for future in self.futures.get(node, [])
+                ):
+                    self.drain(q)
+
+            time.sleep(0.01)
+
+    def node_status(self, node: Node) -> str:
+        """One of "pending", "running", "done", "cancelled" or "failed" """
+        futures = self.futures[node]
+
+        if any(future.done() and future.exception() for future in futures):
+            return "failed"
+
+        if all(future.done() for future in futures):
+            return "cancelled" if self.cancelled else "done"
+
+        if any(future.running() or future.done() for future in futures):
+            return "running"
+
+        return "pending"
+
+    def status(self) -> Dict[Node, str]:
+        """Status of every task and op node"""
+        return {node: self.node_status(node) for node in self.futures}
@@ -0,0 +1,185 @@
+from .backend import QueueBackend
+from .task import Task
+
+import concurrent.futures
+from functools import partial
+import os
+from typing import Dict, List
+
+# How long an autoscaled worker waits for an item before checking whether
+# it should retire, in seconds
+IDLE_TIMEOUT = 0.1
+
+EXECUTOR_CLASSES = {
+    "thread": concurrent.futures.ThreadPoolExecutor,
+    "process": concurrent.futures.ProcessPoolExecutor,
+}
+
+
+class WorkerPool:
+    """
+    One executor shared by every task of an executor kind.
+
+    Each task is allocated a share of the pool's worker budget between its
+    min_workers and max_workers, so the total number of threads or
+    processes is bounded however many tasks the pipeline has.
+    """
+
+    def __init__(self, executor: str, budget: int = None):
+        """
+        Args:
+            executor (str): "thread" or "process".
+            budget (int, optional): Maximum number of workers across all
+                tasks. If not given, thread tasks get their max_workers and
+                process tasks share os.cpu_count() workers.
+        """
+        self.executor = executor
+        self.budget = budget
+
+        self.allocation = {}
+        self.capacity = 0
+        self.pool = None
+        self.futures = {}
+        self.workers = {}
+        self.task_table = {}
+
+    def allocate(self, tasks: List[Task]) -> Dict[Task, int]:
+        """Divide the budget between tasks, giving each at least min_workers"""
+
+        minimum = sum(task.min_workers for task in tasks)
+        budget = self.budget
+
+        if budget is None:
+            if self.executor == "thread":
+                self.allocation = {task: task.max_workers for task in tasks}
+                return self.allocation
+
+            budget = max(os.cpu_count(), minimum)
+
+        if minimum > budget:
+            raise ValueError(
+                f"{self.executor} budget of {budget} workers is less than the "
+                f"{minimum} required by the min_workers of its tasks"
+            )
+
+        allocation = {task: task.min_workers for task in tasks}
+        spare = budget - minimum
+
+        # Hand out spare workers one at a time so that tasks share them evenly
+        growing = [task for task in tasks if allocation[task] < task.max_workers]
+        while spare and growing:
+            for task in list(growing):
+                if not spare:
+                    break
+
+                allocation[task] += 1
+                spare -= 1
+                if allocation[task] == task.max_workers:
+                    growing.remove(task)
+
+        self.allocation = allocation
+        return allocation
+
+    def start(
+        self, task_table: Dict, queue_backend: QueueBackend, autoscale: bool = False
+    ) -> None:
+        """
+        Submit the workers of every task of this pool's kind. Each task's
+        workers share a WorkerCount made by queue_backend.
+
+        If autoscale is set, tasks start with min_workers and the pool is
+        sized for the whole budget, leaving room for grow().
+        """
+
+        tasks = [task for task in task_table if task.executor == self.executor]
+        allocation = self.allocate(tasks)
+
+        if autoscale:
+            allocation = self.allocation = {task: task.min_workers for task in tasks}
+            self.capacity = self.total_budget(tasks)
+        else:
+            self.capacity = sum(allocation.values())
+
+        if not self.capacity:
+            return
+
+        self.task_table = task_table
+        self.pool = EXECUTOR_CLASSES[self.executor](max_workers=self.capacity)
+
+        for task, n_workers in allocation.items():
+            self.workers[task] = queue_backend.make_worker_count(n_workers)
+            if autoscale:
+                self.workers[task].idle_timeout = IDLE_TIMEOUT
+
+            self.futures[task] = []
+            self.submit_workers(task, n_workers)
+
+    def total_budget(self, tasks: List[Task]) -> int:
+        """Most workers the pool may run at once"""
+        if self.budget is not None:
+            return self.budget
+
+        if self.executor == "thread":
+            return sum(task.max_workers for task in tasks)
+
+        return max(os.cpu_count(), sum(task.min_workers for task in tasks))
+
+    def submit_workers(self, task: Task, n_workers: int) -> None:
+        queue_in = self.task_table[task]["queue_in"]
+        queue_out = self.task_table[task]["queue_out"]
+
+        futures = [
+            self.pool.submit(
+                task.handle_task,
+                len(self.futures[task]) + i,
+                queue_in,
+                queue_out,
+                self.workers[task],
+            )
+            for i in range(n_workers)
+        ]
+
+        if task.stats and self.executor == "process":
+            # each worker process profiled its own copy of the task
+            for future in futures:
+                future.add_done_callback(partial(merge_stats, task.stats))
+
+        # extend in place, PipelineRun holds on to this list
+        self.futures[task].extend(futures)
+
+    def grow(self, task: Task, n_workers: int) -> int:
+        """
+        Start up to n_workers more workers for task, within its max_workers
+        and the pool's budget. Returns the number started.
+        """
+        spare = self.capacity - sum(self.allocation.values())
+        n_workers = min(n_workers, task.max_workers - self.allocation[task], spare)
+
+        if n_workers <= 0 or not self.workers[task].grow(n_workers):
+            return 0
+
+        self.allocation[task] += n_workers
+        self.submit_workers(task, n_workers)
+        return n_workers
+
+    def shrink(self, task: Task) -> bool:
+        """
+        Ask one worker of task to retire, down to its min_workers. The next
+        worker left idle for IDLE_TIMEOUT seconds stops.
+        """
+        if self.allocation[task] <= task.min_workers:
+            return False
+
+        self.allocation[task] -= 1
+        self.workers[task].set_target(self.allocation[task])
+        return True
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self.pool:
+            self.pool.shutdown(wait=wait)
+
+
+def merge_stats(stats, future: concurrent.futures.Future) -> None:
+    """Done callback adding a process worker's NodeStats to the parent's"""
+    if not future.cancelled() and future.exception() is None:
+        stats.merge(future.result())
@@ -0,0 +1,272 @@
+from .node import Node, NodeType
+from .queue import Queue
+
+from collections import deque
+import threading
+import time
+from typing import Dict, Iterable
+
+# How often the profiler samples the depth of every queue, in seconds
+DEPTH_SAMPLE_INTERVAL = 0.05
+
+# Number of depth samples kept per queue
+DEPTH_HISTORY = 1000
+
+
+class NodeStats:
+    """
+    Counters and a latency histogram for one task or op node.
+
+    Latencies are counted in power of two buckets of microseconds, so the
+    histogram stays the same size however many items are recorded.
+    """
+
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self.max_latency = 0.0
+        self.histogram = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+        self.failures = 0
+        self.speculations = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, n_items: int = 1) -> None:
+        """Count n_items, one call or batch, handled in latency seconds"""
+        bucket = int(latency * 1e6).bit_length()
+
+        with self.lock:
+            self.items_in += n_items
+            self.busy += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def count_in(self, n_items: int) -> None:
+        """Count items handled along with one already recorded"""
+        with self.lock:
+            self.items_in += n_items
+
+    def count_out(self) -> None:
+        with self.lock:
+            self.items_out += 1
+
+    def count_lookup(self, hit: bool) -> None:
+        """Count a lookup in the task's cache"""
+        with self.lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def count_retry(self) -> None:
+        """Count a failed attempt at an item that will be tried again"""
+        with self.lock:
+            self.retries += 1
+
+    def count_failure(self) -> None:
+        """Count an item given up on"""
+        with self.lock:
+            self.failures += 1
+
+    def count_speculation(self) -> None:
+        """Count a second copy of a straggling item being started"""
+        with self.lock:
+            self.speculations += 1
+
+    def merge(self, other: "NodeStats") -> None:
+        """Add the counts another process recorded for the same node"""
+        with self.lock:
+            self.items_in += other.items_in
+            self.items_out += other.items_out
+            self.busy += other.busy
+            self.max_latency = max(self.max_latency, other.max_latency)
+            self.cache_hits += other.cache_hits
+            self.cache_misses += other.cache_misses
+            self.retries += other.retries
+            self.failures += other.failures
+            self.speculations += other.speculations
+            for bucket, count in other.histogram.items():
+                self.histogram[bucket] = self.histogram.get(bucket, 0) + count
+
+    def percentile(self, p: float) -> float:
+        """Upper bound in seconds of the bucket holding the p-th percentile latency"""
+        with self.lock:
+            histogram = dict(self.histogram)
+
+        total = sum(histogram.values())
+        if not total:
+            return 0.0
+
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen >= p / 100 * total:
+                return min(2**bucket / 1e6, self.max_latency)
+
+        return self.max_latency
+
+
+class Profiler:
+    """
+    Collects NodeStats from every task and op of a running pipeline, and
+    samples the depth of every queue on a background thread.
+    """
+
+    def __init__(self, nodes: Iterable[Node], queues: Iterable[Queue]):
+        """
+        Args:
+            nodes (Iterable[Node]): Task and op nodes to instrument.
+            queues (Iterable[Queue]): Queues whose depth is sampled.
+        """
+        self.nodes = list(nodes)
+        self.queues = list(queues)
+
+        # number of workers, or listeners, of each node, once they are started
+        self.workers = {}
+
+        for node in self.nodes:
+            node.stats = NodeStats()
+
+        self.depths = {q: deque(maxlen=DEPTH_HISTORY) for q in self.queues}
+        self.max_depths = {q: 0 for q in self.queues}
+
+        self.start_time = time.perf_counter()
+        self.stop_time = None
+        self.stopping = threading.Event()
+        self.sampler = threading.Thread(
+            target=self.sample_depths, name="skorche-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling and freeze the elapsed time"""
+        if self.stop_time is None:
+            self.stopping.set()
+            self.sampler.join()
+            self.stop_time = time.perf_counter()
+
+    def elapsed(self) -> float:
+        end = self.stop_time if self.stop_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def sample_depths(self) -> None:
+        while True:
+            now = time.perf_counter() - self.start_time
+            for q in self.queues:
+                try:
+                    depth = q.qsize()
+                except Exception:
+                    # the manager may already be gone at shutdown
+                    continue
+
+                self.depths[q].append((now, depth))
+                self.max_depths[q] = max(self.max_depths[q], depth)
+
+            if self.stopping.wait(DEPTH_SAMPLE_INTERVAL):
+                return
+
+    def utilization(self, node: Node) -> float:
+        """Fraction of the run the node's workers spent handling items"""
+        capacity = self.elapsed() * self.workers.get(node, 1)
+        return node.stats.busy / capacity if capacity else 0.0
+
+    def snapshot(self) -> Dict[Node, Dict]:
+        """
+        Current statistics of every task, op and queue. Can be called while
+        the pipeline runs. Process tasks only report once their workers stop.
+        """
+        snapshot = {}
+        for node in self.nodes:
+            stats = node.stats
+            snapshot[node] = {
+                "workers": self.workers.get(node, 1),
+                "items_in": stats.items_in,
+                "items_out": stats.items_out,
+                "busy": stats.busy,
+                "utilization": self.utilization(node),
+                "latency": {
+                    "p50": stats.percentile(50),
+                    "p90": stats.percentile(90),
+                    "p99": stats.percentile(99),
+                    "max": stats.max_latency,
+                },
+                "histogram": dict(stats.histogram),
+                "cache": {"hits": stats.cache_hits, "misses": stats.cache_misses},
+                "errors": {"retries": stats.retries, "failures": stats.failures},
+                "speculations": stats.speculations,
+            }
+
+        for q in self.queues:
+            history = list(self.depths[q])
+            snapshot[q] = {
+                "depth": history[-1][1] if history else 0,
+                "max_depth": self.max_depths[q],
+                "mean_depth": (
+                    sum(depth for _, depth in history) / len(history) if history else 0
+                ),
+                "depth_history": history,
+            }
+
+        return snapshot
+
+    def bottleneck(self) -> Node:
+        """The busiest task or op relative to its number of workers"""
+        busy_nodes = [node for node in self.nodes if node.stats.items_in]
+        if not busy_nodes:
+            return None
+
+        return max(busy_nodes, key=self.utilization)
+
+    def report(self) -> str:
+        """Table of per node statistics naming the bottleneck stage"""
+        snapshot = self.snapshot()
+
+        lines = [
+            f"{'node':<30} {'workers':>7} {'in':>8} {'out':>8} "
+            f"{'p50 ms':>8} {'p99 ms':>8} {'busy':>6}"
+        ]
+        for node in self.nodes:
+            stats = snapshot[node]
+            lines.append(
+                f"{str(node)[:30]:<30} {stats['workers']:>7} {stats['items_in']:>8} "
+                f"{stats['items_out']:>8} {1e3 * stats['latency']['p50']:>8.3f} "
+                f"{1e3 * stats['latency']['p99']:>8.3f} {stats['utilization']:>6.0%}"
+            )
+
+        lines.append("")
+        lines.append(f"{'queue':<30} {'depth':>7} {'mean':>8} {'max':>8}")
+        for q in self.queues:
+            stats = snapshot[q]
+            lines.append(
+                f"{str(q)[:30]:<30} {stats['depth']:>7} "
+                f"{stats['mean_depth']:>8.1f} {stats['max_depth']:>8}"
+            )
+
+        lines.append("")
+        bottleneck = self.bottleneck()
+        if bottleneck is None:
+            lines.append("No items handled yet")
+        else:
+            lines.append(
+                f"Bottleneck: {bottleneck} ({snapshot[bottleneck]['utilization']:.0%} "
+                f"busy across {snapshot[bottleneck]['workers']} workers)"
+            )
+            if bottleneck.type == NodeType.TASK:
+                lines.append("Raising its max_workers is likely to speed up the pipeline")
+
+        return "\n".join(lines)
@@ -1,14 +1,43 @@
+from .backend import LoopQueue
 from .constants import QUEUE_SENTINEL
 from .node import NodeType, Node
+from .ordering import Sequenced, retag, untag
 
 # from .resources import get_queue
+import asyncio
 from collections import deque
+from itertools import islice
+import queue
+import threading
+import time
+from typing import Iterable
+
+# How long coroutines sleep before retrying a put to a full queue
+FULL_QUEUE_POLL_INTERVAL = 0.005
+
+# Seconds the linger thread of a queue waits for a chunk before it exits
+LINGER_IDLE_TIMEOUT = 1.0
+
+
+class Chunk:
+    """Several task items shipped through a backend queue as one"""
+
+    def __init__(self, items: list):
+        self.items = items
 
 
 class Queue(Node):
-    """Wrapper interface for multiprocessing.Manager().Queue()"""
+    """Wrapper interface for the queue provided by a QueueBackend"""
 
-    def __init__(self, name="Queue", id=None, fixed_inputs=None):
+    def __init__(
+        self,
+        name="Queue",
+        id=None,
+        fixed_inputs=None,
+        maxsize=None,
+        chunk_size=None,
+        chunk_linger=None,
+    ):
         """Constructs a Queue instance
 
         Args:
@@ -17,17 +46,63 @@ class Queue(Node):
                 It is 'fixed' meaning QUEUE_SENTINEL will be enqued
                 at the end, terminating the queue. To enque a list without
                 the sentinel, use skorche.push_to_queue instead.
+            maxsize (int): Optional maximum number of items held by the queue
+                once the pipeline is running. Producers block while it is
+                full. 0 means unbounded. Defaults to the queue_maxsize
+                passed to skorche.run().
+            chunk_size (int): Optional number of items producers buffer
+                and put on the backend queue at once. Consumers still get
+                single items. Defaults to the chunk_size passed to
+                skorche.run().
+            chunk_linger (float): Optional number of seconds a partly
+                filled chunk waits for more items before it is sent anyway.
+                Defaults to the chunk_linger passed to skorche.run().
         """
         super().__init__(NodeType.QUEUE)
         self.name = name
         self.id = id
+        self.maxsize = maxsize
+        self.chunk_size = chunk_size
+        self.chunk_linger = chunk_linger
+
+        # items put but not yet shipped in a chunk, and items received in
+        # a chunk but not yet got. unacked counts items from chunks whose
+        # task_done() was already passed on to the backend queue
+        self.outgoing = []
+        self.incoming = deque()
+        self.unacked = 0
+        self.chunk_lock = threading.Lock()
+
+        # one thread per queue ships a partly filled chunk once its first
+        # item has waited chunk_linger seconds, see linger()
+        self.linger_thread = None
+        self.linger_start = None
+        self.linger_wakeup = threading.Condition(self.chunk_lock)
+
+        # held while shipping so that chunks and the sentinel keep their order
+        self.send_lock = threading.RLock()
 
-        # buffer is for storing any task items before the multiprocessing
+        # set by stop_feeding() to abandon a feed() blocked on a full queue
+        self.feeding = True
+
+        # optional iterable pulled lazily by feed(), see from_iterable()
+        self.source = None
+
+        # buffer is for storing any task items before the backend
         # queue is instantiated in skorche.run()
         self.buffer = deque()
         self.queue = None 
 
-        if fixed_inputs:
+        # SharedArena large items are sent through, set by set_queue()
+        self.arena = None
+
+        # a queue at the start of an ordered stage tags items with sequence
+        # numbers, keeping at most window of them in flight
+        self.window = None
+        self.sequence = None
+        self.released = 0
+
+        if fixed_inputs is not None:
 
             self.buffer = deque(fixed_inputs)
             self.buffer.append(QUEUE_SENTINEL)
@@ -37,40 +112,465 @@ class Queue(Node):
             return f"{self.name} {self.id}"
         return self.name
 
-    def set_queue(self, mp_manager) -> None:
-        self.queue = mp_manager.Queue()
+    def __getstate__(self):
+        # workers in other processes only need the backend queue, and the
+        # buffer may be being fed from another thread
+        state = super().__getstate__()
+        state["buffer"] = deque()
+        state["source"] = None
+
+        # chunks being assembled or unpacked belong to this process
+        state["outgoing"] = []
+        state["incoming"] = deque()
+        state["unacked"] = 0
+        state["chunk_lock"] = None
+        state["send_lock"] = None
+        state["linger_thread"] = None
+        state["linger_start"] = None
+        state["linger_wakeup"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.chunk_lock = threading.Lock()
+        self.linger_wakeup = threading.Condition(self.chunk_lock)
+        self.send_lock = threading.RLock()
+
+    @classmethod
+    def from_iterable(
+        cls, iterable: Iterable, name: str = "Queue", maxsize: int = 1024
+    ) -> "Queue":
+        """
+        Constructs a Queue fed lazily from an iterable, such as a generator.
 
-    def buffer_to_mp_queue(self):
+        Once the pipeline is running, items are pulled on a feeder thread as
+        space frees up in the queue and QUEUE_SENTINEL is enqueued when the
+        iterable is exhausted. Memory use is bounded by maxsize rather than
+        by the length of the input.
+
+        Args:
+            iterable (Iterable): Source of task items.
+            name (string): Optional name for queue
+            maxsize (int): Maximum number of items held by the queue. Pass
+                None to use the queue_maxsize given to skorche.run().
+        """
+        q = cls(name=name, maxsize=maxsize)
+        q.source = iterable
+        return q
+
+    @classmethod
+    def from_file(
+        cls, path: str, name: str = "Queue", maxsize: int = 1024, strip: bool = True
+    ) -> "Queue":
+        """
+        Constructs a Queue fed lazily with the lines of a text file.
+
+        Args:
+            path (str): File to read. It is opened by the feeder thread.
+            name (string): Optional name for queue
+            maxsize (int): Maximum number of lines held by the queue.
+            strip (bool): Strip trailing newlines. Default = True.
+        """
+
+        def read_lines():
+            with open(path) as f:
+                for line in f:
+                    yield line.rstrip("\r\n") if strip else line
+
+        return cls.from_iterable(read_lines(), name=name, maxsize=maxsize)
+
+    def set_queue(
+        self,
+        backend,
+        maxsize: int = 0,
+        chunk_size: int = 1,
+        chunk_linger: float = 0.005,
+    ) -> None:
+        """
+        Back this queue with a queue created by a QueueBackend. maxsize,
+        chunk_size and chunk_linger are the pipeline defaults, used unless
+        this queue was given its own.
+        """
+        if self.maxsize is not None:
+            maxsize = self.maxsize
+
+        if self.chunk_size is None:
+            self.chunk_size = chunk_size
+
+        if self.chunk_linger is None:
+            self.chunk_linger = chunk_linger
+
+        if self.chunk_size < 1:
+            raise ValueError(f"chunk_size of {self} must be at least 1")
+
+        self.queue = backend.make_queue(maxsize)
+        self.arena = backend.arena
+
+        if self.window:
+            self.sequence = backend.make_sequence()
+
+        # items never leave the event loop's thread, so there is nothing to save
+        if isinstance(self.queue, LoopQueue):
+            self.chunk_size = 1
+
+    def pack(self, items: list):
+        """Item or Chunk to put on the backend queue for a list of items"""
+        if len(items) == 1:
+            return items[0]
+
+        return Chunk(items)
+
+    def next_from_buffer(self, block=True):
+        """
+        Returns the next item, or Chunk of up to chunk_size items, to move
+        from the buffer to the backend queue and the number of items in it.
+        Raises queue.Full if block is False and no item can be tagged.
+        """
+        n_items = 0
+        for item in islice(self.buffer, self.chunk_size):
+            if item is QUEUE_SENTINEL:
+                break
+
+            # kept prepared in the buffer in case the put has to be retried
+            if not isinstance(item, Sequenced):
+                try:
+                    self.buffer[n_items] = self.prepare(item, block)
+                except queue.Full:
+                    if not n_items:
+                        raise
+                    break
+            n_items += 1
+
+        if not n_items:
+            return self.buffer[0], 1
+
+        return self.pack(list(islice(self.buffer, n_items))), n_items
+
+    def buffer_to_mp_queue(self) -> bool:
+        """
+        Moves as much of the buffer into the backend queue as fits without
+        blocking. Returns False if items are left over for feed(), which is
+        always the case for a queue with a source iterable.
+        """
         if not self.queue:
             raise Exception("mp queue has not been set on {self}. Call set_queue first.")
 
         while self.buffer:
-            self.queue.put(self.buffer.popleft())
-        
+            try:
+                item, n_items = self.next_from_buffer(block=False)
+                self.queue.put(item, block=False)
+            except queue.Full:
+                return False
+
+            for _ in range(n_items):
+                self.buffer.popleft()
+
+        return self.source is None
+
+    def feed(self) -> None:
+        """
+        Blocks until the rest of the buffer, followed by the source iterable
+        if there is one, has been moved into the backend queue. Run on a
+        feeder thread by skorche.run().
+        """
+        while self.buffer:
+            item, n_items = self.next_from_buffer()
+            if not self.feed_item(item):
+                return
+
+            for _ in range(n_items):
+                self.buffer.popleft()
+
+        if self.source is None:
+            return
+
+        items = []
+        try:
+            for item in self.source:
+                if not items:
+                    first_item_time = time.monotonic()
+
+                items.append(self.prepare(item))
+                if (
+                    len(items) >= self.chunk_size
+                    or time.monotonic() - first_item_time > self.chunk_linger
+                ):
+                    if not self.feed_item(self.pack(items)):
+                        return
+                    items = []
+
+        finally:
+            # terminate the queue even if the iterable raised
+            if not items or self.feed_item(self.pack(items)):
+                self.feed_item(QUEUE_SENTINEL)
+
+    def feed_item(self, item) -> bool:
+        """Puts item on the backend queue, or returns False if feeding is stopped first"""
+        while self.feeding:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def stop_feeding(self) -> None:
+        self.feeding = False
 
     # ---- Queue interface BEGIN
     def empty(self):
         if not self.queue:
             return len(self.buffer) == 0
 
-        return self.queue.empty()
+        return not self.incoming and self.queue.empty()
+
+    def qsize(self) -> int:
+        """Approximate number of waiting items. A chunk counts as one."""
+        if not self.queue:
+            return len(self.buffer)
+
+        return self.queue.qsize() + len(self.incoming)
+
+    def full(self):
+        if not self.queue:
+            return False
+
+        if self.sequence is not None and not self.window_open():
+            return True
+
+        return self.queue.full()
+
+    def window_open(self) -> bool:
+        """Whether the ordered stage this queue starts has room for another item"""
+        if self.sequence.peek() < self.released + self.window:
+            return True
+
+        self.released = self.sequence.released()
+        return self.sequence.peek() < self.released + self.window
+
+    def prepare(self, item, block=True):
+        """Item as sent through the backend queue, see share() and tag()"""
+        return self.tag(self.share(item), block)
+
+    def share(self, item):
+        """Handle to send in place of a large item, if the queue has an arena"""
+        if self.arena is None or item is QUEUE_SENTINEL:
+            return item
+
+        tags, item = untag(item)
+        return retag(tags, self.arena.share(item))
+
+    def resolve(self, item):
+        """Item a handle from share() stands for"""
+        if self.arena is None:
+            return item
 
-    def put(self, item):
+        tags, item = untag(item)
+        return retag(tags, self.arena.resolve(item))
+
+    def tag(self, item, block=True):
+        """
+        Tags item with the next sequence number if this queue is at the
+        start of an ordered stage. Waits while window items are in flight,
+        or raises queue.Full if block is False.
+        """
+        if self.sequence is None or item is QUEUE_SENTINEL:
+            return item
+
+        if not block and not self.window_open():
+            raise queue.Full
+
+        seq = self.sequence.next()
+        while seq >= self.released + self.window:
+            time.sleep(FULL_QUEUE_POLL_INTERVAL)
+            self.released = self.sequence.released()
+
+        return Sequenced(seq, item)
+
+    def put(self, item, block=True, timeout=None):
         if not self.queue:
             self.buffer.append(item)
+            return
+
+        self.put_prepared(self.prepare(item, block), block=block, timeout=timeout)
+
+    def put_prepared(self, item, block=True, timeout=None):
+        """put() of an item already passed through prepare()"""
+        if self.chunk_size == 1:
+            self.queue.put(item, block=block, timeout=timeout)
+
+        elif item is QUEUE_SENTINEL:
+            # the sentinel must follow every item put before it
+            with self.send_lock:
+                self.send_chunk(block=block, timeout=timeout)
+                self.queue.put(item, block=block, timeout=timeout)
+
         else:
-            self.queue.put(item)
+            self.put_chunked(item, block=block, timeout=timeout)
+
+    def put_chunked(self, item, block=True, timeout=None):
+        """Buffers item, shipping the chunk once it holds chunk_size items"""
+        with self.chunk_lock:
+            if len(self.outgoing) + 1 < self.chunk_size:
+                self.outgoing.append(item)
+
+                if len(self.outgoing) == 1:
+                    # ship a chunk that is slow to fill after chunk_linger
+                    self.linger_start = time.monotonic()
+                    self.start_linger()
+                return
+
+        with self.send_lock:
+            with self.chunk_lock:
+                items = self.outgoing + [item]
+                self.outgoing = []
+                self.linger_start = None
+
+            try:
+                self.queue.put(self.pack(items), block=block, timeout=timeout)
+            except queue.Full:
+                # item wasn't put, but the rest were, so keep them for next time
+                with self.chunk_lock:
+                    self.requeue(items[:-1])
+                raise
 
-    def get(self):
+    def requeue(self, items: list):
+        """Put back items that failed to ship, holding chunk_lock"""
+        if not items:
+            return
+
+        self.outgoing[:0] = items
+        self.linger_start = time.monotonic()
+        self.start_linger()
+
+    def start_linger(self):
+        """Start the linger thread, or wake it for a new chunk, holding chunk_lock"""
+        if self.linger_thread is None:
+            self.linger_thread = threading.Thread(
+                target=self.linger, name=f"skorche-linger {self}", daemon=True
+            )
+            self.linger_thread.start()
+
+        self.linger_wakeup.notify()
+
+    def linger(self):
+        """
+        Linger thread shipping each chunk that is slow to fill. It exits
+        once no chunk has been started for LINGER_IDLE_TIMEOUT seconds.
+        """
+        while True:
+            with self.chunk_lock:
+                while True:
+                    if self.linger_start is None:
+                        if not self.linger_wakeup.wait(LINGER_IDLE_TIMEOUT):
+                            self.linger_thread = None
+                            return
+                        continue
+
+                    remaining = self.linger_start + self.chunk_linger - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.linger_wakeup.wait(remaining)
+
+            try:
+                self.send_chunk()
+            except Exception:
+                # the backend queue may be gone once the pipeline has shut down
+                with self.chunk_lock:
+                    self.linger_thread = None
+                return
+
+    def send_chunk(self, block=True, timeout=None):
+        """Ships whatever put() has buffered without waiting for a full chunk"""
+        with self.send_lock:
+            with self.chunk_lock:
+                items = self.outgoing
+                self.outgoing = []
+                self.linger_start = None
+
+            if not items:
+                return
+
+            try:
+                self.queue.put(self.pack(items), block=block, timeout=timeout)
+            except queue.Full:
+                with self.chunk_lock:
+                    self.requeue(items)
+                raise
+
+    def get(self, block=True, timeout=None):
         if not self.queue:
             return self.buffer.popleft()
 
-        # TODO: handle self.queue.task_done() here so we dont have to everywhere else
-        return self.queue.get()
+        while True:
+            if self.incoming:
+                try:
+                    return self.resolve(self.incoming.popleft())
+                except IndexError:
+                    # another consumer took the last one
+                    pass
+
+            # TODO: handle self.queue.task_done() here so we dont have to everywhere else
+            item = self.queue.get(block=block, timeout=timeout)
+            if not isinstance(item, Chunk):
+                return self.resolve(item)
+
+            # one task_done() for the whole chunk, the per item calls are counted off
+            self.queue.task_done()
+            with self.chunk_lock:
+                self.unacked += len(item.items)
+            self.incoming.extend(item.items)
 
     def task_done(self):
+        if self.unacked:
+            with self.chunk_lock:
+                if self.unacked:
+                    self.unacked -= 1
+                    return
+
         self.queue.task_done()
 
+    async def async_get(self, executor=None):
+        """
+        Awaitable get() for coroutines on the async engine's event loop.
+
+        Queues backed by the loop are awaited directly. Any other queue is
+        bridged by blocking on get() in a thread of the given executor.
+        """
+        if isinstance(self.queue, LoopQueue):
+            return await self.queue.aget()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.get)
+
+    async def async_put(self, item):
+        """
+        Awaitable put() for coroutines on the async engine's event loop.
+        Yields to the loop while the queue is full instead of blocking it.
+        """
+        if not self.queue:
+            return self.put(item)
+
+        # prepared once, not on every retry
+        while True:
+            try:
+                item = self.prepare(item, block=False)
+                break
+            except queue.Full:
+                await asyncio.sleep(FULL_QUEUE_POLL_INTERVAL)
+
+        while True:
+            try:
+                return self.put_prepared(item, block=False)
+            except queue.Full:
+                await asyncio.sleep(FULL_QUEUE_POLL_INTERVAL)
+
+    async def async_wait_not_full(self):
+        """Yields to the event loop until the queue has space"""
+        while self.full():
+            await asyncio.sleep(FULL_QUEUE_POLL_INTERVAL)
+
     # ---- Queue interface END
 
     def nameit(self, name: str = "Queue", id: int = None):
@@ -98,11 +598,11 @@ class Queue(Node):
             return [ item for item in list(self.buffer) if item is not QUEUE_SENTINEL]
 
         buffer = []
-        while not self.queue.empty():
-            task_item = self.queue.get()
-            self.queue.task_done()
+        while not self.empty():
+            task_item = self.get()
+            self.task_done()
 
-            if task_item == QUEUE_SENTINEL:
+            if task_item is QUEUE_SENTINEL:
                 break
 
             else:
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import pickle
+import random
+import time
+import traceback
+from typing import Tuple, Type
+
+
+class RetryPolicy:
+    """
+    How often, and after how long, a task tries an item again when its
+    function raises.
+
+    Attempt n is followed by a wait of backoff * 2 ** (n - 1) seconds, at
+    most max_backoff, cut short by a random fraction of up to jitter so that
+    items failing together don't all retry together.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff: float = 0.1,
+        max_backoff: float = 10.0,
+        jitter: float = 0.5,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    ):
+        """
+        Args:
+            max_attempts (int, optional): Attempts per item, the first
+                included. Default = 3.
+            backoff (float, optional): Seconds to wait after the first
+                failed attempt. Default = 0.1.
+            max_backoff (float, optional): Longest wait. Default = 10.
+            jitter (float, optional): Largest fraction of a wait taken off
+                at random, from 0 to 1. Default = 0.5.
+            retry_on (tuple, optional): Exception types worth retrying.
+                Any other exception fails the item at once. Default =
+                (Exception,).
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        if backoff < 0 or max_backoff < 0:
+            raise ValueError("backoff and max_backoff can't be negative")
+
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+
+        if isinstance(retry_on, type):
+            retry_on = (retry_on,)
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = tuple(retry_on)
+
+    def retryable(self, error: BaseException, attempt: int) -> bool:
+        """True if an item that raised error on attempt should be tried again"""
+        return attempt < self.max_attempts and isinstance(error, self.retry_on)
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before the attempt after attempt"""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class RetryQueue:
+    """
+    Items a worker is waiting to try again, soonest first. The worker keeps
+    taking new items in the meantime.
+    """
+
+    def __init__(self):
+        # (due, n, attempt, tags, item), n breaking ties in arrival order
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, delay: float, attempt: int, tags: tuple, item) -> None:
+        """Try item again, as attempt, in delay seconds"""
+        due = time.monotonic() + delay
+        heapq.heappush(self.heap, (due, next(self.counter), attempt, tags, item))
+
+    def wait(self) -> float:
+        """Seconds until the next retry is due, or None if there is none"""
+        if not self.heap:
+            return None
+
+        return max(0.0, self.heap[0][0] - time.monotonic())
+
+    def pop_due(self):
+        """Removes and returns the (attempt, tags, item) of every retry now due"""
+        now = time.monotonic()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, attempt, tags, item = heapq.heappop(self.heap)
+            yield attempt, tags, item
+
+
+class Failure:
+    """
+    An item a task gave up on, as sent to its dead letter queue. The item
+    of a batched task is the whole batch.
+    """
+
+    def __init__(self, task, item, error: BaseException, attempts: int):
+        self.task = str(task)
+        self.item = item
+        self.error = error
+        self.attempts = attempts
+
+        # the traceback itself doesn't survive pickling
+        self.traceback = "".join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        try:
+            pickle.dumps(self.error)
+        except Exception:
+            state["error"] = RuntimeError(repr(self.error))
+
+        return state
+
+    def __repr__(self):
+        return (
+            f"Failure({self.task}, {self.item!r}, {self.error!r}, "
+            f"attempts={self.attempts})"
+        )
@@ -0,0 +1,213 @@
+import os
+import threading
+import uuid
+import weakref
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Payloads smaller than this are cheaper to pickle than to place in shared memory
+SHARED_MEMORY_MIN_BYTES = 64 * 1024
+
+# Per process state of every arena, see SharedArena.local()
+_process_state = {}
+
+
+class SharedPayload:
+    """Handle to a payload placed in a shared memory block, sent in its place"""
+
+    def __init__(self, name: str, size: int, nbytes: int, kind: str, layout=None):
+        """
+        Args:
+            name (str): Name of the shared memory block.
+            size (int): Size class of the block, in bytes.
+            nbytes (int): Bytes of the block holding the payload.
+            kind (str): "ndarray", "bytes" or "memoryview".
+            layout (tuple): (dtype, shape) of an array, or (format, shape)
+                of a memoryview.
+        """
+        self.name = name
+        self.size = size
+        self.nbytes = nbytes
+        self.kind = kind
+        self.layout = layout
+
+
+class SharedArena:
+    """
+    Shared memory blocks holding large payloads in flight between the
+    processes of a pipeline run.
+
+    Blocks come in power of two size classes and are recycled once the
+    last reference to them is released. Every handle sent counts as a
+    reference, as does every array viewing a block, until it is garbage
+    collected. Arrays are returned as views on their block, so passing one
+    on from a task or op sends the same block without copying it. Bytes
+    and memoryviews are copied out and release their block straight away.
+    """
+
+    def __init__(self, mp_manager, min_bytes: int = SHARED_MEMORY_MIN_BYTES):
+        """
+        Args:
+            mp_manager: multiprocessing.Manager holding the reference counts.
+            min_bytes (int): Smallest payload placed in shared memory.
+        """
+        self.key = uuid.uuid4().hex
+        self.min_bytes = min_bytes
+
+        # block name -> number of references, and size -> names of free blocks
+        self.refs = mp_manager.dict()
+        self.free = mp_manager.dict()
+        self.lock = mp_manager.Lock()
+
+        # once closed, released blocks are unlinked instead of recycled
+        self.state = mp_manager.Namespace(closed=False)
+
+    def local(self) -> dict:
+        """
+        Blocks this process has attached to, and arrays it has handed out
+        keyed by id(). Shared by every copy of the arena in the process.
+        """
+        key = (self.key, os.getpid())
+        if key not in _process_state:
+            _process_state[key] = {
+                "attached": {},
+                "views": {},
+                "lock": threading.Lock(),
+            }
+
+        return _process_state[key]
+
+    def attach(self, name: str) -> shared_memory.SharedMemory:
+        local = self.local()
+        with local["lock"]:
+            if name not in local["attached"]:
+                local["attached"][name] = shared_memory.SharedMemory(name=name)
+
+            return local["attached"][name]
+
+    def allocate(self, nbytes: int) -> SharedPayload:
+        """Reserve a block for nbytes, holding one reference for the caller"""
+        size = max(self.min_bytes, 1 << (nbytes - 1).bit_length())
+
+        with self.lock:
+            names = self.free.get(size)
+            if names:
+                name = names[-1]
+                self.free[size] = names[:-1]
+                self.refs[name] = 1
+
+        if not names:
+            block = shared_memory.SharedMemory(create=True, size=size)
+            name = block.name
+            self.local()["attached"][name] = block
+            self.refs[name] = 1
+
+        return SharedPayload(name, size, nbytes, None)
+
+    def release(self, name: str, size: int) -> None:
+        """Drop a reference to a block, recycling it if it was the last"""
+        try:
+            with self.lock:
+                count = self.refs[name] - 1
+                self.refs[name] = count
+                if count:
+                    return
+
+                if self.state.closed:
+                    del self.refs[name]
+                    self.attach(name).unlink()
+                else:
+                    self.free[size] = self.free.get(size, []) + [name]
+
+        except Exception:
+            # the manager may already be gone at interpreter exit
+            pass
+
+    def share(self, item):
+        """Handle to send instead of item, or item itself if it is small"""
+        if np is not None and isinstance(item, np.ndarray):
+            if item.nbytes < self.min_bytes or item.dtype.hasobject:
+                return item
+
+            # an array handed out by resolve() is sent on in the same block
+            view = self.local()["views"].get(id(item))
+            if view is not None and view[1]() is item:
+                payload = view[0]
+                with self.lock:
+                    self.refs[payload.name] += 1
+                return payload
+
+            payload = self.allocate(item.nbytes)
+            payload.kind = "ndarray"
+            payload.layout = (item.dtype, item.shape)
+
+            block = self.attach(payload.name)
+            np.ndarray(item.shape, item.dtype, buffer=block.buf)[...] = item
+            return payload
+
+        if isinstance(item, (bytes, memoryview)):
+            view = memoryview(item)
+            if view.nbytes < self.min_bytes:
+                return item
+
+            if not view.c_contiguous:
+                view = memoryview(view.tobytes())
+
+            payload = self.allocate(view.nbytes)
+            payload.kind = "memoryview" if isinstance(item, memoryview) else "bytes"
+            payload.layout = (view.format, view.shape)
+
+            block = self.attach(payload.name)
+            block.buf[: view.nbytes] = view.cast("B")
+            return payload
+
+        return item
+
+    def resolve(self, item):
+        """The payload a handle from share() stands for, or item itself"""
+        if not isinstance(item, SharedPayload):
+            return item
+
+        block = self.attach(item.name)
+
+        if item.kind == "ndarray":
+            dtype, shape = item.layout
+            array = np.ndarray(shape, dtype, buffer=block.buf)
+
+            # the handle's reference now belongs to the array
+            views = self.local()["views"]
+            views[id(array)] = (item, weakref.ref(array))
+            weakref.finalize(array, self.drop_view, id(array), item.name, item.size)
+            return array
+
+        data = block.buf[: item.nbytes]
+        if item.kind == "bytes":
+            payload = bytes(data)
+        else:
+            fmt, shape = item.layout
+            payload = memoryview(bytearray(data)).cast(fmt, shape)
+        data.release()
+
+        self.release(item.name, item.size)
+        return payload
+
+    def drop_view(self, key: int, name: str, size: int) -> None:
+        self.local()["views"].pop(key, None)
+        self.release(name, size)
+
+    def close(self) -> None:
+        """
+        Unlink every free block. Blocks still referenced are unlinked as
+        they are released, so queues can be flushed after shutdown.
+        """
+        with self.lock:
+            self.state.closed = True
+            for names in self.free.values():
+                for name in names:
+                    del self.refs[name]
+                    self.attach(name).unlink()
+            self.free.clear()
@@ -1,5 +1,8 @@
 from .constants import *
 from .pipeline import _global_pipeline
+from .op import NO_INITIAL
+from .ordering import ORDER_WINDOW
+from .pipeline_run import PipelineRun
 from .queue import Queue
 from .task import Task
 
@@ -8,12 +11,37 @@ from typing import Callable, List, Tuple
 """skorche API"""
 
 
-def map(task: Task, queue_in: Queue, queue_out: Queue = None) -> Queue:
-    """Maps a task performing function over an input queue and binds it to an output queue"""
-    queue_out = _global_pipeline.map(task, queue_in, queue_out=queue_out)
+def map(
+    task: Task,
+    queue_in: Queue,
+    queue_out: Queue = None,
+    ordered: bool = False,
+    window: int = ORDER_WINDOW,
+) -> Queue:
+    """
+    Maps a task performing function over an input queue and binds it to an output queue.
+
+    With ordered=True, results come out in the order their items went in,
+    however many workers the task has. At most window items are let into
+    the task at once, which bounds the results held back waiting for a
+    slower item before them.
+    """
+    queue_out = _global_pipeline.map(
+        task, queue_in, queue_out=queue_out, ordered=ordered, window=window
+    )
     return queue_out
 
 
+def dead_letters(task: Task) -> Queue:
+    """
+    Queue of a task mapped with dead_letter=True, receiving a Failure for
+    every item the task gave up on. It is terminated by the sentinel once
+    the task finishes, so it can be flushed after the run or mapped over
+    like any other queue.
+    """
+    return _global_pipeline.dead_letters(task)
+
+
 def chain(task_list: List[Task], queue_in: Queue, queue_out: Queue = None) -> Queue:
     """
     Chains together a list of tasks between an input queue and output queue.
@@ -36,12 +64,59 @@ def split(
     return queue_out_tuple
 
 
-def merge(queues_in: Tuple[Queue], queue_out: Queue = None) -> Queue:
+def partition(key_fn: Callable, queue_in: Queue, n: int) -> Tuple[Queue]:
+    """
+    Hash partitions a queue into n queues by key_fn(item). Items with equal
+    keys always go to the same queue, so a stateful task mapped over each
+    partition owns a disjoint set of keys and needs no locks to aggregate
+    them.
+    """
+    queue_out_tuple = _global_pipeline.partition(key_fn, queue_in, n)
+    return queue_out_tuple
+
+
+def balance(queue_in: Queue, n: int) -> Tuple[Queue]:
+    """
+    Splits a queue into n queues, sending each item to whichever holds the
+    fewest items waiting, so that a slow or busy branch is given less work.
+    Queues holding as few take turns.
+    """
+    queue_out_tuple = _global_pipeline.balance(queue_in, n)
+    return queue_out_tuple
+
+
+def merge(
+    queues_in: Tuple[Queue],
+    queue_out: Queue = None,
+    ordered: bool = False,
+    window: int = ORDER_WINDOW,
+    weights=None,
+    burst: int = 1,
+) -> Queue:
     """
     Merges multiple queues into one.
     The order in which input queues are popped is not specified.
+
+    With ordered=True, items come out in the order they passed through the
+    nearest queue upstream of all input queues, e.g. the input of the split
+    they were divided by. Every path from that queue must lead to the merge
+    through tasks, filters, splits and merges. At most window items are let
+    past that queue at once.
+
+    Each input hands over up to burst items already waiting at once. When
+    the output queue can't keep up, inputs take turns in proportion to
+    their weights, one number per input queue, or with weights="depth" to
+    the number of items waiting on each. Turns only apply with the "event"
+    scheduler, the default.
     """
-    queue_out = _global_pipeline.merge(queues_in, queue_out=queue_out)
+    queue_out = _global_pipeline.merge(
+        queues_in,
+        queue_out=queue_out,
+        ordered=ordered,
+        window=window,
+        weights=weights,
+        burst=burst,
+    )
     return queue_out
 
 
@@ -50,6 +125,11 @@ def batch(
     queue_out: Queue = None,
     batch_size: int = 1,
     fill_batch: bool = True,
+    max_wait: float = None,
+    min_size: int = 1,
+    target_latency: float = None,
+    max_bytes: int = None,
+    sizeof: Callable = None,
 ) -> Queue:
     """
     Batches items from an input queue together and pushes a list to the output queue.
@@ -57,14 +137,27 @@ def batch(
     Args:
         queue_in (:obj: Queue`): The input queue.
         queue_out (:obj:`Queue, optional): The output queue.
-        batch_size (int, optional): Maximum number of task items to batch together. Default=1.
+        batch_size (int, optional): Maximum number of task items to batch together, or None for no limit if max_bytes is given. Default=1.
         fill_batch (bool, optional): if False, send a batch smaller than batch_size if queue is empty. Default = True.
+        max_wait (float, optional): Send a batch, however small, once its first item has waited this many seconds. Default = None, wait for the batch to fill.
+        min_size (int, optional): Smallest batch fill_batch=False sends when the queue is empty. Default = 1.
+        target_latency (float, optional): Adaptive mode. Grow batches for as long as the first item can still get through the next stage within this many seconds, judging by how fast items arrive and how long the next stage has taken per batch. Default = None.
+        max_bytes (int, optional): Maximum total size of a batch, measured by sizeof. An item bigger than max_bytes is sent in a batch of its own. Default = None.
+        sizeof (Callable, optional): Size of an item in bytes. Default = len.
     Returns:
         queue_out (:obj:`Queue`): The output queue.
     """
 
     queue_out = _global_pipeline.batch(
-        queue_in, queue_out=queue_out, batch_size=batch_size, fill_batch=fill_batch
+        queue_in,
+        queue_out=queue_out,
+        batch_size=batch_size,
+        fill_batch=fill_batch,
+        max_wait=max_wait,
+        min_size=min_size,
+        target_latency=target_latency,
+        max_bytes=max_bytes,
+        sizeof=sizeof,
     )
     return queue_out
 
@@ -96,13 +189,98 @@ def filter(predicate_fn: Callable, queue_in: Queue, queue_out: Queue = None) ->
     return queue_out
 
 
-def run():
-    """Run pipeline"""
-    _global_pipeline.run()
+def run(
+    queue_backend: str = None,
+    scheduler: str = None,
+    max_threads: int = None,
+    max_processes: int = None,
+    queue_maxsize: int = 0,
+    fuse: bool = True,
+    chunk_size: int = 1,
+    chunk_linger: float = 0.005,
+    profile: bool = False,
+    autoscale: bool = False,
+    shared_memory: bool = False,
+    checkpoint: str = None,
+    resume: str = None,
+    checkpoint_interval: float = 5.0,
+) -> PipelineRun:
+    """
+    Run pipeline in the background. Returns a PipelineRun handle which can
+    be used to wait() on, cancel() or query the status() of the pipeline.
+
+    Args:
+        queue_backend (str, optional): "thread" for in-process queues or
+            "manager" for multiprocessing.Manager queues. By default the
+            cheapest backend able to serve every task is selected.
+        scheduler (str, optional): "event" to wake ops on arriving items,
+            "async" to run ops as coroutines on the async engine or "poll"
+            for the legacy busy loop. Default = "async" if any task is a
+            coroutine function, otherwise "event".
+        max_threads (int, optional): Total worker threads shared by all
+            thread tasks. Each task gets between its min_workers and
+            max_workers. By default every task gets its max_workers.
+        max_processes (int, optional): Total worker processes shared by all
+            process tasks. Default = os.cpu_count().
+        queue_maxsize (int, optional): maxsize of every Queue that wasn't
+            given its own. Producers block while a queue is full, keeping
+            memory flat however large the input. Default = 0 (unbounded).
+        fuse (bool, optional): Fuse chains of map and filter stages with the
+            same executor and worker counts into a single stage, removing
+            the queues between them. Default = True.
+        chunk_size (int, optional): Number of items sent through a queue in
+            one backend put. Tasks and ops still see single items, but the
+            number of put/get round trips drops by this factor, which pays
+            off for cheap tasks on the "manager" backend. maxsize is then
+            counted in chunks. Default = 1.
+        chunk_linger (float, optional): Seconds a partly filled chunk waits
+            for more items before it is sent anyway. Default = 0.005.
+        profile (bool, optional): Record items in and out, latency histograms
+            and busy time of every task and op, and sample queue depths.
+            Query them with the snapshot() and report() of the returned
+            handle's profiler, or skorche.graph_analyzer(). Default = False.
+        autoscale (bool, optional): Let skorche manage the number of workers
+            of every thread and process task. Each starts with min_workers,
+            and gains workers while its input queue backs up or loses them
+            while it sits idle, between min_workers and max_workers and
+            within max_threads and max_processes. Default = False.
+        shared_memory (bool, optional): On the "manager" backend, place
+            NumPy arrays, bytes and memoryviews of 64KiB or more in shared
+            memory and send only a handle through the manager. Arrays are
+            received as views on the shared block without a copy.
+            Default = False.
+        checkpoint (str, optional): Path of an sqlite file in which the result
+            of every item each task completes is recorded, so that a crashed
+            run can be resumed. Any earlier contents are discarded.
+            Default = None.
+        resume (str, optional): Checkpoint file of an earlier, interrupted
+            run of the same pipeline. Feed the same inputs again: items a
+            task already completed are passed straight on with their
+            recorded result, and recording carries on into the file. Tasks
+            are matched by name. Default = None.
+        checkpoint_interval (float, optional): Seconds between writes to the
+            checkpoint, the most work a crash can lose. Default = 5.
+    """
+    return _global_pipeline.run(
+        queue_backend=queue_backend,
+        scheduler=scheduler,
+        max_threads=max_threads,
+        max_processes=max_processes,
+        queue_maxsize=queue_maxsize,
+        fuse=fuse,
+        chunk_size=chunk_size,
+        chunk_linger=chunk_linger,
+        profile=profile,
+        autoscale=autoscale,
+        shared_memory=shared_memory,
+        checkpoint=checkpoint,
+        resume=resume,
+        checkpoint_interval=checkpoint_interval,
+    )
 
 
 def shutdown():
-    """Shutdown pipeline"""
+    """Block until the pipeline is done and shut it down"""
     _global_pipeline.shutdown()
 
 
@@ -112,9 +290,90 @@ def push_to_queue(task_list: list, queue: Queue):
     queue.put(QUEUE_SENTINEL)
 
 
+def graph_analyzer() -> str:
+    """Profile report of the running pipeline naming its bottleneck stage"""
+    return _global_pipeline.graph_analyzer()
+
+
 def render_pipeline(**kwargs):
+    """
+    Render the pipeline to graphviz/<filename>.svg. Pass profiler= the
+    profiler of a PipelineRun to annotate it with the measured throughput,
+    queue high-water marks and how busy each task and op was.
+    """
     _global_pipeline.render_pipeline(**kwargs)
 
 
 def init():
     _global_pipeline.__init__()
+
+
+def reduce(fn: Callable, queue_in: Queue, initial=NO_INITIAL, queue_out: Queue = None) -> Queue:
+    """
+    Folds a queue into a single result, result = fn(result, item) for every
+    item, starting from initial, or from the first item if no initial is
+    given. The result is put on the output queue once the input ends. Only
+    the running result is kept in memory.
+    """
+    queue_out = _global_pipeline.reduce(fn, queue_in, initial, queue_out=queue_out)
+    return queue_out
+
+
+def group_by(
+    key_fn: Callable,
+    agg_fn: Callable,
+    queue_in: Queue,
+    initial=NO_INITIAL,
+    queue_out: Queue = None,
+) -> Queue:
+    """
+    Folds the items of each key_fn(item) separately, as reduce() does with
+    agg_fn. Once the input ends, a (key, result) pair per key is put on the
+    output queue, in the order the keys were first seen. One running result
+    per key is kept in memory.
+    """
+    queue_out = _global_pipeline.group_by(
+        key_fn, agg_fn, queue_in, initial, queue_out=queue_out
+    )
+    return queue_out
+
+
+def window(
+    queue_in: Queue,
+    size: int = None,
+    step: int = None,
+    duration: float = None,
+    every: float = None,
+    agg_fn: Callable = None,
+    initial=NO_INITIAL,
+    timestamp: Callable = None,
+    queue_out: Queue = None,
+) -> Queue:
+    """
+    Groups a queue into windows, each put on the output queue once complete
+    as agg_fn folded over its items (see reduce()), or as a list of them.
+
+    Count windows hold size items, and a new one starts every step items.
+    Time windows span duration seconds, and a new one starts every every
+    seconds. Time is when items arrive unless timestamp(item) gives it, in
+    which case windows close as later items arrive, and items must arrive
+    roughly in timestamp order: those older than a window already sent are
+    dropped. step and every default to the window's length, which gives
+    tumbling windows; shorter ones give sliding windows.
+
+    Windows holding items not yet sent in an earlier window are sent when
+    the input ends, incomplete. Only the items of open windows are kept in
+    memory, or a running result for tumbling windows with an agg_fn.
+    """
+    queue_out = _global_pipeline.window(
+        queue_in,
+        size,
+        step,
+        duration,
+        every,
+        agg_fn,
+        initial,
+        timestamp,
+        queue_out=queue_out,
+    )
+    return queue_out
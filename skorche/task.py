@@ -1,19 +1,141 @@
+from .backend import WorkerCount
+from .cache import Cache, LRUCache
 from .constants import *
 from .node import NodeType, Node
+from .ordering import SKIPPED, retag, untag
 from .queue import Queue
+from .retry import Failure, RetryPolicy, RetryQueue
+import asyncio
+import concurrent.futures
+import importlib
+import inspect
 import logging
+import pickle
+import queue
+import signal
+import threading
+import time
+from typing import Callable, List, Tuple
+
+EXECUTORS = ("thread", "process", "async")
+
+# An item running this many times longer than the task's p95 is speculated on
+SPECULATION_FACTOR = 2.0
+
+# Items a task completes before its p95 is trusted for speculation
+SPECULATION_MIN_ITEMS = 20
 
 
 class Task(Node):
     """Base class for task"""
 
     def __init__(
-        self, func, name=TASK_DEFAULT_NAME, max_workers=1, logger=logging.getLogger()
+        self,
+        func,
+        name=TASK_DEFAULT_NAME,
+        max_workers=1,
+        logger=logging.getLogger(),
+        executor=None,
+        min_workers=1,
+        fuse=True,
+        batched=False,
+        batch_size=None,
+        max_wait=None,
+        cache=None,
+        retry=None,
+        dead_letter=False,
+        timeout=None,
+        speculate=False,
     ):
         super().__init__(NodeType.TASK)
+
+        # coroutine functions run on the async engine unless told otherwise
+        if executor is None:
+            executor = "async" if inspect.iscoroutinefunction(func) else "thread"
+
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}, got '{executor}'")
+
+        if executor == "async" and not inspect.iscoroutinefunction(func):
+            raise ValueError("executor='async' requires an async def function")
+
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError("Need 1 <= min_workers <= max_workers")
+
+        if batched:
+            if executor == "async":
+                raise ValueError("batched=True needs a thread or process executor")
+
+            if batch_size is None or batch_size < 1:
+                raise ValueError("batched=True needs a batch_size of at least 1")
+
+            if cache:
+                raise ValueError("batched tasks can't be cached")
+
+        if cache is True:
+            cache = LRUCache()
+
+        if cache is not None and not isinstance(cache, Cache):
+            raise ValueError("cache must be True or a Cache instance")
+
+        if retry is True:
+            retry = RetryPolicy()
+        elif isinstance(retry, int) and not isinstance(retry, bool):
+            retry = RetryPolicy(max_attempts=retry)
+
+        if retry not in (None, False) and not isinstance(retry, RetryPolicy):
+            raise ValueError("retry must be True, a number of attempts or a RetryPolicy")
+
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be positive")
+
+        if speculate is True:
+            speculate = SPECULATION_FACTOR
+
+        if speculate:
+            if executor == "process":
+                raise ValueError("speculate needs a thread or async executor")
+
+            if speculate <= 1:
+                raise ValueError("speculate must be True or a factor above 1")
+
         self.perform_task = func
         self.name = name
+        self.logger = logger
         self.max_workers = max_workers
+        self.min_workers = min_workers
+        self.executor = executor
+
+        # may be fused with neighbouring stages by skorche.run()
+        self.fuse = fuse
+
+        # batched tasks are called with a list of up to batch_size items and
+        # return an iterable of results, which are sent on one by one
+        self.batched = batched
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+
+        # results are looked up here before perform_task is called
+        self.cache = cache
+
+        # items that raise are tried again as the policy allows, then given
+        # up on. With dead_letter, skorche.map() gives the task a queue
+        # receiving a Failure for each, otherwise they are logged
+        self.retry = retry or None
+        self.dead_letter = dead_letter
+        self.dead_letter_queue = None
+
+        # items running longer than timeout seconds raise TimeoutError. With
+        # speculate, an item running speculate times longer than the task's
+        # p95 is started again and whichever copy finishes first is taken
+        self.timeout = timeout
+        self.speculate = speculate or None
+
+        # TaskCheckpoint set by skorche.run(checkpoint=..., resume=...)
+        self.checkpoint = None
+
+        # NodeStats set by skorche.run(profile=True)
+        self.stats = None
 
     def __call__(self, *args, **kwargs):
         result = self.perform_task(*args, **kwargs)
@@ -22,31 +144,683 @@ class Task(Node):
     def __str__(self):
         return self.name
 
-    def handle_task(self, worker_id: int, queue_in: Queue, queue_out: Queue):
+    def __getstate__(self):
+        state = super().__getstate__()
+
+        # A decorated function is shadowed in its module by its Task, so it
+        # can't be pickled by reference. Record where to find it instead.
+        func = self.perform_task
+        if _resolve(func.__module__, func.__qualname__) is self:
+            state["perform_task"] = (func.__module__, func.__qualname__)
+
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state["perform_task"], tuple):
+            state["perform_task"] = _resolve(*state["perform_task"]).perform_task
+
+        self.__dict__.update(state)
+
+    def check_picklable(self):
+        """Raises ValueError if this task cannot be sent to a process pool"""
+        try:
+            pickle.loads(pickle.dumps(self))
+        except Exception as e:
+            raise ValueError(
+                f"Task '{self}' uses executor='process' but cannot be pickled. "
+                "Process tasks must be defined at module level."
+            ) from e
+
+    def handle_task(
+        self, worker_id: int, queue_in: Queue, queue_out: Queue, workers: WorkerCount
+    ):
+        """
+        Worker loop performing the task on items from queue_in until the
+        sentinel is reached. Every worker of the task runs this loop
+        concurrently on the same queues, and workers counts those running.
+        """
         sentinel_reached = False
+        retired = False
+
+        # failed items waiting for another attempt by this worker
+        retries = RetryQueue()
+
+        try:
+            while True:
+                self.retry_due(retries, queue_out)
+
+                timeout = workers.idle_timeout
+                if retries:
+                    timeout = retries.wait()
+
+                try:
+                    task = queue_in.get(timeout=timeout)
+                except queue.Empty:
+                    if retries:
+                        continue
+
+                    # the autoscaler may want fewer workers
+                    retired = workers.retire()
+                    if retired:
+                        break
+                    continue
+
+                queue_in.task_done()
+
+                if task is QUEUE_SENTINEL:
+                    sentinel_reached = True
+                    break
+
+                if self.batched:
+                    batch, sentinel_reached = self.collect_batch(task, queue_in)
+                    self.attempt(batch, (), 1, queue_out, retries)
+                    if sentinel_reached:
+                        break
+                    continue
+
+                # items inside an ordered stage carry their sequence numbers
+                tags, task = untag(task)
+                if task is SKIPPED:
+                    self.emit(task, queue_out, tags)
+                    continue
+
+                self.attempt(task, tags, 1, queue_out, retries)
+
+            # the sentinel waits until every retry has been settled
+            while retries:
+                time.sleep(retries.wait())
+                self.retry_due(retries, queue_out)
+
+        finally:
+            self.flush_checkpoint()
+            stop_call_threads()
 
-        while not sentinel_reached:
+            # also runs if the worker died, so its siblings aren't left waiting
+            if retired:
+                queue_out.send_chunk()
+                if self.dead_letter_queue is not None:
+                    self.dead_letter_queue.send_chunk()
+            else:
+                self.handle_sentinel(sentinel_reached, queue_in, queue_out, workers)
+
+        # process workers record into their own copy of the stats
+        return self.stats
+
+    def attempt(
+        self, task, tags: tuple, attempt: int, queue_out: Queue, retries: RetryQueue
+    ):
+        """
+        Performs task, a whole batch for batched tasks, and emits the
+        results. If it raises, it is pushed onto retries when the retry
+        policy allows another attempt and given up on otherwise.
+        """
+        n_items = len(task) if self.batched else 1
+        try:
+            result = self.perform(task, n_items)
+
+        except FilterError as e:
+            # fails the worker, as the error would have failed the filter op
+            raise e.error
+
+        except Exception as e:
+            if self.retry is not None and self.retry.retryable(e, attempt):
+                if self.stats:
+                    self.stats.count_retry()
+                retries.push(self.retry.delay(attempt), attempt + 1, tags, task)
+                return
+
+            failure = self.give_up(task, e, attempt)
+            if self.dead_letter_queue is not None:
+                self.dead_letter_queue.put(failure)
+
+            # still accounted for, so the ordered stage doesn't wait on it
+            if not self.batched:
+                self.emit(SKIPPED, queue_out, tags)
+
+        else:
+            if not self.batched:
+                self.emit(result, queue_out, tags)
+                return
+
+            for item in result:
+                self.emit(item, queue_out)
+
+    def retry_due(self, retries: RetryQueue, queue_out: Queue):
+        """Makes the next attempt at every item whose retry is due"""
+        for attempt, tags, task in retries.pop_due():
+            self.attempt(task, tags, attempt, queue_out, retries)
+
+    def give_up(self, task, error: Exception, attempts: int) -> Failure:
+        """
+        Counts task as failed and logs it, unless it goes to the dead
+        letter queue. Returns its Failure.
+        """
+        if self.stats:
+            self.stats.count_failure()
+
+        failure = Failure(self, task, error, attempts)
+        if self.dead_letter_queue is None:
+            self.logger.warning(
+                "Task '%s' gave up on %r after %d attempt(s)\n%s",
+                self,
+                task,
+                attempts,
+                failure.traceback,
+            )
+
+        return failure
+
+    def perform(self, task, n_items=1):
+        """call(), timed if the task is being profiled"""
+        if self.stats is None:
+            return self.call_guarded(task)
+
+        start = time.perf_counter()
+        try:
+            return self.call_guarded(task)
+        finally:
+            self.stats.record(time.perf_counter() - start, n_items)
+
+    def call_guarded(self, task):
+        """call(), subject to the task's timeout and speculation"""
+        if self.timeout is None and self.speculate is None:
+            return self.call(task)
+
+        # a process worker runs on its process's main thread, where an alarm
+        # can interrupt the item itself rather than leave it running
+        if self.speculate is None and on_main_thread():
+            return self.call_with_alarm(task)
+
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+
+        # copies run on this worker's call threads, future -> thread
+        idle = idle_call_threads()
+        threads = {}
+
+        def start_copy():
+            thread = idle.pop() if idle else CallThread()
+            future = thread.start(self.call, task)
+            threads[future] = thread
+            return future
+
+        pending = {start_copy()}
+        try:
+            straggler = self.straggler_time()
+            if straggler is not None and (deadline is None or straggler < self.timeout):
+                done, _ = concurrent.futures.wait(pending, timeout=straggler)
+                if not done:
+                    if self.stats:
+                        self.stats.count_speculation()
+                    pending.add(start_copy())
+
+            # the first copy to succeed wins, a copy that raised only loses
+            # once every other copy has finished too
+            error = None
+            while pending:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0.0, deadline - time.monotonic())
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError(f"{self} took longer than {self.timeout}s")
+
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+
+            raise error
+
+        finally:
+            # threads can't be killed, so one still running its copy is
+            # abandoned to finish on its own and replaced when next needed
+            for future, thread in threads.items():
+                if future.done():
+                    idle.append(thread)
+                else:
+                    thread.stop()
+
+    def call_with_alarm(self, task):
+        def interrupt(signum, frame):
+            raise TimeoutError(f"{self} took longer than {self.timeout}s")
+
+        handler = signal.signal(signal.SIGALRM, interrupt)
+        signal.setitimer(signal.ITIMER_REAL, self.timeout)
+        try:
+            return self.call(task)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, handler)
+
+    def straggler_time(self) -> float:
+        """
+        Seconds after which an item is worth speculating on, or None if the
+        task doesn't speculate or hasn't seen enough items yet
+        """
+        if self.speculate is None or self.stats is None:
+            return None
+
+        if self.stats.items_in < SPECULATION_MIN_ITEMS:
+            return None
+
+        return self.speculate * self.stats.percentile(95)
+
+    def call(self, task):
+        """
+        perform_task, or its result from the task's cache or the checkpoint
+        of the run being resumed
+        """
+        stores = self.result_stores()
+        if not stores:
+            return self.perform_task(task)
+
+        keys, hit, result = self.recall(task, stores)
+        if not hit:
+            result = self.perform_task(task)
+
+        self.remember(keys, result)
+        return result
+
+    def result_stores(self) -> List[Cache]:
+        return [store for store in (self.cache, self.checkpoint) if store is not None]
+
+    def recall(self, task, stores: List[Cache]) -> Tuple[List, bool, object]:
+        """
+        Looks task up in each store until one has its result. Returns the
+        (store, key) pairs the result is missing from, whether it was found
+        and the result.
+        """
+        keys = []
+        for store in stores:
+            try:
+                key = store.key_for(task)
+            except Exception:
+                if store is not self.checkpoint:
+                    raise
+
+                # an item the checkpoint can't key is simply performed again on resume
+                continue
+
+            hit, result = store.lookup(key)
+            if store is self.cache and self.stats:
+                self.stats.count_lookup(hit)
+
+            if hit:
+                return keys, True, result
+
+            keys.append((store, key))
+
+        return keys, False, None
+
+    def remember(self, keys: List, result) -> None:
+        for store, key in keys:
+            store.store(key, result)
+
+    def flush_checkpoint(self) -> None:
+        """Write the results this worker recorded in the checkpoint"""
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+
+    def collect_batch(self, first_item, queue_in: Queue) -> Tuple[List, bool]:
+        """
+        Takes up to batch_size - 1 more items from queue_in to go with
+        first_item. Without a max_wait only items already waiting are
+        taken, otherwise items arriving within max_wait seconds of the
+        first are too. Returns the batch and whether the sentinel was taken.
+        """
+        batch = [first_item]
+        deadline = None if self.max_wait is None else time.monotonic() + self.max_wait
+
+        while len(batch) < self.batch_size:
             try:
-                task = queue_in.get()
+                if deadline is None:
+                    task = queue_in.get(block=False)
+                else:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    task = queue_in.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            queue_in.task_done()
 
-                if task is not QUEUE_SENTINEL:
-                    result = self.perform_task(task)
+            if task is QUEUE_SENTINEL:
+                return batch, True
+
+            batch.append(task)
+
+        return batch, False
+
+    def emit(self, result, queue_out: Queue, tags: tuple = ()):
+        """
+        Push the result of perform_task downstream. A SKIPPED result is
+        dropped, unless it has to be accounted for in an ordered stage.
+        """
+        if result is SKIPPED:
+            if tags:
+                queue_out.put(retag(tags, result))
+            return
+
+        queue_out.put(retag(tags, result))
+
+        if self.stats:
+            self.stats.count_out()
+
+    async def handle_task_async(self, queue_in: Queue, queue_out: Queue, executor=None):
+        """
+        Coroutine consumer for async tasks. Up to max_workers items are
+        awaited concurrently, so a single consumer (and a single sentinel)
+        is enough for the whole stage.
+
+        Args:
+            executor: Thread pool used to wait on queue_in if it isn't
+                backed by the event loop.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        in_flight = set()
+
+        while True:
+            task = await queue_in.async_get(executor)
+            queue_in.task_done()
+
+            if task is QUEUE_SENTINEL:
+                break
+
+            await semaphore.acquire()
+            future = asyncio.ensure_future(self.perform_task_async(task, queue_out))
+            future.add_done_callback(lambda _: semaphore.release())
+            future.add_done_callback(in_flight.discard)
+            in_flight.add(future)
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+        self.flush_checkpoint()
+        if self.dead_letter_queue is not None:
+            await self.dead_letter_queue.async_put(QUEUE_SENTINEL)
+        await queue_out.async_put(QUEUE_SENTINEL)
+
+    async def perform_task_async(self, task, queue_out: Queue):
+        tags, task = untag(task)
+        if task is SKIPPED:
+            await queue_out.async_put(retag(tags, task))
+            return
+
+        attempt = 1
+        while True:
+            start = time.perf_counter()
+            try:
+                result = await self.call_async_guarded(task)
 
             except Exception as e:
-                pass
+                if self.retry is not None and self.retry.retryable(e, attempt):
+                    # other items carry on while this one backs off
+                    if self.stats:
+                        self.stats.count_retry()
+                    await asyncio.sleep(self.retry.delay(attempt))
+                    attempt += 1
+                    continue
+
+                failure = self.give_up(task, e, attempt)
+                if self.dead_letter_queue is not None:
+                    await self.dead_letter_queue.async_put(failure)
+
+                if tags:
+                    await queue_out.async_put(retag(tags, SKIPPED))
 
             else:
-                if task is not QUEUE_SENTINEL:
-                    queue_out.put(result)
+                await queue_out.async_put(retag(tags, result))
+
+                if self.stats:
+                    self.stats.count_out()
 
             finally:
-                queue_in.task_done()
-                if task is QUEUE_SENTINEL:
-                    queue_out.put(QUEUE_SENTINEL)
-                    sentinel_reached = True
+                if self.stats:
+                    self.stats.record(time.perf_counter() - start)
+
+            return
+
+    async def call_async_guarded(self, task):
+        """Coroutine counterpart of call_guarded()"""
+        if self.timeout is None and self.speculate is None:
+            return await self.call_async(task)
+
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+
+        pending = {asyncio.ensure_future(self.call_async(task))}
+        try:
+            straggler = self.straggler_time()
+            if straggler is not None and (deadline is None or straggler < self.timeout):
+                done, _ = await asyncio.wait(pending, timeout=straggler)
+                if not done:
+                    if self.stats:
+                        self.stats.count_speculation()
+                    pending.add(asyncio.ensure_future(self.call_async(task)))
+
+            error = None
+            while pending:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0.0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError(f"{self} took longer than {self.timeout}s")
+
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+
+            raise error
+
+        finally:
+            # unlike threads, the losing or overrunning copies can be cancelled
+            for future in pending:
+                future.cancel()
+
+    async def call_async(self, task):
+        """Coroutine counterpart of call()"""
+        stores = self.result_stores()
+        if not stores:
+            return await self.perform_task(task)
+
+        keys, hit, result = self.recall(task, stores)
+        if not hit:
+            result = await self.perform_task(task)
+
+        self.remember(keys, result)
+        return result
+
+    def handle_sentinel(
+        self,
+        sentinel_reached: bool,
+        queue_in: Queue,
+        queue_out: Queue,
+        workers: WorkerCount,
+    ):
+        """
+        Called by every worker as it stops. The last one sends the sentinel
+        downstream, the others hand the sentinel they took on to a sibling.
+        """
+
+        # items this worker left in a partly filled chunk must go out before
+        # the last worker puts the sentinel
+        queue_out.send_chunk()
+        if self.dead_letter_queue is not None:
+            self.dead_letter_queue.send_chunk()
+
+        if not workers.add(-1):
+            if self.dead_letter_queue is not None:
+                self.dead_letter_queue.put(QUEUE_SENTINEL)
+            queue_out.put(QUEUE_SENTINEL)
+        elif sentinel_reached:
+            queue_in.put(QUEUE_SENTINEL)
+
+
+class FusedTask(Task):
+    """
+    Adjacent map and filter stages run back to back by the same workers, so
+    that items skip the queues that were between them.
+    """
+
+    def __init__(self, steps: List[Tuple[str, Callable]], like: Task):
+        """
+        Args:
+            steps (List): ("map", task) or ("filter", predicate_fn) pairs
+                in pipeline order.
+            like (Task): Task whose executor and worker counts are used.
+        """
+        name = " | ".join(
+            str(fn) if kind == "map" else f"Filter({fn.__name__})"
+            for kind, fn in steps
+        )
+        super().__init__(
+            self.perform_steps,
+            name=name,
+            max_workers=like.max_workers,
+            executor=like.executor,
+            min_workers=like.min_workers,
+        )
+        self.steps = steps
+
+    def __getstate__(self):
+        # the steps are pickled instead of the bound perform_task
+        state = Node.__getstate__(self)
+        del state["perform_task"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.perform_task = self.perform_steps
+
+    def perform_steps(self, task):
+        for kind, fn in self.steps:
+            if kind == "map":
+                task = fn.call(task)
+                continue
+
+            try:
+                keep = fn(task)
+            except Exception as e:
+                raise FilterError(e)
 
+            if not keep:
+                return SKIPPED
 
-def task(name=TASK_DEFAULT_NAME, max_workers=1, logger=logging.getLogger()):
+        return task
+
+    def flush_checkpoint(self) -> None:
+        for kind, fn in self.steps:
+            if kind == "map":
+                fn.flush_checkpoint()
+
+
+class FilterError(Exception):
+    """
+    A predicate of a FusedTask raised. Its error isn't given up on like a
+    failed item but fails the run, as it would fail a filter op.
+    """
+
+    def __init__(self, error: Exception):
+        super().__init__(error)
+        self.error = error
+
+
+def on_main_thread() -> bool:
+    return hasattr(signal, "setitimer") and (
+        threading.current_thread() is threading.main_thread()
+    )
+
+
+class CallThread:
+    """
+    Daemon thread making the calls a worker with a timeout or speculation
+    hands it, one at a time. A call the worker stops waiting for is left to
+    finish on its own, without holding up exit.
+    """
+
+    def __init__(self):
+        self.calls = queue.SimpleQueue()
+        threading.Thread(target=self.run, name="skorche-call", daemon=True).start()
+
+    def run(self):
+        while True:
+            call = self.calls.get()
+            if call is None:
+                return
+
+            fn, task, future = call
+            try:
+                future.set_result(fn(task))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def start(self, fn: Callable, task) -> concurrent.futures.Future:
+        """Calls fn(task) once the thread is free"""
+        future = concurrent.futures.Future()
+        self.calls.put((fn, task, future))
+        return future
+
+    def stop(self):
+        """Ends the thread once its current call, if any, returns"""
+        self.calls.put(None)
+
+
+# Idle CallThreads of the worker running on each thread
+_worker_local = threading.local()
+
+
+def idle_call_threads() -> List[CallThread]:
+    if not hasattr(_worker_local, "call_threads"):
+        _worker_local.call_threads = []
+
+    return _worker_local.call_threads
+
+
+def stop_call_threads() -> None:
+    """Ends the idle CallThreads of the worker on this thread"""
+    threads = idle_call_threads()
+    while threads:
+        threads.pop().stop()
+
+
+def _resolve(module: str, qualname: str):
+    """Look up an object by module and qualified name, or None if it isn't there"""
+    try:
+        obj = importlib.import_module(module)
+        for attr in qualname.split("."):
+            obj = getattr(obj, attr)
+    except (ImportError, AttributeError):
+        return None
+
+    return obj
+
+
+def task(
+    name=TASK_DEFAULT_NAME,
+    max_workers=1,
+    logger=logging.getLogger(),
+    executor=None,
+    min_workers=1,
+    fuse=True,
+    batched=False,
+    batch_size=None,
+    max_wait=None,
+    cache=None,
+    retry=None,
+    dead_letter=False,
+    timeout=None,
+    speculate=False,
+):
     """
     @task decorator which wraps a user function into a Task instance.
 
@@ -61,6 +835,64 @@ def task(name=TASK_DEFAULT_NAME, max_workers=1, logger=logging.getLogger()):
         def my_fun():
             pas
 
+    -Guarantee a task min_workers out of the worker budget given to
+     skorche.run(), growing up to max_workers if the budget allows
+        @task(min_workers=2, max_workers=8)
+        def my_fun():
+            pass
+
+    -Run CPU bound tasks on a process pool. The function must be defined
+     at module level so that it can be pickled.
+        @task(executor="process", max_workers=4)
+        def my_fun():
+            pass
+
+    -Decorate a coroutine function to run it on the async engine, with up
+     to max_workers items in flight at once.
+        @task(max_workers=1000)
+        async def my_fun():
+            pass
+
+    -Opt out of being fused with neighbouring map and filter stages by
+     skorche.run(), e.g. to keep its own worker count in use
+        @task(fuse=False)
+        def my_fun():
+            pass
+
+    -Vectorize a task over batches of up to batch_size items, without
+     batch and unbatch ops around it. The function is called with a list
+     and returns an iterable (e.g. a list or NumPy array) of results, one
+     per item. Workers wait up to max_wait seconds for a batch to fill, or
+     take only what is already waiting if max_wait is None.
+        @task(batched=True, batch_size=64, max_wait=0.01)
+        def my_fun(items):
+            return np.sqrt(np.array(items))
+
+    -Skip items whose result is already known. cache=True keeps the last
+     1024 results in memory, or pass an LRUCache or DiskCache to choose
+     the size, expiry, key, or to keep results on disk between runs.
+        @task(cache=DiskCache("downloads.db", key=lambda url: url))
+        def my_fun(url):
+            pass
+
+    -Try items that raise again, with exponential backoff, while the
+     worker carries on with other items. retry=3 allows three attempts,
+     a RetryPolicy also sets the backoff and which exceptions to retry.
+     Items given up on are logged, or with dead_letter=True sent to the
+     queue returned by skorche.dead_letters(my_fun) to be reprocessed.
+        @task(retry=RetryPolicy(max_attempts=5, retry_on=(IOError,)), dead_letter=True)
+        def my_fun(url):
+            pass
+
+    -Give up on items running longer than timeout seconds with a
+     TimeoutError, which counts as a failure for retry. Process workers
+     interrupt the item; thread workers leave it running and move on.
+     speculate=True also starts a second copy of any item running twice
+     as long as the task's p95, and takes whichever copy finishes first.
+        @task(timeout=30, speculate=True)
+        def my_fun(url):
+            pass
+
     """
     if callable(name):
         # pattern where user decorated function with @task
@@ -72,7 +904,23 @@ def task(name=TASK_DEFAULT_NAME, max_workers=1, logger=logging.getLogger()):
         # pattern where user decorated with @task(name=...)
 
         def decorator(func):
-            task_instance = Task(func, name, max_workers, logger)
+            task_instance = Task(
+                func,
+                name,
+                max_workers,
+                logger,
+                executor,
+                min_workers,
+                fuse,
+                batched,
+                batch_size,
+                max_wait,
+                cache,
+                retry,
+                dead_letter,
+                timeout,
+                speculate,
+            )
             return task_instance
 
         return decorator
@@ -1,7 +1,16 @@
+import asyncio
 import functools
+import gc
 import logging
+import os
 import pytest
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
 import time
+import tracemalloc
 
 import multiprocessing
 
@@ -335,3 +344,1781 @@ def test_end_to_end():
             expected.append(add_three(input))
 
     assert all([result in expected for result in results])
+
+
+@pytest.mark.parametrize("queue_backend", ["thread", "manager"])
+def test_queue_backends(queue_backend):
+    """Pipelines give the same results on every queue backend"""
+
+    @skorche.task
+    def add_one(x: int):
+        return x + 1
+
+    q = skorche.Queue(fixed_inputs=list(range(10)))
+    q_out = skorche.map(add_one, q)
+
+    skorche.run(queue_backend=queue_backend)
+    skorche.shutdown()
+
+    assert q_out.flush() == list(range(1, 11))
+
+
+def test_thread_only_pipeline_uses_thread_backend():
+    """Without process workers, queues should never go through a Manager"""
+
+    q = skorche.Queue(fixed_inputs=[1, 2, 3])
+    q_out = skorche.filter(lambda x: x > 1, q)
+
+    assert skorche._global_pipeline.select_queue_backend() == "thread"
+
+    skorche.run()
+    assert skorche._global_pipeline.queue_backend.name == "thread"
+    skorche.shutdown()
+
+    assert q_out.flush() == [2, 3]
+
+
+@pytest.mark.parametrize("scheduler", ["event", "poll", "async"])
+def test_op_schedulers(scheduler):
+    """Every op gives the same results under both op schedulers"""
+
+    q1 = skorche.Queue(fixed_inputs=list(range(10)))
+    q2 = skorche.Queue(fixed_inputs=list(range(10, 20)))
+
+    q_merged = skorche.merge((q1, q2))
+    q_pos, q_neg = skorche.split(lambda x: x % 2 == 0, q_merged)
+    q_pos = skorche.unbatch(skorche.batch(q_pos, batch_size=3))
+    q_neg = skorche.filter(lambda x: x > 10, q_neg)
+
+    skorche.run(scheduler=scheduler)
+    skorche.shutdown()
+
+    assert sorted(q_pos.flush()) == list(range(0, 20, 2))
+    assert sorted(q_neg.flush()) == list(range(11, 20, 2))
+
+
+# Process tasks are pickled by reference so must live at module level
+@skorche.task(name="cube", executor="process", max_workers=3)
+def cube(x: int):
+    return x**3
+
+
+def test_process_task():
+    """Tasks with executor='process' run on a process pool over manager queues"""
+
+    inputs = list(range(20))
+    q = skorche.Queue(fixed_inputs=inputs)
+    q_out = skorche.map(cube, q)
+
+    assert skorche._global_pipeline.select_queue_backend() == "manager"
+
+    skorche.run()
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [x**3 for x in inputs]
+
+
+def test_process_task_must_be_picklable():
+    """Unpicklable process tasks are rejected when the pipeline is built"""
+
+    @skorche.task(executor="process")
+    def local_task(x):
+        return x
+
+    with pytest.raises(ValueError):
+        skorche.map(local_task, skorche.Queue())
+
+
+def test_multiple_workers_propagate_one_sentinel():
+    """Every worker of a task stops and exactly one sentinel is sent downstream"""
+
+    @skorche.task(max_workers=4)
+    def add_one(x: int):
+        return x + 1
+
+    q = skorche.Queue(fixed_inputs=list(range(100)))
+    q_out = skorche.map(add_one, q)
+
+    skorche.run()
+    skorche.shutdown()
+
+    results = []
+    while not q_out.empty():
+        results.append(q_out.get())
+
+    assert results.count(skorche.QUEUE_SENTINEL) == 1
+    assert results[-1] is skorche.QUEUE_SENTINEL
+    assert sorted(results[:-1]) == list(range(1, 101))
+
+
+def test_worker_pool_allocation():
+    """Spare budget is shared evenly after every task gets its min_workers"""
+
+    t1 = skorche.Task(lambda x: x, max_workers=4)
+    t2 = skorche.Task(lambda x: x, max_workers=4)
+    t3 = skorche.Task(lambda x: x, min_workers=2, max_workers=2)
+
+    pool = skorche.WorkerPool("thread", budget=6)
+    allocation = pool.allocate([t1, t2, t3])
+
+    assert allocation == {t1: 2, t2: 2, t3: 2}
+
+    with pytest.raises(ValueError):
+        skorche.WorkerPool("thread", budget=3).allocate([t1, t2, t3])
+
+
+def test_shared_pool_budget():
+    """All thread tasks share one pool bounded by max_threads"""
+
+    tasks = [skorche.Task(lambda x: x + 1, max_workers=8) for _ in range(5)]
+
+    q_in = skorche.Queue(fixed_inputs=list(range(50)))
+    q_out = skorche.chain(tasks, q_in)
+
+    skorche.run(max_threads=7)
+
+    pool = skorche._global_pipeline.pool_table["thread"]
+    assert sum(pool.allocation.values()) == 7
+    assert pool.pool._max_workers == 7
+
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == list(range(5, 55))
+
+
+def test_run_returns_handle():
+    """run() returns straight away so inputs can be fed while the pipeline drains"""
+
+    @skorche.task
+    def add_one(x: int):
+        return x + 1
+
+    q_in = skorche.Queue()
+    q = skorche.map(add_one, q_in)
+    q_out = skorche.filter(lambda x: x % 2 == 0, q)
+
+    pipeline_run = skorche.run()
+
+    assert not pipeline_run.wait(timeout=0.05)
+    assert not pipeline_run.done()
+    assert set(pipeline_run.status().values()) == {"running"}
+
+    for i in range(10):
+        q_in.put(i)
+    q_in.put(skorche.QUEUE_SENTINEL)
+
+    assert pipeline_run.wait(timeout=5)
+    assert set(pipeline_run.status().values()) == {"done"}
+
+    skorche.shutdown()
+    assert q_out.flush() == [2, 4, 6, 8, 10]
+
+
+def test_cancel_run():
+    """Cancelling stops every node without waiting for queued items"""
+
+    @skorche.task
+    def slow(x: int):
+        time.sleep(0.05)
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(1000)))
+    q_out = skorche.batch(skorche.map(slow, q_in), batch_size=2)
+
+    pipeline_run = skorche.run()
+    time.sleep(0.1)
+    pipeline_run.cancel()
+
+    assert pipeline_run.wait(timeout=5)
+    assert set(pipeline_run.status().values()) == {"cancelled"}
+
+    skorche.shutdown()
+    assert len(q_out.flush()) < 500
+
+
+@pytest.mark.parametrize("scheduler", ["event", "poll", "async"])
+def test_failed_op_ends_run(scheduler):
+    """An op that raises ends its outputs, and shutdown raises its error"""
+
+    def sign(x: int):
+        if x == 3:
+            raise ValueError("no sign for 3")
+        return x > 0
+
+    @skorche.task
+    def double(x: int):
+        return 2 * x
+
+    def odd(x: int):
+        if x == 5:
+            raise KeyError(x)
+        return x % 2
+
+    q_pos, q_neg = skorche.split(sign, skorche.Queue(fixed_inputs=list(range(-5, 6))))
+    skorche.merge((q_pos, q_neg))
+    skorche.map(double, skorche.filter(odd, skorche.Queue(fixed_inputs=list(range(9)))))
+
+    skorche.run(scheduler=scheduler, fuse=False)
+
+    start = time.perf_counter()
+    with pytest.raises((ValueError, KeyError)):
+        skorche.shutdown()
+
+    assert time.perf_counter() - start < 5
+
+
+def test_async_task():
+    """Coroutine tasks keep up to max_workers items in flight on one event loop"""
+
+    @skorche.task(max_workers=500)
+    async def fetch(x: int):
+        await asyncio.sleep(0.2)
+        return x
+
+    inputs = list(range(500))
+    q_out = skorche.map(fetch, skorche.Queue(fixed_inputs=inputs))
+
+    assert fetch.executor == "async"
+
+    start = time.perf_counter()
+    skorche.run()
+    skorche.shutdown()
+
+    assert time.perf_counter() - start < 5
+    assert sorted(q_out.flush()) == inputs
+
+
+def test_mixed_async_pipeline():
+    """Queues between coroutine nodes live on the loop and others are bridged"""
+
+    @skorche.task(max_workers=2)
+    def add_one(x: int):
+        return x + 1
+
+    @skorche.task(max_workers=10)
+    async def double(x: int):
+        await asyncio.sleep(0.01)
+        return 2 * x
+
+    @skorche.task
+    def negate(x: int):
+        return -x
+
+    inputs = list(range(30))
+    q = skorche.map(add_one, skorche.Queue(fixed_inputs=inputs))
+    q_doubled = skorche.map(double, q)
+    q_big, q_small = skorche.split(lambda x: x > 20, q_doubled)
+    q_small = skorche.map(negate, q_small)
+
+    skorche.run()
+    assert isinstance(q_doubled.queue, skorche.backend.LoopQueue)
+    assert not isinstance(q.queue, skorche.backend.LoopQueue)
+    skorche.shutdown()
+
+    expected = [2 * (x + 1) for x in inputs]
+    assert sorted(q_big.flush()) == [x for x in expected if x > 20]
+    assert sorted(q_small.flush()) == sorted(-x for x in expected if x <= 20)
+
+
+def test_bounded_queue():
+    """Producers block on a full queue and resume once it has space"""
+
+    q_in = skorche.Queue(fixed_inputs=list(range(100)), maxsize=5)
+    q_out = skorche.unbatch(skorche.batch(q_in, batch_size=3))
+
+    pipeline_run = skorche.run(queue_maxsize=2)
+
+    # nothing is consuming q_out yet, so the pipeline stalls with most of
+    # the fixed inputs still waiting to be fed in the background
+    time.sleep(0.1)
+    assert pipeline_run.status()[q_in] == "running"
+
+    results = []
+    while True:
+        assert q_out.queue.qsize() <= 2
+        item = q_out.get()
+        q_out.task_done()
+        if item is skorche.QUEUE_SENTINEL:
+            break
+        results.append(item)
+
+    skorche.shutdown()
+    assert results == list(range(100))
+
+
+def test_backpressure_memory_ceiling():
+    """Memory stays flat when a fast producer feeds a slow sink through bounded queues"""
+
+    @skorche.task(max_workers=2)
+    def add_one(x: int):
+        return x + 1
+
+    @skorche.task
+    def slow_sink(x: int):
+        if x % 100 == 0:
+            time.sleep(0.001)
+        return x
+
+    n_items = 20000
+    q_in = skorche.Queue()
+    q_even, q_odd = skorche.split(lambda x: x % 2 == 0, skorche.map(add_one, q_in))
+    q_out = skorche.map(slow_sink, skorche.merge((q_even, q_odd)))
+
+    tracemalloc.start()
+    skorche.run(queue_maxsize=50)
+
+    def produce():
+        for i in range(n_items):
+            q_in.put(i)
+        q_in.put(skorche.QUEUE_SENTINEL)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    n_results = 0
+    while q_out.get() is not skorche.QUEUE_SENTINEL:
+        q_out.task_done()
+        n_results += 1
+
+    producer.join()
+    skorche.shutdown()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert n_results == n_items
+    assert peak < 500_000
+
+
+def test_cancel_bounded_run():
+    """Cancelling doesn't leave producers stuck on full queues"""
+
+    @skorche.task(max_workers=3)
+    def add_one(x: int):
+        return x + 1
+
+    q_in = skorche.Queue(fixed_inputs=list(range(1000)))
+    q = skorche.unbatch(skorche.batch(skorche.map(add_one, q_in), batch_size=4))
+    skorche.map(add_one, q)
+
+    pipeline_run = skorche.run(queue_maxsize=3)
+    time.sleep(0.1)
+    pipeline_run.cancel()
+
+    assert pipeline_run.wait(timeout=5)
+    skorche.shutdown()
+
+
+def test_queue_from_iterable():
+    """Items are pulled lazily, so output starts before the source is exhausted"""
+
+    @skorche.task
+    def add_one(x: int):
+        return x + 1
+
+    n_items = 100000
+    pulled = []
+
+    def source():
+        for i in range(n_items):
+            pulled.append(i)
+            yield i
+
+    q_in = skorche.Queue.from_iterable(source(), maxsize=10)
+    q_out = skorche.map(add_one, q_in)
+    skorche.run(queue_maxsize=10)
+
+    assert q_out.get() == 1
+    q_out.task_done()
+    assert len(pulled) < n_items
+
+    n_results = 1
+    while q_out.get() is not skorche.QUEUE_SENTINEL:
+        q_out.task_done()
+        n_results += 1
+
+    skorche.shutdown()
+    assert n_results == n_items
+
+
+def test_queue_from_file(tmp_path):
+    """Lines of a file are streamed into the pipeline and the queue is terminated"""
+
+    @skorche.task
+    def parse(line: str):
+        return int(line)
+
+    path = tmp_path / "inputs.txt"
+    path.write_text("".join(f"{i}\n" for i in range(500)))
+
+    q_out = skorche.map(parse, skorche.Queue.from_file(str(path), maxsize=8))
+    skorche.run()
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == list(range(500))
+
+
+def test_failing_source_terminates_queue():
+    """A source that raises still ends the stream and the error reaches wait()"""
+
+    def source():
+        yield 1
+        raise RuntimeError("bad source")
+
+    q_out = skorche.map(skorche.task(lambda x: x), skorche.Queue.from_iterable(source()))
+    skorche.run()
+
+    with pytest.raises(RuntimeError):
+        skorche.shutdown()
+
+    assert q_out.flush() == [1]
+
+
+@skorche.task(name="negate", executor="process", max_workers=3)
+def negate(x: int):
+    return -x
+
+
+def is_odd(x: int):
+    return x % 2 == 1
+
+
+def test_fuse_chain_and_filter():
+    """Map and filter stages with the same settings run as one fused stage"""
+
+    @skorche.task(max_workers=2)
+    def add_one(x: int):
+        return x + 1
+
+    @skorche.task(max_workers=2)
+    def double(x: int):
+        return 2 * x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(100)))
+    q = skorche.filter(lambda x: x % 3 == 0, skorche.map(add_one, q_in))
+    q_out = skorche.map(double, q)
+
+    pipeline_run = skorche.run()
+    pipeline = skorche._global_pipeline
+    assert len(pipeline.task_table) == 1
+    assert not pipeline.ops
+    assert pipeline.queues == {q_in, q_out}
+
+    skorche.shutdown()
+    assert pipeline_run.node_status(add_one) == "done"
+    assert sorted(q_out.flush()) == [2 * x for x in range(1, 101) if x % 3 == 0]
+
+
+def test_fuse_process_chain():
+    """Fused process stages, and picklable predicates, run in the same worker"""
+
+    q_in = skorche.Queue(fixed_inputs=list(range(20)))
+    q_out = skorche.map(negate, skorche.filter(is_odd, skorche.map(cube, q_in)))
+
+    skorche.run()
+    assert len(skorche._global_pipeline.task_table) == 1
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == sorted(-(x**3) for x in range(20) if x % 2)
+
+
+@pytest.mark.parametrize("fuse", [True, False])
+def test_fused_filter_error(fuse, caplog):
+    """A predicate that raises fails the run whether or not its filter is fused"""
+
+    @skorche.task(max_workers=2)
+    def add_one(x: int):
+        return x + 1
+
+    def small(x: int):
+        if x > 5:
+            raise OverflowError(f"{x} is too big")
+        return True
+
+    q_in = skorche.Queue(fixed_inputs=list(range(10)))
+    skorche.filter(small, skorche.map(add_one, q_in))
+
+    with caplog.at_level(logging.WARNING):
+        skorche.run(fuse=fuse)
+        assert len(skorche._global_pipeline.ops) == (0 if fuse else 1)
+
+        with pytest.raises(OverflowError, match="too big"):
+            skorche.shutdown()
+
+    assert not caplog.records
+
+
+def test_fuse_opt_out():
+    """Stages with fuse=False, different worker counts or run(fuse=False) keep their queues"""
+
+    @skorche.task(max_workers=2)
+    def add_one(x: int):
+        return x + 1
+
+    @skorche.task(max_workers=2, fuse=False)
+    def keep(x: int):
+        return x
+
+    @skorche.task(max_workers=4)
+    def wider(x: int):
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(10)))
+    q_out = skorche.map(wider, skorche.map(keep, skorche.map(add_one, q_in)))
+    skorche.run()
+    assert len(skorche._global_pipeline.task_table) == 3
+    skorche.shutdown()
+    assert sorted(q_out.flush()) == list(range(1, 11))
+
+    skorche.init()
+    q_in = skorche.Queue(fixed_inputs=list(range(10)))
+    q_out = skorche.map(keep, skorche.map(add_one, q_in))
+    keep.fuse = True
+    skorche.run(fuse=False)
+    assert len(skorche._global_pipeline.task_table) == 2
+    skorche.shutdown()
+    assert sorted(q_out.flush()) == list(range(1, 11))
+
+
+@pytest.mark.parametrize("queue_backend", ["thread", "manager"])
+def test_chunked_transport(queue_backend):
+    """Items travel in chunks but tasks and ops still see them one at a time"""
+
+    @skorche.task(max_workers=3, fuse=False)
+    def add_one(x: int):
+        return x + 1
+
+    n_items = 1000
+    q_in = skorche.Queue(fixed_inputs=list(range(n_items)))
+    q_even, q_odd = skorche.split(lambda x: x % 2 == 0, skorche.map(add_one, q_in))
+    q_out = skorche.unbatch(skorche.batch(skorche.merge((q_even, q_odd)), batch_size=5))
+
+    skorche.run(queue_backend=queue_backend, chunk_size=16)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == list(range(1, n_items + 1))
+
+
+def test_chunked_process_workers():
+    """Every process worker ships its partly filled chunk before the sentinel"""
+
+    q_in = skorche.Queue(fixed_inputs=list(range(100)))
+    q_out = skorche.map(cube, q_in)
+
+    skorche.run(chunk_size=7, chunk_linger=10)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [x**3 for x in range(100)]
+
+
+def test_chunk_linger():
+    """A partly filled chunk is sent once chunk_linger has passed"""
+
+    @skorche.task
+    def add_one(x: int):
+        return x + 1
+
+    q_in = skorche.Queue()
+    q_out = skorche.map(add_one, q_in)
+    skorche.run(chunk_size=100, chunk_linger=0.01)
+
+    q_in.put(1)
+    assert q_out.get(timeout=1) == 2
+    q_out.task_done()
+
+    q_in.put(skorche.QUEUE_SENTINEL)
+    skorche.shutdown()
+    assert q_out.flush() == []
+
+
+def test_chunk_linger_single_thread():
+    """Every chunk of a queue lingers on the same thread, and full chunks don't linger"""
+
+    q = skorche.Queue(name="lingering", chunk_size=4, chunk_linger=0.05)
+    q.set_queue(skorche.backend.get_queue_backend("thread"), 0, 1, 0.005)
+
+    def lingering():
+        return [t for t in threading.enumerate() if t.name == "skorche-linger lingering"]
+
+    for x in range(400):
+        q.put(x)
+    q.put(400)
+    assert len(lingering()) == 1
+
+    received = [q.get(timeout=1) for _ in range(400)]
+    assert received == list(range(400))
+
+    # the partly filled chunk waits its full chunk_linger
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.02)
+    assert q.get(timeout=1) == 400
+
+    # and exits once the queue has been idle for a while
+    time.sleep(skorche.queue.LINGER_IDLE_TIMEOUT + 0.2)
+    assert not lingering()
+
+
+@pytest.mark.parametrize("n_workers", [1, 2, 3, 8, 16, 64])
+def test_stage_worker_counts(n_workers):
+    """Stages of any width stop cleanly and pass on every item and one sentinel"""
+
+    stages = [
+        skorche.Task(lambda x: x + 1, name=f"stage {i}", max_workers=n_workers, fuse=False)
+        for i in range(3)
+    ]
+
+    n_items = 2000
+    q = skorche.Queue(fixed_inputs=list(range(n_items)))
+    for stage in stages:
+        q = skorche.map(stage, q)
+
+    pipeline_run = skorche.run(chunk_size=4)
+    assert pipeline_run.wait(timeout=30)
+    skorche.shutdown()
+
+    results = []
+    while not q.empty():
+        results.append(q.get())
+
+    assert results.count(skorche.QUEUE_SENTINEL) == 1
+    assert results[-1] is skorche.QUEUE_SENTINEL
+    assert sorted(results[:-1]) == list(range(3, n_items + 3))
+
+
+def test_stage_throughput_scales_with_workers():
+    """Adding workers to a stage of blocking tasks shortens the run"""
+
+    def run_stage(n_workers):
+        skorche.init()
+        nap = skorche.Task(lambda x: time.sleep(0.02), max_workers=n_workers)
+        skorche.map(nap, skorche.Queue(fixed_inputs=list(range(64))))
+
+        start = time.perf_counter()
+        skorche.run()
+        skorche.shutdown()
+        return time.perf_counter() - start
+
+    assert run_stage(16) < run_stage(1) / 4
+
+
+class WorkerKilled(BaseException):
+    pass
+
+
+def test_dead_worker_does_not_hang_stage():
+    """A worker dying mid-stage is counted out and its error is raised"""
+
+    @skorche.task(max_workers=4)
+    def fragile(x: int):
+        if x == 13:
+            raise WorkerKilled()
+        return x
+
+    q_out = skorche.map(fragile, skorche.Queue(fixed_inputs=list(range(100))))
+    pipeline_run = skorche.run()
+
+    with pytest.raises(WorkerKilled):
+        skorche.shutdown()
+
+    assert pipeline_run.done()
+    assert sorted(q_out.flush()) == [x for x in range(100) if x != 13]
+
+
+def test_profiler_finds_bottleneck():
+    """Profiling counts items per node, samples queue depth and names the slow stage"""
+
+    @skorche.task(max_workers=2, fuse=False)
+    def add_one(x: int):
+        return x + 1
+
+    @skorche.task(fuse=False)
+    def slow(x: int):
+        time.sleep(0.002)
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(100)))
+    q = skorche.map(add_one, q_in)
+    q_even, q_odd = skorche.split(lambda x: x % 2 == 0, skorche.map(slow, q))
+
+    pipeline_run = skorche.run(profile=True)
+    assert "Bottleneck" in skorche.graph_analyzer()
+    skorche.shutdown()
+
+    profiler = pipeline_run.profiler
+    snapshot = profiler.snapshot()
+    assert snapshot[add_one]["items_in"] == snapshot[add_one]["items_out"] == 100
+    assert snapshot[add_one]["workers"] == 2
+    assert snapshot[slow]["latency"]["p50"] >= 0.002
+    assert snapshot[q]["max_depth"] > 0
+
+    (split_op,) = [node for node in snapshot if str(node).startswith("Split")]
+    assert snapshot[split_op]["items_in"] == snapshot[split_op]["items_out"] == 100
+
+    assert profiler.bottleneck() is slow
+    assert f"Bottleneck: {slow}" in profiler.report()
+
+
+def test_profile_process_task():
+    """Stats recorded in worker processes are merged back into the profile"""
+
+    q_out = skorche.map(cube, skorche.Queue(fixed_inputs=list(range(20))))
+    pipeline_run = skorche.run(profile=True)
+    skorche.shutdown()
+
+    stats = pipeline_run.profiler.snapshot()[cube]
+    assert stats["items_in"] == stats["items_out"] == 20
+    assert len(q_out.flush()) == 20
+
+
+def test_graph_analyzer_requires_profile():
+    skorche.map(skorche.Task(lambda x: x), skorche.Queue(fixed_inputs=[1]))
+    skorche.run()
+
+    with pytest.raises(ValueError):
+        skorche.graph_analyzer()
+
+    skorche.shutdown()
+
+
+def test_autoscale_grows_backed_up_task():
+    """A task falling behind gains workers and the run finishes sooner"""
+
+    @skorche.task(max_workers=16)
+    def slow(x: int):
+        time.sleep(0.01)
+        return x
+
+    q_out = skorche.map(slow, skorche.Queue(fixed_inputs=list(range(400))))
+
+    start = time.perf_counter()
+    skorche.run(autoscale=True)
+    pool = skorche._global_pipeline.pool_table["thread"]
+    assert pool.allocation[slow] == 1
+
+    time.sleep(0.5)
+    assert pool.allocation[slow] > 1
+
+    skorche.shutdown()
+    assert time.perf_counter() - start < 2
+    assert sorted(q_out.flush()) == list(range(400))
+
+
+def test_autoscale_within_budget():
+    """Autoscaled tasks never hold more workers than max_threads between them"""
+
+    tasks = [
+        skorche.Task(lambda x: time.sleep(0.005) or x, max_workers=16, fuse=False)
+        for _ in range(2)
+    ]
+    q = skorche.Queue(fixed_inputs=list(range(300)))
+    for t in tasks:
+        q = skorche.map(t, q)
+
+    pipeline_run = skorche.run(autoscale=True, max_threads=8)
+    pool = skorche._global_pipeline.pool_table["thread"]
+
+    peak = 0
+    while not pipeline_run.done():
+        peak = max(peak, sum(pool.allocation.values()))
+        time.sleep(0.01)
+
+    skorche.shutdown()
+    assert 2 < peak <= 8
+    assert len(q.flush()) == 300
+
+
+def test_autoscale_shrinks_idle_task():
+    """Workers retire once their input queue has been empty for a while"""
+
+    @skorche.task(max_workers=8)
+    def slow(x: int):
+        time.sleep(0.01)
+        return x
+
+    q_in = skorche.Queue()
+    q_out = skorche.map(slow, q_in)
+    for i in range(200):
+        q_in.put(i)
+
+    skorche.run(autoscale=True)
+    pipeline = skorche._global_pipeline
+    pool = pipeline.pool_table["thread"]
+
+    while not q_in.empty():
+        time.sleep(0.05)
+    peak = pool.allocation[slow]
+    time.sleep(1.5)
+
+    assert pool.allocation[slow] < peak
+    assert pool.workers[slow].get() == pool.allocation[slow]
+    assert any(n_workers < peak for _, _, n_workers in pipeline.autoscaler.history)
+
+    q_in.put(skorche.QUEUE_SENTINEL)
+    skorche.shutdown()
+    assert sorted(q_out.flush()) == list(range(200))
+
+
+def test_render_profiled_pipeline(monkeypatch):
+    """A profile annotates edges with throughput and queue depth and shades busy nodes"""
+
+    sources = []
+    monkeypatch.setattr(
+        skorche.pipeline.Digraph, "render", lambda dot, **kwargs: sources.append(dot.source)
+    )
+
+    @skorche.task(name="slow", fuse=False)
+    def slow(x: int):
+        time.sleep(0.002)
+        return x
+
+    queue_in = skorche.Queue("inputs", fixed_inputs=list(range(50)))
+    q_even, q_odd = skorche.split(lambda x: x % 2 == 0, skorche.map(slow, queue_in))
+    skorche.merge((q_even, q_odd)).nameit("outputs")
+
+    pipeline_run = skorche.run(profile=True)
+    skorche.shutdown()
+    skorche.render_pipeline(
+        filename="profile", root=queue_in, profiler=pipeline_run.profiler
+    )
+
+    (source,) = sources
+    assert "items/s" in source
+    assert "queued" in source
+    assert "slow\n1 worker, " in source
+    assert "fillcolor=" in source
+
+
+@pytest.mark.parametrize("scheduler", ["event", "poll", "async"])
+def test_batch_max_wait(scheduler):
+    """A batch that is slow to fill is sent once its first item has waited max_wait"""
+
+    @skorche.task(name="trickle", fuse=False)
+    def trickle(x: int):
+        time.sleep(0.02)
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(20)))
+    q_out = skorche.batch(skorche.map(trickle, q_in), batch_size=100, max_wait=0.1)
+
+    skorche.run(scheduler=scheduler)
+    skorche.shutdown()
+
+    batches = q_out.flush()
+    assert sum(batches, []) == list(range(20))
+    assert len(batches) >= 3
+    assert all(len(batch) <= 8 for batch in batches)
+
+
+def test_batch_min_size():
+    """fill_batch=False holds back batches smaller than min_size"""
+
+    @skorche.task(name="pairs", fuse=False)
+    def pairs(x: int):
+        if x % 2 == 0:
+            time.sleep(0.02)
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(30)))
+    q_out = skorche.batch(
+        skorche.map(pairs, q_in), batch_size=10, fill_batch=False, min_size=4
+    )
+
+    skorche.run()
+    skorche.shutdown()
+
+    batches = q_out.flush()
+    assert sum(batches, []) == list(range(30))
+    assert all(4 <= len(batch) <= 10 for batch in batches[:-1])
+
+
+def test_batch_max_bytes():
+    """Batches are cut at max_bytes as measured by sizeof"""
+
+    items = [b"x" * n for n in (3, 4, 5, 12, 1, 2, 6, 6)]
+    q_in = skorche.Queue(fixed_inputs=items)
+    q_out = skorche.batch(q_in, batch_size=None, max_bytes=10)
+
+    skorche.run()
+    skorche.shutdown()
+
+    batches = q_out.flush()
+    assert sum(batches, []) == items
+    assert [sum(map(len, batch)) for batch in batches] == [7, 5, 12, 9, 6]
+
+    skorche.init()
+    with pytest.raises(ValueError):
+        skorche.batch(skorche.Queue(), sizeof=len)
+
+
+def test_batch_target_latency():
+    """The adaptive mode grows batches while items still make target_latency"""
+
+    @skorche.task(name="stamp", fuse=False)
+    def stamp(x: int):
+        time.sleep(0.005)
+        return (x, time.monotonic())
+
+    @skorche.task(name="vectorized", fuse=False)
+    def vectorized(batch):
+        time.sleep(0.01 + 0.002 * len(batch))
+        return [(x, time.monotonic() - start, len(batch)) for x, start in batch]
+
+    q_in = skorche.Queue(fixed_inputs=list(range(200)))
+    q_batch = skorche.batch(
+        skorche.map(stamp, q_in), batch_size=50, target_latency=0.1
+    )
+    q_out = skorche.unbatch(skorche.map(vectorized, q_batch))
+
+    skorche.run()
+    skorche.shutdown()
+
+    results = q_out.flush()
+    assert [x for x, _, _ in results] == list(range(200))
+
+    latencies = sorted(latency for _, latency, _ in results)
+    assert latencies[int(0.9 * len(latencies))] < 0.2
+    assert sum(size for _, _, size in results) / len(results) > 4
+
+
+def test_batched_task():
+    """A batched task is called with lists of items but emits items one by one"""
+
+    batch_sizes = []
+
+    @skorche.task(name="double_all", batched=True, batch_size=8, max_wait=0.05)
+    def double_all(xs: list):
+        batch_sizes.append(len(xs))
+        return [2 * x for x in xs]
+
+    q_in = skorche.Queue(fixed_inputs=list(range(100)))
+    q_out = skorche.map(double_all, q_in)
+
+    skorche.run()
+    skorche.shutdown()
+
+    assert q_out.flush() == [2 * x for x in range(100)]
+    assert sum(batch_sizes) == 100
+    assert max(batch_sizes) == 8
+
+    async def double_coroutine(xs: list):
+        return [2 * x for x in xs]
+
+    with pytest.raises(ValueError):
+        skorche.task(batched=True)(lambda xs: xs)
+
+    with pytest.raises(ValueError):
+        skorche.task(batched=True, batch_size=4)(double_coroutine)
+
+
+@skorche.task(name="negate_all", executor="process", batched=True, batch_size=16)
+def negate_all(xs: list):
+    return [-x for x in xs]
+
+
+def test_batched_process_task():
+    """Batched tasks run on process workers too, and aren't fused"""
+
+    q_in = skorche.Queue(fixed_inputs=list(range(200)))
+    q_out = skorche.map(negate_all, skorche.map(negate, q_in))
+
+    pipeline_run = skorche.run(profile=True)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == list(range(200))
+    assert pipeline_run.profiler.snapshot()[negate_all]["items_in"] == 200
+
+
+@skorche.task(name="reverse_bytes", executor="process", max_workers=2)
+def reverse_bytes(payload):
+    return payload[::-1]
+
+
+def test_shared_memory_transport():
+    """Large bytes and memoryviews cross processes through shared memory"""
+
+    large = [bytes([i]) * 300_000 + b"end" for i in range(20)]
+    items = large + [memoryview(large[0]), b"small"]
+
+    q_out = skorche.map(reverse_bytes, skorche.Queue(fixed_inputs=items))
+
+    skorche.run(shared_memory=True)
+    arena = skorche._global_pipeline.queue_backend.arena
+    skorche.shutdown()
+
+    results = q_out.flush()
+    assert sorted(bytes(result) for result in results) == sorted(
+        bytes(item)[::-1] for item in items
+    )
+    assert any(isinstance(result, memoryview) for result in results)
+
+    # every block was released and unlinked
+    assert len(arena.refs) == 0
+
+
+@skorche.task(name="scale_array", executor="process", max_workers=2)
+def scale_array(array):
+    return array * 2
+
+
+@skorche.task(name="pass_array", executor="process", max_workers=2)
+def pass_array(array):
+    return array
+
+
+def test_shared_memory_ndarrays():
+    """Arrays arrive as views on their block, which are released once collected"""
+
+    np = pytest.importorskip("numpy")
+
+    arrays = [np.full((200, 100), i, dtype=np.float64) for i in range(20)]
+    q_out = skorche.chain(
+        [scale_array, pass_array], skorche.Queue(fixed_inputs=arrays)
+    )
+
+    skorche.run(shared_memory=True, fuse=False)
+    arena = skorche._global_pipeline.queue_backend.arena
+    skorche.shutdown()
+
+    results = q_out.flush()
+    assert sorted(float(result[0, 0]) for result in results) == [
+        2.0 * i for i in range(20)
+    ]
+    assert all(result.shape == (200, 100) for result in results)
+
+    # pass_array sent its views on in the blocks they were resolved from,
+    # and every view still alive is a reference to its block
+    assert len(arena.refs) <= 20
+    assert all(count > 0 for count in arena.refs.values())
+
+    del results
+    gc.collect()
+    assert len(arena.refs) == 0
+
+    arena = skorche.SharedArena(multiprocessing.Manager())
+    payload = arena.share(arrays[1])
+    view = arena.resolve(payload)
+    assert not view.flags.owndata and (view == arrays[1]).all()
+
+    # sending a view on takes another reference to its block instead of a copy
+    resent = arena.share(view)
+    assert resent.name == payload.name
+    assert arena.refs[payload.name] == 2
+
+    del view
+    gc.collect()
+    assert arena.refs[payload.name] == 1
+
+    # the handle's reference passes to the array it resolves to
+    view = arena.resolve(resent)
+    del view
+    gc.collect()
+    assert arena.refs[payload.name] == 0
+
+    arena.close()
+    assert len(arena.refs) == 0
+
+
+def test_shared_arena_recycles_blocks():
+    """A released block is handed out again for a payload of the same size class"""
+
+    arena = skorche.SharedArena(multiprocessing.Manager(), min_bytes=1024)
+
+    first = arena.share(b"x" * 3000)
+    assert isinstance(first, skorche.SharedPayload)
+    assert arena.share(b"x" * 10) == b"x" * 10
+    assert arena.resolve(first) == b"x" * 3000
+
+    second = arena.share(b"y" * 4000)
+    assert second.name == first.name
+    assert arena.resolve(second) == b"y" * 4000
+
+    arena.close()
+    assert len(arena.refs) == 0
+
+
+@pytest.mark.parametrize("scheduler", ["event", "async"])
+def test_ordered_map(scheduler):
+    """ordered=True keeps input order across workers, skipping failed items"""
+
+    @skorche.task(name="jitter", max_workers=8)
+    def jitter(x: int):
+        time.sleep((x * 7919 % 13) / 5000)
+        if x % 17 == 0:
+            raise ValueError("unlucky")
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(300)))
+    q_out = skorche.map(jitter, q_in, ordered=True, window=16)
+
+    skorche.run(scheduler=scheduler)
+    skorche.shutdown()
+
+    assert q_out.flush() == [x for x in range(300) if x % 17]
+
+
+def test_ordered_map_window():
+    """No more than window items get past the tagging queue ahead of a slow one"""
+
+    started = []
+    started_before_first_done = []
+
+    @skorche.task(name="first_slow", max_workers=4)
+    def first_slow(x: int):
+        started.append(x)
+        if x == 0:
+            time.sleep(0.2)
+            started_before_first_done.append(len(started))
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(100)))
+    q_out = skorche.map(first_slow, q_in, ordered=True, window=10)
+
+    skorche.run()
+    skorche.shutdown()
+
+    assert q_out.flush() == list(range(100))
+    assert started_before_first_done[0] <= 10
+
+
+def test_ordered_map_process():
+    """Process workers and chunked manager queues keep order too"""
+
+    q_in = skorche.Queue(fixed_inputs=list(range(200)))
+    q_out = skorche.map(negate, q_in, ordered=True)
+
+    skorche.run(chunk_size=8)
+    skorche.shutdown()
+
+    assert q_out.flush() == [-x for x in range(200)]
+
+
+def test_ordered_merge():
+    """An ordered merge restores the order items had before being split"""
+
+    @skorche.task(name="slow_even", max_workers=4)
+    def slow_even(x: int):
+        time.sleep(0.002)
+        return x
+
+    @skorche.task(name="fast_odd", max_workers=2)
+    def fast_odd(x: int):
+        return x
+
+    q_in = skorche.Queue(fixed_inputs=list(range(200)))
+    q_even, q_odd = skorche.split(lambda x: x % 2 == 0, q_in)
+    q_even = skorche.filter(lambda x: x % 3 != 0, skorche.map(slow_even, q_even))
+    q_odd = skorche.map(fast_odd, q_odd)
+    q_out = skorche.merge((q_even, q_odd), ordered=True, window=16)
+
+    skorche.run()
+    skorche.shutdown()
+
+    assert q_out.flush() == [x for x in range(200) if x % 2 or x % 3]
+
+
+def test_ordered_stage_checks():
+    """Ordered stages need a common upstream queue and one to one stages"""
+
+    q_a = skorche.Queue(fixed_inputs=[1])
+    q_b = skorche.Queue(fixed_inputs=[2])
+    with pytest.raises(ValueError):
+        skorche.merge((q_a, q_b), ordered=True)
+
+    skorche.init()
+    q_in = skorche.Queue(fixed_inputs=list(range(10)))
+    q_even, q_odd = skorche.split(lambda x: x % 2 == 0, q_in)
+    q_even = skorche.unbatch(skorche.batch(q_even, batch_size=2))
+    skorche.merge((q_even, q_odd), ordered=True)
+
+    with pytest.raises(ValueError):
+        skorche.run()
+
+
+def test_cached_task():
+    """A cached task skips items it has already seen and counts hits and misses"""
+
+    calls = []
+
+    @skorche.task(name="cached_square", max_workers=2, cache=skorche.LRUCache(maxsize=8))
+    def cached_square(x: int):
+        calls.append(x)
+        return x * x
+
+    q_in = skorche.Queue(fixed_inputs=[x % 5 for x in range(100)])
+    q_out = skorche.map(cached_square, q_in)
+
+    pipeline_run = skorche.run(profile=True)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == sorted((x % 5) ** 2 for x in range(100))
+    assert len(calls) < 10
+    assert cached_square.cache.hits + cached_square.cache.misses == 100
+    assert cached_square.cache.hits == 100 - len(calls)
+    assert pipeline_run.profiler.snapshot()[cached_square]["cache"]["hits"] > 90
+
+
+def test_lru_cache_eviction():
+    """LRUCache drops the least recently used result, and results past their ttl"""
+
+    cache = skorche.LRUCache(maxsize=2, ttl=0.1, key=lambda x: x)
+    cache.store(1, "one")
+    cache.store(2, "two")
+    assert cache.lookup(1) == (True, "one")
+
+    cache.store(3, "three")
+    assert cache.lookup(2) == (False, None)
+    assert cache.lookup(1) == (True, "one")
+
+    time.sleep(0.15)
+    assert cache.lookup(3) == (False, None)
+    assert cache.hit_rate() == 0.5
+
+
+@skorche.task(
+    name="cube_cached",
+    executor="process",
+    max_workers=2,
+    cache=skorche.DiskCache(os.path.join(tempfile.mkdtemp(), "cube.db")),
+)
+def cube_cached(x: int):
+    return x**3
+
+
+def test_disk_cache_shared_between_processes_and_runs():
+    """A DiskCache is shared by process workers and survives between runs"""
+
+    cube_cached.cache.clear()
+
+    for _ in range(2):
+        skorche.init()
+        q_out = skorche.map(cube_cached, skorche.Queue(fixed_inputs=list(range(20))))
+        skorche.run()
+        skorche.shutdown()
+        assert sorted(q_out.flush()) == sorted(x**3 for x in range(20))
+
+    assert cube_cached.cache.misses == 20
+    assert cube_cached.cache.hits == 20
+
+
+def test_checkpoint_resume():
+    """A resumed run only performs the items no earlier run completed"""
+
+    path = os.path.join(tempfile.mkdtemp(), "run.db")
+    calls = []
+    crashed = [True]
+
+    @skorche.task(name="halve_once", max_workers=2)
+    def halve_once(x: int):
+        calls.append(x)
+        if crashed[0] and x >= 15:
+            raise RuntimeError("worker lost")
+        return x / 2
+
+    @skorche.task(name="negate_halved")
+    def negate_halved(x: float):
+        return -x
+
+    for run_kwargs in ({"checkpoint": path}, {"resume": path, "checkpoint_interval": 0}):
+        skorche.init()
+        q_in = skorche.Queue(fixed_inputs=list(range(20)))
+        q_out = skorche.chain([halve_once, negate_halved], q_in)
+        skorche.run(fuse=False, **run_kwargs)
+        skorche.shutdown()
+        crashed[0] = False
+
+    assert sorted(q_out.flush()) == sorted(-x / 2 for x in range(20))
+    assert sorted(calls) == sorted(list(range(20)) + list(range(15, 20)))
+    assert halve_once.checkpoint is None
+    assert skorche.Checkpoint(path, resume=True).completed("halve_once") == 20
+
+
+def test_checkpoint_fused_tasks():
+    """Steps of a fused task are checkpointed under their own names"""
+
+    path = os.path.join(tempfile.mkdtemp(), "fused.db")
+
+    @skorche.task(name="fused_inc")
+    def fused_inc(x: int):
+        return x + 1
+
+    @skorche.task(name="fused_double")
+    def fused_double(x: int):
+        return x * 2
+
+    q_out = skorche.chain([fused_inc, fused_double], skorche.Queue(fixed_inputs=[1, 2, 3]))
+    skorche.run(checkpoint=path)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [4, 6, 8]
+    checkpoint = skorche.Checkpoint(path, resume=True)
+    assert checkpoint.completed("fused_inc") == 3
+    assert checkpoint.completed("fused_double") == 3
+
+    with pytest.raises(ValueError):
+        skorche.run(checkpoint=path, resume=os.path.join(tempfile.mkdtemp(), "x.db"))
+
+
+def test_checkpoint_unpicklable_items():
+    """Items the checkpoint can't key are performed without it"""
+
+    path = os.path.join(tempfile.mkdtemp(), "locks.db")
+
+    @skorche.task(name="lock_free")
+    def lock_free(item):
+        if isinstance(item, int):
+            return item + 1
+
+        x, lock = item
+        with lock:
+            return x + 1
+
+    # a lock can't be pickled, so neither can the last three items
+    inputs = [0, 1, 2] + [(x, threading.Lock()) for x in range(3, 6)]
+    q_out = skorche.map(lock_free, skorche.Queue(fixed_inputs=inputs))
+    skorche.run(checkpoint=path)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [1, 2, 3, 4, 5, 6]
+    assert skorche.Checkpoint(path, resume=True).completed("lock_free") == 3
+
+
+def test_retry_policy_delays():
+    """Waits double with every attempt up to max_backoff, less the jitter"""
+
+    policy = skorche.RetryPolicy(max_attempts=4, backoff=0.1, max_backoff=0.3, jitter=0.5)
+    for attempt, longest in ((1, 0.1), (2, 0.2), (3, 0.3), (4, 0.3)):
+        assert longest / 2 <= policy.delay(attempt) <= longest
+
+    assert policy.retryable(IOError(), 3)
+    assert not policy.retryable(IOError(), 4)
+    assert not skorche.RetryPolicy(retry_on=IOError).retryable(KeyError(), 1)
+
+    with pytest.raises(ValueError):
+        skorche.task(retry="often")(lambda x: x)
+
+
+def test_retry_without_blocking_worker():
+    """A single worker keeps handling other items while one backs off"""
+
+    attempts = {}
+    done = []
+
+    @skorche.task(name="flaky", retry=skorche.RetryPolicy(backoff=0.2, jitter=0))
+    def flaky(x: int):
+        attempts[x] = attempts.get(x, 0) + 1
+        if x % 5 == 0 and attempts[x] < 3:
+            raise ConnectionError("transient")
+        done.append(x)
+        return x
+
+    q_out = skorche.map(flaky, skorche.Queue(fixed_inputs=list(range(10))))
+    pipeline_run = skorche.run(profile=True)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == list(range(10))
+    assert done[-2:] == [0, 5]
+    assert pipeline_run.profiler.snapshot()[flaky]["errors"] == {
+        "retries": 4,
+        "failures": 0,
+    }
+
+
+@skorche.task(
+    name="parse_record",
+    executor="process",
+    max_workers=2,
+    retry=skorche.RetryPolicy(max_attempts=3, backoff=0.01, retry_on=(ConnectionError,)),
+    dead_letter=True,
+)
+def parse_record(x: int):
+    if x % 4 == 0:
+        raise ValueError(f"bad record {x}")
+    return x
+
+
+def test_dead_letter_queue(caplog):
+    """Items given up on go to the dead letter queue with their traceback"""
+
+    q_out = skorche.map(parse_record, skorche.Queue(fixed_inputs=list(range(12))))
+    q_failed = skorche.dead_letters(parse_record)
+
+    with caplog.at_level(logging.WARNING):
+        skorche.run()
+        skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [x for x in range(12) if x % 4]
+
+    failures = sorted(q_failed.flush(), key=lambda failure: failure.item)
+    assert [failure.item for failure in failures] == [0, 4, 8]
+    assert all(failure.attempts == 1 for failure in failures)
+    assert isinstance(failures[0].error, ValueError)
+    assert "bad record 0" in failures[0].traceback
+    assert not caplog.records
+
+    with pytest.raises(ValueError):
+        skorche.dead_letters(cube_cached)
+
+
+def test_dead_letter_queue_unbounded():
+    """A bounded run doesn't bound the dead letter queue, which is only read at the end"""
+
+    # 40 failures, but few enough results that the output queue doesn't fill
+    inputs = list(range(0, 160, 4)) + [1, 2, 3]
+    q_out = skorche.map(parse_record, skorche.Queue(fixed_inputs=inputs))
+    q_failed = skorche.dead_letters(parse_record)
+
+    pipeline_run = skorche.run(queue_maxsize=10)
+    assert pipeline_run.wait(timeout=10)
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [1, 2, 3]
+    assert len(q_failed.flush()) == 40
+
+
+def test_async_retry_and_logged_failures(caplog):
+    """Async tasks back off without holding up other items, and log items given up on"""
+
+    attempts = {}
+
+    @skorche.task(name="flaky_fetch", max_workers=10, retry=2)
+    async def flaky_fetch(x: int):
+        attempts[x] = attempts.get(x, 0) + 1
+        if x == 3 or (x % 2 and attempts[x] == 1):
+            raise ConnectionError("transient")
+        return x
+
+    q_out = skorche.map(flaky_fetch, skorche.Queue(fixed_inputs=list(range(8))))
+    with caplog.at_level(logging.WARNING):
+        skorche.run()
+        skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [0, 1, 2, 4, 5, 6, 7]
+    assert attempts[3] == 2
+    assert "flaky_fetch" in caplog.text and "ConnectionError" in caplog.text
+
+
+@skorche.task(name="spin_forever", executor="process", timeout=0.3, dead_letter=True)
+def spin_forever(x: int):
+    while x == 0:
+        pass
+    return x
+
+
+def test_timeout_interrupts_process_item():
+    """A process worker interrupts an item past its timeout and carries on"""
+
+    q_out = skorche.map(spin_forever, skorche.Queue(fixed_inputs=[0, 1, 2]))
+    q_failed = skorche.dead_letters(spin_forever)
+    skorche.run()
+    skorche.shutdown()
+
+    assert sorted(q_out.flush()) == [1, 2]
+    (failure,) = q_failed.flush()
+    assert failure.item == 0
+    assert isinstance(failure.error, TimeoutError)
+
+
+def test_timeout_abandons_thread_item():
+    """A thread worker stops waiting for an item past its timeout, which is then retried"""
+
+    calls = []
+
+    @skorche.task(name="hang_once", timeout=0.2, retry=skorche.RetryPolicy(backoff=0))
+    def hang_once(x: int):
+        calls.append(x)
+        if calls.count(x) == 1 and x == 1:
+            time.sleep(5)
+        return x
+
+    start = time.perf_counter()
+    q_out = skorche.map(hang_once, skorche.Queue(fixed_inputs=[0, 1, 2]))
+    skorche.run()
+    skorche.shutdown()
+
+    assert time.perf_counter() - start < 2
+    assert sorted(q_out.flush()) == [0, 1, 2]
+    assert calls.count(1) == 2
+
+
+def test_guarded_calls_reuse_threads():
+    """A worker makes its guarded calls on one thread, replaced only when a call overruns"""
+
+    threads = set()
+
+    @skorche.task(name="hang_early", timeout=0.2, dead_letter=True)
+    def hang_early(x: int):
+        threads.add(threading.current_thread())
+        if x == 1:
+            time.sleep(1)
+        return x
+
+    q_out = skorche.map(hang_early, skorche.Queue(fixed_inputs=list(range(100))))
+    q_failed = skorche.dead_letters(hang_early)
+    skorche.run()
+    skorche.shutdown()
+
+    assert len(q_out.flush()) == 99
+    assert [failure.item for failure in q_failed.flush()] == [1]
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_speculation_on_stragglers(is_async):
+    """An item far slower than the task's p95 is started again, and the first copy wins"""
+
+    calls = {}
+
+    def straggle(x: int) -> float:
+        calls[x] = calls.get(x, 0) + 1
+        return 3.0 if x == 30 and calls[x] == 1 else 0.002
+
+    if is_async:
+
+        async def fetch(x: int):
+            await asyncio.sleep(straggle(x))
+            return x
+
+    else:
+
+        def fetch(x: int):
+            time.sleep(straggle(x))
+            return x
+
+    fetch = skorche.task(name="speculative", max_workers=4, speculate=True)(fetch)
+
+    start = time.perf_counter()
+    q_out = skorche.map(fetch, skorche.Queue(fixed_inputs=list(range(40))))
+    pipeline_run = skorche.run(profile=True)
+    skorche.shutdown()
+
+    assert time.perf_counter() - start < 1.5
+    assert sorted(q_out.flush()) == list(range(40))
+    assert calls[30] == 2
+    assert pipeline_run.profiler.snapshot()[fetch]["speculations"] >= 1
+
+    with pytest.raises(ValueError):
+        skorche.task(executor="process", speculate=True)(straggle)
+
+
+def test_partition_keeps_keys_together():
+    """Every key reaches one partition, whose task can count it without locks"""
+
+    counts = []
+
+    def counter(i: int) -> skorche.Task:
+        seen = {}
+        counts.append(seen)
+
+        @skorche.task(name=f"count_{i}")
+        def count(word: str):
+            seen[word] = seen.get(word, 0) + 1
+            return (word, seen[word])
+
+        return count
+
+    words = [f"word{i % 13}" for i in range(200)]
+    partitions = skorche.partition(lambda word: word, skorche.Queue(fixed_inputs=words), 4)
+    q_out = skorche.merge(
+        [skorche.map(counter(i), part) for i, part in enumerate(partitions)]
+    )
+    skorche.run()
+    skorche.shutdown()
+
+    results = q_out.flush()
+    assert len(results) == 200
+    assert sum(len(seen) for seen in counts) == 13
+    for seen in counts:
+        for word, n in seen.items():
+            assert n == words.count(word)
+
+
+def test_partition_in_ordered_stage():
+    """Partitions can be merged back into input order"""
+
+    q_in = skorche.Queue(fixed_inputs=list(range(50)))
+    partitions = skorche.partition(lambda x: x % 3, q_in, 3)
+    q_out = skorche.merge(
+        [
+            skorche.map(skorche.task(name=f"shard_{i}")(lambda x: x * 10), part)
+            for i, part in enumerate(partitions)
+        ],
+        ordered=True,
+    )
+    skorche.run()
+    skorche.shutdown()
+
+    assert q_out.flush() == [x * 10 for x in range(50)]
+
+    with pytest.raises(ValueError):
+        skorche.partition(lambda x: x, skorche.Queue(), 0)
+
+
+def test_partition_is_stable_across_runs():
+    """A key goes to the same partition in every interpreter"""
+
+    script = (
+        "import skorche;"
+        "op = skorche.op.PartitionOp(str, skorche.Queue(), [skorche.Queue()] * 7);"
+        "print([op.partition_of(f'key{i}') for i in range(50)])"
+    )
+    placements = {
+        subprocess.run(
+            [sys.executable, "-c", script],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(placements) == 1
+
+
+def test_reduce_and_group_by():
+    """Aggregates stream into running results and come out when the input ends"""
+
+    q_a, q_b = skorche.split(lambda x: x < 10, skorche.Queue(fixed_inputs=list(range(20))))
+    q_sum = skorche.reduce(lambda total, x: total + x, q_a)
+    q_groups = skorche.group_by(
+        lambda x: x % 3, lambda seen, x: seen + [x], q_b, initial=[]
+    )
+    q_empty = skorche.reduce(max, skorche.Queue(fixed_inputs=[]), initial=-1)
+    skorche.run()
+    skorche.shutdown()
+
+    assert q_sum.flush() == [sum(range(10))]
+    assert q_groups.flush() == [
+        (1, [10, 13, 16, 19]),
+        (2, [11, 14, 17]),
+        (0, [12, 15, 18]),
+    ]
+    assert q_empty.flush() == [-1]
+
+
+def test_count_windows():
+    """Count windows tumble or slide, and the last incomplete one is sent at the end"""
+
+    results = {}
+    for name, kwargs in {
+        "tumbling": {"size": 3},
+        "summed": {"size": 4, "agg_fn": lambda total, x: total + x},
+        "sliding": {"size": 4, "step": 2},
+        "hopping": {"size": 2, "step": 3},
+    }.items():
+        skorche.init()
+        q_out = skorche.window(skorche.Queue(fixed_inputs=list(range(1, 10))), **kwargs)
+        skorche.run()
+        skorche.shutdown()
+        results[name] = q_out.flush()
+
+    assert results == {
+        "tumbling": [[1, 2, 3], [4, 5, 6], [7, 8, 9]],
+        "summed": [10, 26, 9],
+        "sliding": [[1, 2, 3, 4], [3, 4, 5, 6], [5, 6, 7, 8], [7, 8, 9]],
+        "hopping": [[1, 2], [4, 5], [7, 8]],
+    }
+
+    with pytest.raises(ValueError):
+        skorche.window(skorche.Queue(), size=3, duration=1.0)
+
+
+def test_event_time_windows():
+    """Time windows follow item timestamps when given"""
+
+    events = [(t, f"e{t}") for t in (0, 1, 2, 5, 6, 11, 12.5)]
+    q_tumbling, q_sliding = (
+        skorche.window(
+            skorche.Queue(fixed_inputs=events),
+            duration=4,
+            every=every,
+            agg_fn=lambda names, event: names + [event[1]],
+            initial=[],
+            timestamp=lambda event: event[0],
+        )
+        for every in (None, 2)
+    )
+    skorche.run()
+    skorche.shutdown()
+
+    assert q_tumbling.flush() == [["e0", "e1", "e2"], ["e5", "e6"], ["e11"], ["e12.5"]]
+    assert q_sliding.flush() == [
+        ["e0", "e1", "e2"],
+        ["e2", "e5"],
+        ["e5", "e6"],
+        ["e6"],
+        ["e11"],
+        ["e11", "e12.5"],
+    ]
+
+
+@pytest.mark.parametrize("scheduler", ["event", "async"])
+def test_time_windows_close_on_time(scheduler):
+    """A window of arrival time is sent once it ends, even if no item follows"""
+
+    q_in = skorche.Queue()
+    q_out = skorche.window(q_in, duration=0.1, agg_fn=lambda n, _: n + 1, initial=0)
+    pipeline_run = skorche.run(scheduler=scheduler)
+
+    for x in range(5):
+        q_in.put(x)
+    assert q_out.get(timeout=2) == 5
+
+    q_in.put(skorche.QUEUE_SENTINEL)
+    pipeline_run.wait()
+    skorche.shutdown()
+    assert q_out.flush() == []
+
+
+def test_balance_favours_idle_branch():
+    """balance sends more items to the branch that keeps up"""
+
+    @skorche.task(name="slow_branch")
+    def slow_branch(x: int):
+        time.sleep(0.01)
+        return ("slow", x)
+
+    @skorche.task(name="fast_branch")
+    def fast_branch(x: int):
+        return ("fast", x)
+
+    q_in = skorche.Queue.from_iterable(range(200), maxsize=1)
+    q_slow, q_fast = skorche.balance(q_in, 2)
+    q_out = skorche.merge([skorche.map(slow_branch, q_slow), skorche.map(fast_branch, q_fast)])
+    skorche.run()
+    skorche.shutdown()
+
+    results = q_out.flush()
+    assert sorted(x for _, x in results) == list(range(200))
+    assert sum(branch == "fast" for branch, _ in results) > 150
+
+
+@pytest.mark.parametrize("weights", [(3, 1), "depth", None])
+def test_weighted_merge(weights):
+    """Inputs competing for a slow output take turns by weight, in bursts"""
+
+    q_a = skorche.Queue(fixed_inputs=[("a", x) for x in range(300)])
+    q_b = skorche.Queue(fixed_inputs=[("b", x) for x in range(300)])
+    q_merged = skorche.merge([q_a, q_b], skorche.Queue(maxsize=4), weights=weights, burst=8)
+
+    @skorche.task(name="drain")
+    def drain(item):
+        time.sleep(0.0002)
+        return item
+
+    q_out = skorche.map(drain, q_merged)
+    skorche.run(fuse=False)
+    skorche.shutdown()
+
+    results = q_out.flush()
+    assert sorted(results) == sorted([("a", x) for x in range(300)] + [("b", x) for x in range(300)])
+    for source in ("a", "b"):
+        assert [x for name, x in results if name == source] == list(range(300))
+
+    share_a = sum(name == "a" for name, _ in results[:200]) / 200
+    if weights == (3, 1):
+        assert share_a > 0.65
+    else:
+        assert 0.3 < share_a < 0.7
+
+    with pytest.raises(ValueError):
+        skorche.merge([q_a, q_b], weights=(1,))